@@ -0,0 +1,577 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from mutanalyzer_engine import MutationEngine, GLOBAL_ALGORITHM, LOCAL_ALGORITHM, SPLIT_ALGORITHM, LINEAR_ALGORITHM
+from mutanalyzer_memo import get_memo
+from mutanalyzer_queue import WorkQueue
+from mutanalyzer_store import ResultsStore
+
+BASES = "ACGT"
+DEFAULT_SIZES = [500, 2000]
+DEFAULT_TOLERANCE = 0.25  # Allowed slowdown vs baseline before flagging (25%)
+IMPORT_BUDGET_S = 0.25  # Cold `import mutanalyzer_gui`
+STARTUP_BUDGET_S = 1.0  # Import plus building the window up to the first idle
+DENSITY_VIEWS = 200  # Pan/zoom steps per density_track run
+TILE_LENGTH = 300  # Amplicon length for tiling runs
+QUEUE_JOBS = 200  # Jobs per work_queue run
+COHORT_SAMPLES = 20  # Samples per annotation_memo run, drawing on one shared variant pool
+# Subsystems that must load on first use, never at GUI import
+LAZY_MODULES = ("Bio.pairwise2", "Bio.Entrez", "Bio.SeqIO", "Bio.Seq", "numpy", "sqlite3", "reportlab", "requests")
+
+
+# ---------------------------------------------------------------------------
+# Synthetic data generators
+# ---------------------------------------------------------------------------
+
+def random_reference(length, gc=0.42, seed=0):
+    rng = random.Random(seed)
+    weights = [(1 - gc) / 2, gc / 2, gc / 2, (1 - gc) / 2]  # A, C, G, T
+    return "".join(rng.choices(BASES, weights=weights, k=length))
+
+
+def mutate_sequence(ref_seq, divergence=0.01, indel_rate=0.001, max_indel=6, seed=0):
+    # Returns the sample plus the truth set of (ref_position, type) events
+    rng = random.Random(seed)
+    sample = []
+    events = []
+    i = 0
+    while i < len(ref_seq):
+        roll = rng.random()
+        if roll < indel_rate / 2:
+            length = rng.randint(1, max_indel)
+            events.append((i + 1, 'Deletion'))
+            i += length
+            continue
+        if roll < indel_rate:
+            length = rng.randint(1, max_indel)
+            sample.append("".join(rng.choices(BASES, k=length)))
+            events.append((i + 1, 'Insertion'))
+        base = ref_seq[i]
+        if rng.random() < divergence:
+            base = rng.choice([b for b in BASES if b != base])
+            events.append((i + 1, 'SNP'))
+        sample.append(base)
+        i += 1
+    return "".join(sample), events
+
+
+def gene_layout(length, n_exons=None, seed=0):
+    # Real-gene-shaped model: short 5' exon, ~150 bp internal exons,
+    # longer 3' exon, introns soaking up the remaining sequence.
+    rng = random.Random(seed)
+    if n_exons is None:
+        n_exons = max(2, min(25, length // 2000 + 2))
+    exon_lengths = [rng.randint(60, 200)]
+    exon_lengths += [max(30, int(rng.gauss(150, 50))) for _ in range(n_exons - 2)]
+    exon_lengths.append(rng.randint(300, 900))
+    total_exonic = sum(exon_lengths)
+    if total_exonic >= length:
+        scale = (length * 0.5) / total_exonic
+        exon_lengths = [max(3, int(e * scale)) for e in exon_lengths]
+        total_exonic = sum(exon_lengths)
+    intron_space = length - total_exonic
+    cuts = sorted(rng.random() for _ in range(n_exons - 1))
+    introns = [int(intron_space * (b - a)) for a, b in zip([0] + cuts, cuts + [1])][:n_exons - 1]
+    exon_ranges = []
+    pos = 1 + (intron_space - sum(introns)) // 2
+    for idx, exon_len in enumerate(exon_lengths):
+        exon_ranges.append((pos, pos + exon_len - 1))
+        pos += exon_len
+        if idx < len(introns):
+            pos += introns[idx]
+    return exon_ranges
+
+
+def make_case(length, divergence=0.01, indel_rate=0.001, seed=0):
+    ref_seq = random_reference(length, seed=seed)
+    sample_seq, truth = mutate_sequence(ref_seq, divergence, indel_rate, seed=seed + 1)
+    return {
+        'ref_seq': ref_seq,
+        'sample_seq': sample_seq,
+        'exon_ranges': gene_layout(length, seed=seed + 2),
+        'truth': truth,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def measure(func, repeat=3, setup=None):
+    # Timed runs go without tracemalloc (it slows pure-Python code several
+    # fold); one extra traced run records the peak allocation.
+    def call():
+        state = setup() if setup else None
+        start = time.perf_counter()
+        result = func(state) if setup else func()
+        return time.perf_counter() - start, result
+
+    timings = []
+    result = None
+    for _ in range(repeat):
+        elapsed, result = call()
+        timings.append(elapsed)
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'mean_s': statistics.fmean(timings),
+        'repeat': repeat,
+        'peak_kb': round(peak / 1024, 1),
+    }, result
+
+
+def prepared_engine(case, algorithm=GLOBAL_ALGORITHM, called=False):
+    engine = MutationEngine()
+    engine.set_gene_model(case['exon_ranges'])
+    engine.compute_alignment(case['ref_seq'], case['sample_seq'], algorithm)
+    if called:
+        engine.call_mutations()
+    return engine
+
+
+# Each benchmark takes (case, repeat) and returns the measurement dict.
+# New hot paths register here so they show up in every run and baseline.
+def bench_align_global(case, repeat):
+    engine = MutationEngine()
+    engine.ungapped_triage = False  # Always time the DP itself
+    stats, _ = measure(lambda: engine.compute_alignment(case['ref_seq'], case['sample_seq'], GLOBAL_ALGORITHM), repeat)
+    return stats
+
+
+def bench_align_local(case, repeat):
+    engine = MutationEngine()
+    stats, _ = measure(lambda: engine.compute_alignment(case['ref_seq'], case['sample_seq'], LOCAL_ALGORITHM), repeat)
+    return stats
+
+
+def bench_align_split(case, repeat):
+    engine = MutationEngine()
+    stats, _ = measure(lambda: engine.compute_alignment(case['ref_seq'], case['sample_seq'], SPLIT_ALGORITHM), repeat)
+    return stats
+
+
+def bench_align_linear(case, repeat):
+    engine = MutationEngine()
+    stats, score = measure(lambda: engine.compute_alignment(case['ref_seq'], case['sample_seq'], LINEAR_ALGORITHM), repeat)
+    stats['score'] = score
+    return stats
+
+
+def bench_align_ungapped(case, repeat):
+    # Same-length, SNV-only sample: triage should skip DP entirely
+    sample_seq, truth = mutate_sequence(case['ref_seq'], divergence=0.01, indel_rate=0.0, seed=len(case['ref_seq']))
+    engine = MutationEngine()
+    stats, _ = measure(lambda: engine.compute_alignment(case['ref_seq'], sample_seq, GLOBAL_ALGORITHM), repeat)
+    stats['items'] = len(truth)
+    stats['fast_path'] = engine.ungapped_columns is not None
+    return stats
+
+
+def bench_align_circular(case, repeat):
+    # The case sample rotated by a third of its length on a circular
+    # reference: one seeded rotation, then the same DP as align_global
+    sample_seq = case['sample_seq'][len(case['sample_seq']) // 3:] + case['sample_seq'][:len(case['sample_seq']) // 3]
+    engine = MutationEngine()
+    engine.ungapped_triage = False
+    engine.circular = True
+    stats, _ = measure(lambda: engine.compute_alignment(case['ref_seq'], sample_seq, GLOBAL_ALGORITHM), repeat)
+    stats['offset'] = engine.circular_offset
+    return stats
+
+
+def bench_call_mutations(case, repeat):
+    engine = prepared_engine(case)
+    stats, mutations = measure(engine.call_mutations, repeat)
+    stats['items'] = len(mutations)
+    return stats
+
+
+def bench_annotation_memo(case, repeat):
+    # Calling and isoform annotation of COHORT_SAMPLES samples whose SNVs
+    # recur (each carries half of one pool of case-sized variants) on three
+    # transcripts, through a fresh in-memory memo per run. The first sample
+    # fills the memo; the rest should mostly hit it.
+    from mutanalyzer_transcripts import Transcript
+    ref_seq = case['ref_seq']
+    exons = case['exon_ranges']
+    rng = random.Random(len(ref_seq))
+    pool = rng.sample(range(len(ref_seq)), max(2, len(case['truth'])))
+    samples = []
+    for _ in range(COHORT_SAMPLES):
+        sample = list(ref_seq)
+        for i in rng.sample(pool, len(pool) // 2):
+            sample[i] = rng.choice([b for b in BASES if b != ref_seq[i]])
+        samples.append("".join(sample))
+    engine = MutationEngine()
+    engine.reference_accession = "BENCH.1"
+    engine.set_transcripts([Transcript(f"NM_BENCH{i}.1", exons[i:], exons[i:]) for i in range(min(3, len(exons)))])
+    engine.memo_path = ":memory:"
+    alignments = []
+    for sample_seq in samples:
+        engine.compute_alignment(ref_seq, sample_seq)
+        alignments.append((engine.aligned_ref, engine.aligned_sample, engine.ungapped_columns))
+
+    def cohort(memo):
+        calls = 0
+        for engine.aligned_ref, engine.aligned_sample, engine.ungapped_columns in alignments:
+            calls += len(engine.call_mutations())
+        return calls, memo
+
+    def fresh_memo():
+        memo = get_memo(":memory:")
+        memo.clear()
+        return memo
+
+    engine.use_memo = False
+    baseline, _ = measure(lambda: cohort(None), repeat)
+    engine.use_memo = True
+    stats, (calls, memo) = measure(cohort, repeat, setup=fresh_memo)
+    stats['items'] = calls
+    stats['hit_rate'] = round(memo.hit_rate(), 3)
+    stats['speedup'] = round(baseline['median_s'] / stats['median_s'], 2)
+    return stats
+
+
+def bench_pathogenicity(case, repeat):
+    engine = prepared_engine(case)
+    stats, scored = measure(lambda state: state.score_pathogenicity(), repeat, setup=lambda: _recalled(engine))
+    stats['items'] = len(scored)
+    return stats
+
+
+def _recalled(engine):
+    engine.call_mutations()
+    return engine
+
+
+def bench_format_alignment(case, repeat):
+    engine = prepared_engine(case)
+    stats, (text, tags) = measure(lambda: engine.format_alignment(engine.aligned_ref, engine.aligned_sample, engine.alignment_score), repeat)
+    stats['items'] = len(tags)
+    return stats
+
+
+def _bench_exporter(case, repeat, suffix, writer):
+    engine = prepared_engine(case, called=True)
+    engine.score_pathogenicity()
+    summary = engine.build_summary()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export" + suffix)
+        stats, _ = measure(lambda: writer(engine, path, summary), repeat)
+        stats['bytes'] = os.path.getsize(path)
+    stats['items'] = len(engine.mutations)
+    return stats
+
+
+def bench_export_csv(case, repeat):
+    return _bench_exporter(case, repeat, ".csv", lambda e, path, summary: e.write_csv(path))
+
+
+def bench_export_report(case, repeat):
+    return _bench_exporter(case, repeat, ".txt", lambda e, path, summary: e.write_report(path, summary))
+
+
+def bench_store_batch(case, repeat):
+    # A 96-well plate's calls written as one run in one transaction
+    engine = prepared_engine(case, called=True)
+    samples = [{'name': f"W{i:02d}", 'mutations': engine.mutations} for i in range(96)]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultsStore(os.path.join(tmp, "results.db"))
+        stats, _ = measure(lambda: store.save_run(case['ref_seq'], samples, "BENCH"), repeat)
+        store.close()
+    stats['items'] = len(engine.mutations) * len(samples)
+    stats['variants_per_ms'] = round(stats['items'] / (stats['median_s'] * 1000), 1)
+    return stats
+
+
+def bench_session(case, repeat):
+    # Binary session reopen (the save is reported alongside)
+    engine = prepared_engine(case, called=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.mas")
+        save, _ = measure(lambda: engine.save_session(path), repeat)
+        stats, _ = measure(lambda: MutationEngine().open_session(path), repeat)
+        stats['bytes'] = os.path.getsize(path)
+    stats['items'] = len(engine.mutations)
+    stats['save_ms'] = round(save['median_s'] * 1000, 2)
+    return stats
+
+
+def bench_density_track(case, repeat):
+    # Density-track views over a locus 1000x the case length with 50
+    # variants per case base (2 Mb / 100k variants at the 2000 bp size):
+    # pyramid build, then a pan/zoom sweep of DENSITY_VIEWS bin queries
+    from mutanalyzer_density import DensityPyramid
+    length = len(case['ref_seq']) * 1000
+    rng = random.Random(length)
+    positions = [rng.randint(1, length) for _ in range(len(case['ref_seq']) * 50)]
+    build, pyramid = measure(lambda: DensityPyramid(positions, length), repeat)
+    views = []
+    for _ in range(DENSITY_VIEWS):
+        span = int(length ** rng.random()) + 50
+        start = rng.randint(1, length - span + 1)
+        views.append((start, start + span - 1))
+    stats, _ = measure(lambda: [pyramid.bins(start, end, 600) for start, end in views], repeat)
+    stats['items'] = len(positions)
+    stats['build_ms'] = round(build['median_s'] * 1000, 2)
+    stats['ms_per_view'] = round(stats['median_s'] * 1000 / DENSITY_VIEWS, 3)
+    return stats
+
+
+def bench_amplicon_tiling(case, repeat):
+    # Overlapping TILE_LENGTH amplicons cut from the mutated sample every
+    # TILE_LENGTH/2 bases of a reference 100x the case length, placed and
+    # called in one process so runs compare across machines
+    length = len(case['ref_seq']) * 100
+    ref_seq = random_reference(length, seed=length)
+    sample_seq, _ = mutate_sequence(ref_seq, seed=length + 1)
+    amplicons = [(f"amp{i}", sample_seq[start:start + TILE_LENGTH]) for i, start in enumerate(range(0, len(sample_seq) - TILE_LENGTH, TILE_LENGTH // 2))]
+    engine = MutationEngine()
+    engine.workers = 1
+    engine.get_reference_index(ref_seq)
+    stats, _ = measure(lambda: engine.tile_amplicons(amplicons, ref_seq), repeat)
+    stats['items'] = len(amplicons)
+    stats['hits'] = len(engine.tiling.hits)
+    stats['variants'] = len(engine.mutations)
+    stats['amplicons_per_s'] = round(len(amplicons) / stats['median_s'], 1)
+    return stats
+
+
+def bench_work_queue(case, repeat):
+    # Queue bookkeeping alone: submit QUEUE_JOBS samples, then claim and
+    # complete each one, with no analysis in between
+    with tempfile.TemporaryDirectory() as tmp:
+        ref_path = os.path.join(tmp, "ref.fa")
+        with open(ref_path, 'w') as f:
+            f.write(">ref\n" + case['ref_seq'] + "\n")
+        samples = [os.path.join(tmp, f"sample{i}.fa") for i in range(QUEUE_JOBS)]
+
+        def cycle(queue):
+            queue.submit(samples, ref_path, {'algorithm': GLOBAL_ALGORITHM})
+            while True:
+                job = queue.claim("bench")
+                if job is None:
+                    return queue.counts()
+                queue.complete(job, {'variants': 0})
+
+        runs = iter(range(repeat + 1))
+        stats, counts = measure(cycle, repeat, setup=lambda: WorkQueue(os.path.join(tmp, f"queue{next(runs)}")))
+    stats['items'] = counts['done']
+    stats['ms_per_job'] = round(stats['median_s'] / QUEUE_JOBS * 1000, 3)
+    return stats
+
+
+def bench_export_pdf(case, repeat):
+    try:
+        import reportlab  # noqa: F401
+    except ImportError:
+        return None
+    return _bench_exporter(case, repeat, ".pdf", lambda e, path, summary: e.write_pdf(path, summary))
+
+
+BENCHMARKS = {
+    'align_global': bench_align_global,
+    'align_local': bench_align_local,
+    'align_split': bench_align_split,
+    'align_linear': bench_align_linear,
+    'align_ungapped': bench_align_ungapped,
+    'align_circular': bench_align_circular,
+    'work_queue': bench_work_queue,
+    'call_mutations': bench_call_mutations,
+    'annotation_memo': bench_annotation_memo,
+    'pathogenicity': bench_pathogenicity,
+    'format_alignment': bench_format_alignment,
+    'export_csv': bench_export_csv,
+    'export_report': bench_export_report,
+    'export_pdf': bench_export_pdf,
+    'store_batch': bench_store_batch,
+    'session': bench_session,
+    'density_track': bench_density_track,
+    'amplicon_tiling': bench_amplicon_tiling,
+}
+
+
+# ---------------------------------------------------------------------------
+# Startup budget
+# ---------------------------------------------------------------------------
+
+# Run in a fresh interpreter: an in-process import would hit sys.modules
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import mutanalyzer_gui
+imported = time.perf_counter() - start
+startup = None
+if sys.argv[1] == 'gui':
+    app = mutanalyzer_gui.MutationAnalyzer()
+    app.root.update()
+    startup = time.perf_counter() - start
+    app.root.destroy()
+lazy = [name for name in sys.argv[2:] if name in sys.modules]
+print(json.dumps({'import_s': imported, 'startup_s': startup, 'eager_modules': lazy}))
+"""
+
+
+def measure_startup(repeat=3, gui=None):
+    # gui=None builds the window only where a display is available
+    if gui is None:
+        gui = sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY"))
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", STARTUP_PROBE, "gui" if gui else "import", *LAZY_MODULES],
+                             cwd=here, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    stats = {
+        'import_s': statistics.median(r['import_s'] for r in runs),
+        'startup_s': statistics.median(r['startup_s'] for r in runs) if gui else None,
+        'eager_modules': runs[-1]['eager_modules'],
+        'repeat': repeat,
+    }
+    return stats
+
+
+def check_budget(stats, import_budget=IMPORT_BUDGET_S, startup_budget=STARTUP_BUDGET_S):
+    violations = []
+    if stats['import_s'] > import_budget:
+        violations.append(f"GUI import {stats['import_s'] * 1000:.0f} ms > {import_budget * 1000:.0f} ms")
+    if stats['startup_s'] is not None and stats['startup_s'] > startup_budget:
+        violations.append(f"GUI startup {stats['startup_s'] * 1000:.0f} ms > {startup_budget * 1000:.0f} ms")
+    for name in stats['eager_modules']:
+        violations.append(f"{name} is imported at GUI startup")
+    return violations
+
+
+# Minus-strand CDS ATG AAA TGG TAA (M K W *) at 11-22 of a 32 bp reference,
+# as (genomic position, genomic alt, expected effect, expected change)
+MINUS_STRAND_CASES = [
+    (21, 'G', "Start lost", "M1T"),
+    (19, 'C', "Missense", "K2E"),
+    (17, 'C', "Silent", "K2K"),
+    (14, 'T', "Nonsense", "W3*"),
+    (13, 'G', "Stop lost", "*4Q"),
+]
+
+
+def check_annotations():
+    # Known consequences on a minus-strand transcript, checked on every run
+    # so a strand error cannot hide behind timings
+    from Bio.Seq import reverse_complement
+    from mutanalyzer_transcripts import Transcript, annotate_consequence
+    ref_seq = "A" * 10 + reverse_complement("ATGAAATGGTAA") + "A" * 10
+    transcript = Transcript("MINUS.1", [(11, 22)], [(11, 22)], strand=-1)
+    errors = []
+    for position, alt, effect, change in MINUS_STRAND_CASES:
+        mutation = {'position': position, 'type': 'SNP', 'ref': ref_seq[position - 1], 'alt': alt}
+        result = annotate_consequence(transcript, "Exon", 1, mutation, ref_seq, 1)
+        if (result['effect'], result.get('protein_change')) != (effect, change):
+            errors.append(f"minus strand {position}{mutation['ref']}>{alt}: {result['effect']} {result.get('protein_change')}, expected {effect} {change}")
+    return errors
+
+
+# ---------------------------------------------------------------------------
+# Runner, baseline comparison and CLI
+# ---------------------------------------------------------------------------
+
+def run_suite(sizes=None, repeat=3, divergence=0.01, indel_rate=0.001, only=None, seed=0):
+    results = {}
+    for length in sizes or DEFAULT_SIZES:
+        case = make_case(length, divergence, indel_rate, seed=seed)
+        for name, bench in BENCHMARKS.items():
+            if only and name not in only:
+                continue
+            stats = bench(case, repeat)
+            if stats is None:
+                continue
+            stats['length'] = length
+            results[f"{name}[{length}]"] = stats
+            print(f"  {name:<18} {length:>8} bp  {stats['median_s'] * 1000:>10.2f} ms  {stats['peak_kb']:>10.1f} KiB")
+    return {
+        'meta': {
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'divergence': divergence,
+            'indel_rate': indel_rate,
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for key, stats in report['results'].items():
+        base = baseline.get('results', {}).get(key)
+        if not base or not base.get('median_s'):
+            continue
+        ratio = stats['median_s'] / base['median_s']
+        stats['baseline_median_s'] = base['median_s']
+        stats['ratio'] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions.append((key, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MutAnalyzer Pro hot-path benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Reference lengths to benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--divergence", type=float, default=0.01, help="SNV rate of the synthetic sample")
+    parser.add_argument("--indel-rate", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_S, help="Max seconds for a cold GUI import")
+    parser.add_argument("--startup-budget", type=float, default=STARTUP_BUDGET_S, help="Max seconds to a built GUI window")
+    parser.add_argument("--no-startup", action="store_true", help="Skip the startup budget check")
+    args = parser.parse_args(argv)
+
+    print("🧬 MutAnalyzer Pro benchmarks")
+    report = run_suite(args.sizes, args.repeat, args.divergence, args.indel_rate, args.only, args.seed)
+    violations = []
+    if not args.no_startup:
+        report['startup'] = measure_startup(args.repeat)
+        startup = report['startup']['startup_s']
+        print(f"  {'gui_import':<18} {report['startup']['import_s'] * 1000:>21.2f} ms")
+        if startup is not None:
+            print(f"  {'gui_startup':<18} {startup * 1000:>21.2f} ms")
+        violations = check_budget(report['startup'], args.import_budget, args.startup_budget)
+        report['budget_violations'] = violations
+    report['annotation_errors'] = annotation_errors = check_annotations()
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+        report['regressions'] = [{'benchmark': key, 'ratio': round(ratio, 3)} for key, ratio in regressions]
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    for key, ratio in regressions:
+        print(f"❌ REGRESSION {key}: {ratio:.2f}x baseline")
+    for violation in violations:
+        print(f"❌ BUDGET {violation}")
+    for error in annotation_errors:
+        print(f"❌ ANNOTATION {error}")
+    return 1 if regressions or violations or annotation_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
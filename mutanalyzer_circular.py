@@ -0,0 +1,63 @@
+import numpy as np
+from Bio.Seq import reverse_complement
+
+from mutanalyzer_index import seed_span
+
+BAND = 16  # Seeds within this of the winning diagonal belong to the same placement
+CIRCLE_GAP = 100  # A sample that comes back to within this of its start is a whole circle
+
+
+def circular_placement(index, sample_seq):
+    # (strand, start) of a sample on a circular reference from seed votes,
+    # with diagonals taken modulo the genome length so seeds either side of
+    # the origin vote together. start is the 0-based reference position of
+    # the sample's first base in reference orientation; None if nothing seeds.
+    q, r, strand = index.anchors(sample_seq)
+    if not len(q):
+        return None
+    diag = np.where(strand == 0, r - q, r - (len(sample_seq) - index.k - q)) % len(index)
+    keys, votes = np.unique(np.stack([strand.astype(np.int64), diag]), axis=1, return_counts=True)
+    best_strand, best_diag = keys[:, votes.argmax()].tolist()
+    return best_strand, best_diag
+
+
+def reference_frame(ref_seq, sample_seq, index, fill_flanks=False):
+    # The sample rewritten to start at the reference origin, so one linear
+    # alignment against the unmodified reference covers it. Returns
+    # (sample, strand, offset, (first, last)): offset is the sample base at
+    # reference position 1, and first/last are the 1-based reference
+    # positions the sample covers (first > last when it wraps). A partial
+    # sample across the origin has the reference it does not cover filled
+    # in from the reference itself; fill_flanks does the same for one that
+    # does not wrap (as for Sanger traces).
+    placement = circular_placement(index, sample_seq)
+    if placement is None:
+        return None
+    strand, start = placement
+    if strand == 1:
+        sample_seq = reverse_complement(sample_seq)
+    length, n = len(ref_seq), len(sample_seq)
+    q, r, seed_strand = index.anchors(sample_seq)
+    forward = seed_strand == 0
+    raw = r - q
+    tail = forward & (np.abs(raw - start) <= BAND)  # Seeds before the origin
+    head = forward & (np.abs(raw - (start - length)) <= BAND)  # Seeds after it
+    if not head.any() and start + n <= length:
+        if fill_flanks:
+            # Each end placed from its own outermost seed, as for linear traces
+            first, last = seed_span(q[forward], r[forward], start, n, BAND)
+            if first < 0 or last > length:
+                first, last = start, start + n
+            return ref_seq[:first] + sample_seq + ref_seq[last:], strand, 0, (first + 1, last)
+        return sample_seq, strand, 0, (start + 1, start + n)
+    # The origin cut comes from the seed nearest to it before the origin, so
+    # an indel further back does not shift it
+    cut = length - start
+    if tail.any():
+        cut = int(length - raw[tail][r[tail].argmax()])
+    cut = min(max(cut, 0), n)
+    head_end = int((r[head] + index.k).max()) if head.any() else n - cut
+    if head_end >= start - CIRCLE_GAP:
+        # Whole circle: a plain rotation, nothing to fill
+        return sample_seq[cut:] + sample_seq[:cut], strand, cut % n, (1, length)
+    return sample_seq[cut:] + ref_seq[n - cut:length - cut] + sample_seq[:cut], strand, cut, (start + 1, n - cut)
@@ -0,0 +1,211 @@
+import json
+import os
+import tempfile
+from array import array
+from bisect import bisect_right
+
+import numpy as np
+
+from mutanalyzer_normalize import key_string, variant_key
+from mutanalyzer_transcripts import severity_rank
+
+COHORT_VERSION = 1
+
+
+def exon_number(mutation, exon_ranges=()):
+    # Exon label of a variant: from the isoform annotation when present,
+    # otherwise from the flat exon model (None outside exons)
+    for consequence in mutation.get('transcripts', ()):
+        feature, _, number = consequence.get('feature', "").partition(" ")
+        if feature == "Exon" and number.isdigit():
+            return int(number)
+    starts = [start for start, _ in exon_ranges]
+    i = bisect_right(starts, mutation['position']) - 1
+    if i >= 0 and mutation['position'] <= exon_ranges[i][1]:
+        return i + 1
+    return None
+
+
+class Cohort:
+    # Sample x variant incidence matrix in CSR form. Rows (samples) only ever
+    # grow, so indptr/indices live in flat typed arrays; the column-major
+    # view for "who carries X" is derived lazily and dropped on every add.
+    def __init__(self):
+        self.samples = []
+        self.sample_rows = {}
+        self.variants = []  # Per-variant metadata, indexed by column
+        self.variant_ids = {}  # key string -> column
+        self.indptr = array('q', [0])
+        self.indices = array('i')
+        self._columns = None
+
+    @property
+    def n_samples(self):
+        return len(self.samples)
+
+    @property
+    def n_variants(self):
+        return len(self.variants)
+
+    def variant_column(self, mutation, reference=""):
+        key = key_string((reference,) + variant_key(mutation))
+        column = self.variant_ids.get(key)
+        if column is None:
+            column = self.variant_ids[key] = len(self.variants)
+            self.variants.append({
+                'key': key,
+                'reference': reference,
+                'position': mutation['position'],
+                'end': mutation.get('end'),
+                'type': mutation['type'],
+                'ref': mutation['ref'],
+                'alt': mutation['alt'],
+                'region': mutation.get('region', ""),
+                'exon': None,
+                'effect': mutation.get('effect', ""),
+                'severity': mutation.get('severity', ""),
+            })
+        return column
+
+    def add_sample(self, name, mutations, reference="", exon_ranges=()):
+        if name in self.sample_rows:
+            raise ValueError(f"Sample '{name}' is already in the cohort")
+        columns = set()
+        for mutation in mutations:
+            column = self.variant_column(mutation, reference)
+            if self.variants[column]['exon'] is None:
+                self.variants[column]['exon'] = exon_number(mutation, exon_ranges)
+            columns.add(column)
+        self.indices.extend(sorted(columns))
+        self.indptr.append(len(self.indices))
+        self.sample_rows[name] = len(self.samples)
+        self.samples.append(name)
+        self._columns = None
+        return self.sample_rows[name]
+
+    def csr(self):
+        # NumPy copies of (indptr, indices); a live view would pin the
+        # growable arrays and make the next add_sample fail
+        return np.frombuffer(self.indptr, dtype=np.int64).copy(), np.frombuffer(self.indices, dtype=np.int32).copy()
+
+    def to_scipy(self):
+        from scipy.sparse import csr_matrix
+        indptr, indices = self.csr()
+        return csr_matrix((np.ones(len(indices), dtype=np.uint8), indices, indptr), shape=(self.n_samples, self.n_variants))
+
+    def row_of_entries(self):
+        indptr, _ = self.csr()
+        return np.repeat(np.arange(self.n_samples, dtype=np.int32), np.diff(indptr))
+
+    def counts(self):
+        return np.bincount(self.csr()[1], minlength=self.n_variants)
+
+    def frequencies(self):
+        if not self.n_samples:
+            return np.zeros(self.n_variants)
+        return self.counts() / self.n_samples
+
+    def _column_view(self):
+        if self._columns is None:
+            _, indices = self.csr()
+            order = np.argsort(indices, kind='stable')
+            col_ptr = np.searchsorted(indices[order], np.arange(self.n_variants + 1))
+            self._columns = (col_ptr, self.row_of_entries()[order])
+        return self._columns
+
+    def samples_with(self, key):
+        # Samples carrying a variant, by key string or column
+        column = self.variant_ids.get(key) if isinstance(key, str) else key
+        if column is None:
+            return []
+        col_ptr, rows = self._column_view()
+        return [self.samples[r] for r in rows[col_ptr[column]:col_ptr[column + 1]].tolist()]
+
+    def variants_of(self, sample):
+        indptr, indices = self.csr()
+        row = self.sample_rows[sample]
+        return [self.variants[c] for c in indices[indptr[row]:indptr[row + 1]].tolist()]
+
+    def query(self, min_frequency=0.0, region=None, exon=None, reference=None, effect=None, min_severity=None):
+        # Variants matching every given filter, most frequent first, as
+        # (metadata, count, frequency)
+        counts = self.counts()
+        frequencies = self.frequencies()
+        min_rank = severity_rank(min_severity) if min_severity else 0
+        hits = []
+        for column in np.flatnonzero(frequencies >= min_frequency).tolist():
+            variant = self.variants[column]
+            if region is not None and variant['region'] != region:
+                continue
+            if exon is not None and variant['exon'] != exon:
+                continue
+            if reference is not None and variant['reference'] != reference:
+                continue
+            if effect is not None and effect.lower() not in variant['effect'].lower():
+                continue
+            if min_rank and severity_rank(variant['severity']) < min_rank:
+                continue
+            hits.append((variant, int(counts[column]), float(frequencies[column])))
+        hits.sort(key=lambda hit: (-hit[1], hit[0]['position']))
+        return hits
+
+    def reference_burden(self, min_severity=None):
+        # Per-reference burden: {reference accession: per-sample count of
+        # qualifying variants}. Variants carry no gene of their own, so a
+        # reference (one gene region) is the unit.
+        min_rank = severity_rank(min_severity) if min_severity else 0
+        _, indices = self.csr()
+        rows = self.row_of_entries()
+        references = sorted({variant['reference'] for variant in self.variants})
+        result = {}
+        for reference in references:
+            mask = np.array([v['reference'] == reference and severity_rank(v['severity']) >= min_rank for v in self.variants], dtype=bool)
+            result[reference] = np.bincount(rows[mask[indices]], minlength=self.n_samples)
+        return result
+
+    def summary_text(self, top=10):
+        lines = ["👥 COHORT SUMMARY", f"   Samples: {self.n_samples}", f"   Distinct variants: {self.n_variants}"]
+        recurrent = [hit for hit in self.query() if hit[1] > 1][:top]
+        if recurrent:
+            lines.append("")
+            lines.append("🔁 MOST RECURRENT VARIANTS:")
+            for variant, count, frequency in recurrent:
+                label = f"{variant['reference']}:" if variant['reference'] else ""
+                lines.append(f"   {label}{variant['position']} {variant['ref']}>{variant['alt']} ({variant['type']}, {variant['effect']}) - {count} samples ({frequency:.1%})")
+        burden = self.reference_burden(min_severity="🟠")
+        if self.n_samples and burden:
+            lines.append("")
+            lines.append("📦 BURDEN PER REFERENCE (Medium/High variants per sample):")
+            for reference, per_sample in burden.items():
+                carriers = int(np.count_nonzero(per_sample))
+                lines.append(f"   {reference or 'reference'}: mean {per_sample.mean():.2f}, carriers {carriers}/{self.n_samples}")
+        return "\n".join(lines)
+
+    def save(self, path):
+        indptr, indices = self.csr()
+        meta = json.dumps({'version': COHORT_VERSION, 'samples': self.samples, 'variants': self.variants})
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".npz")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, indptr=indptr, indices=indices, meta=np.array(meta))
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != COHORT_VERSION:
+                raise ValueError(f"Unsupported cohort version {meta.get('version')}")
+            cohort = cls()
+            cohort.indptr = array('q', data['indptr'].astype(np.int64).tobytes())
+            cohort.indices = array('i', data['indices'].astype(np.int32).tobytes())
+        cohort.samples = meta['samples']
+        cohort.sample_rows = {name: i for i, name in enumerate(cohort.samples)}
+        cohort.variants = meta['variants']
+        cohort.variant_ids = {variant['key']: i for i, variant in enumerate(cohort.variants)}
+        return cohort
@@ -0,0 +1,97 @@
+import numpy as np
+
+from mutanalyzer_transcripts import severity_rank
+
+BASE_BIN = 16  # bp per bin at the finest precomputed level
+LEVEL_FACTOR = 4  # each coarser level merges this many bins
+TOP_LEVEL_BINS = 512  # stop once a level fits a screen
+SEVERE_RANK = severity_rank("🔴")
+
+
+class DensityPyramid:
+    # Variant counts binned at BASE_BIN, BASE_BIN*4, BASE_BIN*16... bp, so a
+    # view of any width reads at most a few thousand precomputed bins instead
+    # of every variant. Views finer than BASE_BIN per output bin are binned
+    # on the fly from the sorted positions in the visible range only.
+    def __init__(self, positions, length=0, weights=None, severe=None):
+        positions = np.asarray(positions, dtype=np.int64)
+        order = np.argsort(positions, kind='stable')
+        self.positions = positions[order]
+        self.weights = np.ones(len(positions), dtype=np.int64) if weights is None else np.asarray(weights, dtype=np.int64)[order]
+        self.severe = np.zeros(len(positions), dtype=bool) if severe is None else np.asarray(severe, dtype=bool)[order]
+        self.length = max(int(length), int(self.positions[-1]) if len(self.positions) else 0, 1)
+        self.total = int(self.weights.sum())
+        self.levels = []  # (bin width in bp, counts, severe counts)
+        n_bins = -(-self.length // BASE_BIN)
+        bins = (self.positions - 1) // BASE_BIN
+        counts = np.bincount(bins, weights=self.weights, minlength=n_bins).astype(np.int64)
+        severe_counts = np.bincount(bins, weights=self.weights * self.severe, minlength=n_bins).astype(np.int64)
+        width = BASE_BIN
+        while True:
+            self.levels.append((width, counts, severe_counts))
+            if len(counts) <= TOP_LEVEL_BINS:
+                break
+            pad = -len(counts) % LEVEL_FACTOR
+            counts = np.pad(counts, (0, pad)).reshape(-1, LEVEL_FACTOR).sum(axis=1)
+            severe_counts = np.pad(severe_counts, (0, pad)).reshape(-1, LEVEL_FACTOR).sum(axis=1)
+            width *= LEVEL_FACTOR
+
+    @classmethod
+    def from_mutations(cls, mutations, length=0):
+        return cls([m['position'] for m in mutations], length,
+                   severe=[severity_rank(m.get('severity', "")) >= SEVERE_RANK for m in mutations])
+
+    @classmethod
+    def from_cohort(cls, cohort, length=0):
+        # One entry per distinct variant, weighted by its number of carriers
+        return cls([v['position'] for v in cohort.variants], length, weights=cohort.counts(),
+                   severe=[severity_rank(v['severity']) >= SEVERE_RANK for v in cohort.variants])
+
+    def bins(self, start, end, n_bins):
+        # About n_bins bins covering [start, end] (1-based, inclusive) as
+        # (edges, counts, severe counts); edges are n+1 bp coordinates where
+        # bin i spans [edges[i], edges[i+1]).
+        start = max(1, int(start))
+        end = min(self.length, int(end))
+        span = end - start + 1
+        n_bins = max(1, min(int(n_bins), span))
+        per_bin = span / n_bins
+        if per_bin < BASE_BIN:
+            lo = np.searchsorted(self.positions, start)
+            hi = np.searchsorted(self.positions, end, side='right')
+            index = ((self.positions[lo:hi] - start) * n_bins) // span
+            weights = self.weights[lo:hi]
+            counts = np.bincount(index, weights=weights, minlength=n_bins).astype(np.int64)
+            severe_counts = np.bincount(index, weights=weights * self.severe[lo:hi], minlength=n_bins).astype(np.int64)
+            edges = start + np.arange(n_bins + 1) * per_bin
+            return edges, counts, severe_counts
+        # Coarsest level whose bins are no wider than an output bin, so every
+        # output bin sums at least one whole level bin
+        width, counts, severe_counts = next(level for level in reversed(self.levels) if level[0] <= per_bin)
+        first = (start - 1) // width
+        last = (end - 1) // width + 1
+        counts = counts[first:last]
+        severe_counts = severe_counts[first:last]
+        n_bins = min(n_bins, len(counts))
+        groups = (np.arange(n_bins) * len(counts)) // n_bins
+        edges = 1 + (first + np.append(groups, len(counts))) * width
+        return edges, np.add.reduceat(counts, groups), np.add.reduceat(severe_counts, groups)
+
+    def variants_in(self, start, end):
+        lo = np.searchsorted(self.positions, start)
+        hi = np.searchsorted(self.positions, end, side='right')
+        return self.positions[lo:hi], self.severe[lo:hi]
+
+
+def visible_blocks(ranges, start, end, bp_per_pixel):
+    # Sorted (start, end) ranges overlapping the view, with neighbours that
+    # would land within one pixel of each other merged into one block
+    blocks = []
+    for block_start, block_end in ranges:
+        if block_end < start or block_start > end:
+            continue
+        if blocks and block_start - blocks[-1][1] <= bp_per_pixel:
+            blocks[-1][1] = max(blocks[-1][1], block_end)
+        else:
+            blocks.append([block_start, block_end])
+    return [(max(s, start), min(e, end)) for s, e in blocks]
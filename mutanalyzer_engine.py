@@ -0,0 +1,1089 @@
+import csv
+from datetime import datetime
+from mutanalyzer_metrics import METRICS
+from mutanalyzer_normalize import adjacent_snp_groups, deduplicate, normalize_alleles
+from mutanalyzer_transcripts import TranscriptIndex, annotate_all, merge_ranges, transcripts_from_record, translate
+
+# Aligners, NumPy-backed indexes, read/trace input and the results database
+# are imported where they are first used, so importing the engine (and
+# starting the GUI) does not pay for Bio.pairwise2, NumPy or sqlite3.
+
+GLOBAL_ALGORITHM = "Global (Needleman-Wunsch)"
+LOCAL_ALGORITHM = "Local (Smith-Waterman)"
+SPLIT_ALGORITHM = "Split alignment (SV-aware)"
+LINEAR_ALGORITHM = "Global, linear space (Myers-Miller)"
+TILING_ALGORITHM = "Amplicon tiling (multi-FASTA)"
+GENETIC_CODES = {"Standard": 1, "Mitochondrial": 2}
+ALIGN_SCORING = (1, -1, -10, -1)  # match, mismatch, gap open, gap extend
+
+
+class MutationEngine:
+    # Headless core shared by the GUI, the benchmark suite and batch runs:
+    # sequences in, alignment, variant calls and annotations out.
+    def __init__(self):
+        self.exon_ranges = []
+        self.intron_ranges = []
+        self.transcripts = []
+        self.transcript_index = None
+        self.reference_accession = None  # accession.version of the fetched record
+        self.reference_digest = None  # sequence_digest of the sequence reference_accession names
+        self.reference_index = None  # Seed index over ref_seq, reused across samples
+        self.index_dir = None  # None -> MUTANALYZER_INDEX_DIR or ~/.mutanalyzer/index
+        self.mutations = []
+        self.variant_index = {}  # canonical variant key -> mutation record
+        self.structural_variants = []
+        self.ref_seq = ""
+        self.sample_seq = ""
+        self.aligned_ref = ""
+        self.aligned_sample = ""
+        self.alignment_score = 0
+        self.ungapped_triage = True  # Skip DP for same-length, SNV-only samples
+        self.workers = None  # Process pool size for parallel aligners; None -> all cores
+        self.cohort = None  # Variants accumulated across samples, see add_to_cohort
+        self.pileup = None  # Read pileup of the last FASTQ run
+        self.tiling = None  # Amplicon hits and coverage of the last tiling run
+        self.trace = None  # Last Sanger trace loaded by load_trace
+        self.gene_name = ""  # Gene symbol of the reference, used to key stored results
+        self.algorithm = ""  # How the current calls were made
+        self.results_path = None  # Results database; None -> ~/.mutanalyzer/results.db
+        self.results_store = None
+        self.use_memo = True  # Reuse annotations of variants already seen (mutanalyzer_memo)
+        self.memo_path = None  # Memo's shared disk tier; None -> MUTANALYZER_MEMO or ~/.mutanalyzer/annotations.db, ":memory:" for none
+        self.run_id = None  # Row of the current analysis in the results database
+        self.trace_coverage = None  # 1-based (start, end) of the reference the trace covers
+        self.ungapped_columns = None  # Mismatch columns when the triage path was taken
+        self.circular = False  # Circular genome (mtDNA, plasmid, viral): samples are rotated to its origin
+        self.circular_offset = None  # 0-based sample base at reference position 1 after rotation
+        self.chrom = None  # To store chromosome from NCBI fetch
+        self.genetic_code = "Standard"
+
+    def get_translation_table(self):
+        return GENETIC_CODES.get(self.genetic_code, 1)
+
+    def set_gene_model(self, exon_ranges):
+        # Flat exon/intron model; overlapping isoform exons are merged
+        self.transcripts = []
+        self.transcript_index = None
+        self.exon_ranges = merge_ranges(exon_ranges)
+        self.intron_ranges = []
+        for i in range(len(self.exon_ranges) - 1):
+            intron_start = self.exon_ranges[i][1] + 1
+            intron_end = self.exon_ranges[i + 1][0] - 1
+            if intron_start <= intron_end:
+                self.intron_ranges.append((intron_start, intron_end))
+
+    def set_transcripts(self, transcripts):
+        self.set_gene_model([exon for transcript in transcripts for exon in transcript.exons])
+        self.transcripts = transcripts
+        self.transcript_index = TranscriptIndex(transcripts) if transcripts else None
+
+    def load_genbank_record(self, record):
+        # Extract chromosome from features
+        for feature in record.features:
+            if feature.type == "source" and "chromosome" in feature.qualifiers:
+                self.chrom = feature.qualifiers["chromosome"][0]
+                break
+        else:
+            self.chrom = None  # Default if not found
+        self.set_reference_accession(record.id, str(record.seq))
+        self.circular = record.annotations.get("topology") == "circular"
+        self.gene_name = next((f.qualifiers["gene"][0] for f in record.features if f.type == "gene" and "gene" in f.qualifiers), record.name)
+        self.set_transcripts(transcripts_from_record(record))
+        return str(record.seq)
+
+    def set_reference_accession(self, accession, ref_seq):
+        from mutanalyzer_index import sequence_digest
+        self.reference_accession = accession
+        self.reference_digest = sequence_digest(ref_seq) if accession and ref_seq else None
+
+    def sync_reference(self, ref_seq):
+        # The accession only names the sequence it came with; a pasted or
+        # edited reference drops it, so indexes, memo entries and stored
+        # runs are not filed under the wrong record
+        from mutanalyzer_index import sequence_digest
+        if self.reference_accession and self.reference_digest and sequence_digest(ref_seq) != self.reference_digest:
+            self.reference_accession = None
+            self.reference_digest = None
+
+    def get_reference_index(self, ref_seq=None):
+        # Built once per reference. Fetched records are saved on disk under
+        # their accession.version and sequence digest and memory-mapped by
+        # later sessions; pasted references only live for this session.
+        from mutanalyzer_index import get_index, reference_key
+        ref_seq = ref_seq or self.ref_seq
+        self.sync_reference(ref_seq)
+        index = self.reference_index
+        if index is not None and index.key == reference_key(ref_seq, self.reference_accession) and len(index) == len(ref_seq):
+            return index
+        with METRICS.stage("index", items=len(ref_seq)):
+            self.reference_index = get_index(ref_seq, self.reference_accession, cache_dir=self.index_dir, persist=bool(self.reference_accession))
+        return self.reference_index
+
+    def locate(self, query, ref_seq=None):
+        # Exact hits of a primer/amplicon as (1-based start, strand) pairs
+        query = self.parse_fasta(query)
+        if not query:
+            return []
+        return self.get_reference_index(ref_seq).locate(query)
+
+    def add_to_cohort(self, sample_name, reference=None):
+        # Record the current (normalized) calls under sample_name
+        if self.cohort is None:
+            from mutanalyzer_cohort import Cohort
+            self.cohort = Cohort()
+        reference = reference if reference is not None else (self.reference_accession or "")
+        return self.cohort.add_sample(sample_name, self.mutations, reference, self.exon_ranges)
+
+    def validate_sequence(self, seq):
+        valid_nucleotides = set("ATCGN-RYKMSW")  # Two-base IUPAC codes carry Sanger heterozygotes
+        return all(c.upper() in valid_nucleotides for c in seq.strip())
+
+    def parse_fasta(self, text):
+        with METRICS.stage("parse", items=len(text)):
+            lines = text.strip().split('\n')
+            sequence = ""
+            for line in lines:
+                if not line.startswith('>'):
+                    sequence += line.strip().upper()
+            return sequence
+
+    def load_trace(self, path, ref_seq=None):
+        # Sanger ABI trace -> trimmed sample sequence with IUPAC het codes.
+        # Given a reference, the trace is placed on it (either strand) and
+        # the uncovered flanks are filled from the reference, so a global
+        # alignment reports absolute positions and nothing outside the read.
+        from mutanalyzer_sanger import SangerTrace, trace_sample
+        with METRICS.stage("parse") as span:
+            self.trace = SangerTrace.read(path)
+            sequence, _, het_positions = self.trace.calls()
+            span['items'] = len(self.trace.bases)
+        METRICS.count("heterozygous_bases", len(het_positions))
+        self.trace_coverage = None
+        if ref_seq:
+            placed = trace_sample(ref_seq.upper(), sequence, self.get_reference_index(ref_seq.upper()), self.circular)
+            if placed is None:
+                raise ValueError(f"Trace '{self.trace.name}' does not match the reference")
+            sequence, self.trace_coverage, _ = placed
+        return sequence
+
+    def compute_alignment(self, ref_seq, sample_seq, algorithm=GLOBAL_ALGORITHM):
+        with METRICS.stage("align", items=len(ref_seq) + len(sample_seq)):
+            match, mismatch, gap_open, gap_extend = ALIGN_SCORING
+            self.sync_reference(ref_seq)
+            self.algorithm = algorithm
+            self.run_id = None
+            self.structural_variants = []
+            self.ungapped_columns = None
+            self.tiling = None
+            self.circular_offset = None
+            if self.circular:
+                sample_seq = self.rotate_to_origin(ref_seq, sample_seq)
+            if self.ungapped_triage and algorithm in (GLOBAL_ALGORITHM, SPLIT_ALGORITHM):
+                from mutanalyzer_ungapped import ungapped_mismatches, ungapped_score
+                columns = ungapped_mismatches(ref_seq, sample_seq)
+                if columns is not None:
+                    METRICS.count("ungapped_fast_path")
+                    self.ref_seq = ref_seq
+                    self.sample_seq = sample_seq
+                    self.aligned_ref = ref_seq
+                    self.aligned_sample = sample_seq
+                    self.ungapped_columns = columns
+                    self.alignment_score = ungapped_score(len(ref_seq), len(columns), ALIGN_SCORING)
+                    return self.alignment_score
+            if algorithm == SPLIT_ALGORITHM:
+                import mutanalyzer_sv
+                split = mutanalyzer_sv.split_align(ref_seq, sample_seq, ALIGN_SCORING, index=self.get_reference_index(ref_seq))
+                if split is not None:
+                    self.ref_seq = ref_seq
+                    self.sample_seq = sample_seq
+                    self.aligned_ref, self.aligned_sample, self.structural_variants = split
+                    self.alignment_score = mutanalyzer_sv.score_alignment(self.aligned_ref, self.aligned_sample, ALIGN_SCORING)
+                    return self.alignment_score
+                # No anchors to chain: fall back to a plain global alignment
+            if algorithm == LINEAR_ALGORITHM:
+                # Exact global optimum without the O(n*m) matrix
+                from mutanalyzer_linear import align_linear
+                self.ref_seq = ref_seq
+                self.sample_seq = sample_seq
+                self.aligned_ref, self.aligned_sample, self.alignment_score = align_linear(ref_seq, sample_seq, ALIGN_SCORING, self.workers)
+                return self.alignment_score
+            from Bio import pairwise2
+            if algorithm in (GLOBAL_ALGORITHM, SPLIT_ALGORITHM):
+                alignments = pairwise2.align.globalms(ref_seq, sample_seq, match, mismatch, gap_open, gap_extend, one_alignment_only=True)
+            else:
+                alignments = pairwise2.align.localms(ref_seq, sample_seq, match, mismatch, gap_open, gap_extend, one_alignment_only=True)
+            if not alignments:
+                raise ValueError("No valid alignment generated")
+            best_alignment = alignments[0]
+            self.ref_seq = ref_seq
+            self.sample_seq = sample_seq
+            self.aligned_ref = best_alignment.seqA
+            self.aligned_sample = best_alignment.seqB
+            self.alignment_score = best_alignment.score
+            return best_alignment.score
+
+    def rotate_to_origin(self, ref_seq, sample_seq):
+        # Circular references: the sample is turned to reference orientation
+        # and rotated to start at the origin (seeds vote modulo the genome
+        # length), so one linear alignment replaces aligning against a
+        # doubled reference. Unseeded samples are aligned as given.
+        from mutanalyzer_circular import reference_frame
+        framed = reference_frame(ref_seq.upper(), sample_seq, self.get_reference_index(ref_seq.upper()))
+        if framed is None:
+            return sample_seq
+        sample_seq, _, self.circular_offset, _ = framed
+        return sample_seq
+
+    def call_mutations(self):
+        with METRICS.stage("call") as span:
+            self.mutations = []
+            if self.ungapped_columns is not None:
+                # Column i is reference position i + 1; only mismatches to visit
+                for i in self.ungapped_columns.tolist():
+                    self.mutations.extend(self.call_snv(i + 1, self.aligned_ref[i], self.aligned_sample[i]))
+            elif self.tiling is not None:
+                self.call_tiles()
+            else:
+                self.walk_alignment()
+            if self.structural_variants:
+                self.merge_structural_variants()
+            if self.circular and self.ref_seq:
+                self.wrap_origin()
+            self.normalize_mutations()
+            if self.transcript_index:
+                self.annotate_transcripts()
+            if self.tiling is not None:
+                for mutation in self.mutations:
+                    depth, alt_hits = self.tiling.support(mutation)
+                    mutation['depth'] = depth
+                    mutation['alt_reads'] = alt_hits
+                    mutation['allele_fraction'] = round(alt_hits / depth, 3) if depth else 0.0
+            span['items'] = len(self.mutations)
+            return self.mutations
+
+    def wrap_origin(self):
+        # On a circle, bases inserted before reference position 1 follow
+        # the last base
+        length = len(self.ref_seq)
+        for i, mutation in enumerate(self.mutations):
+            if mutation['type'] == 'Insertion' and mutation['position'] == 0:
+                self.mutations[i] = self.analyze_insertion(length, mutation['alt'], len(mutation['alt']))
+        self.mutations.sort(key=lambda m: m['position'])
+
+    def walk_alignment(self):
+        ref_pos = 0
+        i = 0
+        while i < min(len(self.aligned_ref), len(self.aligned_sample)):
+            ref_base = self.aligned_ref[i]
+            alt_base = self.aligned_sample[i]
+            if ref_base != '-':
+                ref_pos += 1
+            if ref_base != '-' and alt_base != '-' and ref_base != alt_base:
+                self.mutations.extend(self.call_snv(ref_pos, ref_base, alt_base))
+            elif ref_base != '-' and alt_base == '-':
+                del_length, del_seq = self.get_deletion_info(i, self.aligned_ref, self.aligned_sample)
+                mutation = self.analyze_deletion(ref_pos, del_seq, del_length)
+                if mutation:
+                    self.mutations.append(mutation)
+                ref_pos += del_length - 1  # The run's other reference bases
+                i += del_length - 1
+            elif ref_base == '-' and alt_base != '-':
+                ins_length, ins_seq = self.get_insertion_info(i, self.aligned_ref, self.aligned_sample)
+                mutation = self.analyze_insertion(ref_pos, ins_seq, ins_length)
+                if mutation:
+                    self.mutations.append(mutation)
+                i += ins_length - 1
+            i += 1
+
+    def call_tiles(self):
+        # Calls from every amplicon hit rather than the stitched view, so a
+        # variant seen only where two amplicons overlap is still reported
+        for mut_type, position, ref, alt in self.tiling.events():
+            if mut_type == 'SNP':
+                self.mutations.extend(self.call_snv(position, ref, alt))
+                continue
+            if mut_type == 'Deletion':
+                mutation = self.analyze_deletion(position, ref, len(ref))
+            else:
+                mutation = self.analyze_insertion(position, alt, len(alt))
+            if mutation:
+                self.mutations.append(mutation)
+        self.mutations.sort(key=lambda m: m['position'])
+
+    def call_snv(self, position, ref_base, alt_base):
+        # An IUPAC sample base is a heterozygote: one record per non-reference
+        # allele, tagged with its genotype
+        from mutanalyzer_sanger import genotype_alleles
+        alts, genotype = genotype_alleles(ref_base, alt_base)
+        calls = []
+        for alt in alts:
+            mutation = self.analyze_snp(position, ref_base, alt)
+            if mutation:
+                if genotype != "1/1":
+                    mutation['genotype'] = genotype
+                calls.append(mutation)
+        return calls
+
+    def call_from_reads(self, fastq_path, ref_seq=None, min_depth=None, min_fraction=None, min_quality=None, progress=None):
+        # Amplicon mode: map FASTQ reads to the reference, pile them up and
+        # call SNVs/indels by allele fraction, then annotate as usual.
+        # Thresholds default to the mutanalyzer_pileup constants.
+        from mutanalyzer_pileup import MIN_ALLELE_FRACTION, MIN_BASE_QUALITY, MIN_DEPTH, pileup_fastq
+        min_depth = MIN_DEPTH if min_depth is None else min_depth
+        min_fraction = MIN_ALLELE_FRACTION if min_fraction is None else min_fraction
+        min_quality = MIN_BASE_QUALITY if min_quality is None else min_quality
+        ref_seq = (ref_seq or self.ref_seq).upper()
+        if not ref_seq:
+            raise ValueError("A reference sequence is required")
+        self.ref_seq = ref_seq
+        self.sample_seq = ""
+        self.aligned_ref = self.aligned_sample = ""
+        self.ungapped_columns = None
+        self.structural_variants = []
+        self.tiling = None
+        self.algorithm = "Read pileup"
+        self.run_id = None
+        # Pool workers memory-map the saved index rather than rebuilding it
+        index_dir = self.get_reference_index(ref_seq).directory
+        with METRICS.stage("pileup", items=0) as span:
+            self.pileup = pileup_fastq(fastq_path, ref_seq, self.workers, index_dir=index_dir, min_quality=min_quality, progress=progress, circular=self.circular)
+            span['items'] = self.pileup.reads
+        METRICS.gauge("reads_mapped_fraction", self.pileup.mapped / self.pileup.reads if self.pileup.reads else 0.0)
+        with METRICS.stage("call") as span:
+            self.mutations = []
+            depth = self.pileup.depth()
+            called = {}  # (position, type, ref, alt) -> what the caller measured
+            for mut_type, position, ref, alt, site_depth, alt_reads, quality in self.pileup.call(ref_seq, min_depth, min_fraction, depth):
+                called[(position, mut_type, ref, alt)] = (site_depth, alt_reads, quality)
+                if mut_type == 'SNP':
+                    mutation = self.analyze_snp(position, ref, alt)
+                elif mut_type == 'Deletion':
+                    mutation = self.analyze_deletion(position, ref, len(ref))
+                else:
+                    mutation = self.analyze_insertion(position, alt, len(alt))
+                if mutation:
+                    self.mutations.append(mutation)
+            self.mutations.sort(key=lambda m: m['position'])
+            self.normalize_mutations()
+            if self.transcript_index:
+                self.annotate_transcripts()
+            for mutation in self.mutations:
+                # Records normalization merged or moved are looked up again
+                key = (mutation['position'], mutation['type'], mutation['ref'], mutation['alt'])
+                site_depth, alt_reads, quality = called.get(key) or self.pileup.support(mutation, depth) + (None,)
+                mutation['depth'] = site_depth
+                mutation['alt_reads'] = alt_reads
+                mutation['allele_fraction'] = round(alt_reads / site_depth, 3) if site_depth else 0.0
+                if quality is not None:
+                    mutation['mean_quality'] = round(quality, 1)
+            span['items'] = len(self.mutations)
+            return self.mutations
+
+    def tile_amplicons(self, amplicons, ref_seq=None, min_score=None, progress=None):
+        # Multi-amplicon mode: each (name, sequence) is placed by seed votes
+        # and aligned locally around its candidate diagonals, keeping every
+        # non-overlapping hit above min_score (paralogs included), then the
+        # calls of all hits are merged with their amplicon depth.
+        from mutanalyzer_tiling import tile_amplicons
+        ref_seq = (ref_seq or self.ref_seq).upper()
+        if not ref_seq:
+            raise ValueError("A reference sequence is required")
+        amplicons = [(name, seq.upper()) for name, seq in amplicons]
+        if not amplicons:
+            raise ValueError("No amplicon sequences found")
+        for name, seq in amplicons:
+            if not self.validate_sequence(seq):
+                raise ValueError(f"Amplicon '{name}' contains invalid characters")
+        index_dir = self.get_reference_index(ref_seq).directory
+        with METRICS.stage("align", items=sum(len(seq) for _, seq in amplicons)):
+            self.tiling = tile_amplicons(amplicons, ref_seq, ALIGN_SCORING, self.workers, index_dir=index_dir, min_score=min_score, progress=progress)
+            self.ref_seq = ref_seq
+            self.aligned_ref, self.aligned_sample = self.tiling.stitch()
+            self.sample_seq = self.aligned_sample.replace('-', '')
+            self.alignment_score = sum(hit['score'] for hit in self.tiling.hits)
+            self.ungapped_columns = None
+            self.structural_variants = []
+            self.pileup = None
+            self.algorithm = TILING_ALGORITHM
+            self.run_id = None
+        METRICS.gauge("amplicons_placed_fraction", self.tiling.placed / self.tiling.amplicons)
+        return self.call_mutations()
+
+    def get_results_store(self):
+        if self.results_store is None:
+            from mutanalyzer_store import ResultsStore
+            self.results_store = ResultsStore(self.results_path)
+        return self.results_store
+
+    def seen_before(self, position, ref=None, alt=None):
+        # Stored calls of a variant on this same reference sequence
+        from mutanalyzer_index import sequence_digest
+        return self.get_results_store().seen(sequence_digest(self.ref_seq), position, ref, alt)
+
+    def get_annotation_memo(self):
+        if not self.use_memo:
+            return None
+        from mutanalyzer_memo import get_memo
+        return get_memo(self.memo_path)
+
+    def annotate_transcripts(self):
+        # Isoform-aware consequences of the current calls, reusing those of
+        # variants any sample on this reference has had before. The memo
+        # key's reference part carries the sequence digest, not just the
+        # accession (see reference_key).
+        from mutanalyzer_index import reference_key
+        memo = self.get_annotation_memo()
+        annotate_all(self.transcript_index, self.mutations, self.ref_seq, self.get_translation_table(), memo, reference_key(self.ref_seq, self.reference_accession))
+        if memo:
+            memo.flush()
+
+    def record_run(self, sample_name="sample"):
+        # Save the current calls; recording again (e.g. after pathogenicity
+        # scoring) rewrites the same run rather than adding a new one
+        with METRICS.stage("export", items=len(self.mutations)):
+            sample = {'name': sample_name, 'sequence': self.sample_seq, 'aligned_ref': self.aligned_ref, 'aligned_sample': self.aligned_sample, 'score': self.alignment_score, 'mutations': self.mutations}
+            self.run_id = self.get_results_store().save_run(
+                self.ref_seq, [sample], self.gene_name, self.reference_accession, self.algorithm, self.genetic_code,
+                self.exon_ranges, self.build_summary(), run_id=self.run_id)
+        return self.run_id
+
+    def record_batch(self, ref_seq, results, algorithm=""):
+        # One run holding every successful sample of a batch (e.g. a plate),
+        # written in a single transaction
+        samples = [{'name': r['sample'], 'mutations': r['mutations']} for r in results if not r.get('error')]
+        with METRICS.stage("export", items=sum(len(s['mutations']) for s in samples)):
+            return self.get_results_store().save_run(ref_seq, samples, self.gene_name, self.reference_accession, algorithm, self.genetic_code, self.exon_ranges)
+
+    def open_run(self, run_id, sample_index=0):
+        # Restore a stored analysis as the current one. Isoform models are not
+        # stored; the per-variant transcript annotations are.
+        with METRICS.stage("parse"):
+            run = self.get_results_store().load_run(run_id)
+            sample = run['samples'][sample_index] if run['samples'] else {}
+            self.set_gene_model(run['exon_ranges'])
+            self.gene_name = run['gene']
+            self.set_reference_accession(run['accession'], run['ref_seq'])
+            self.genetic_code = run['genetic_code'] or self.genetic_code
+            self.algorithm = run['algorithm'] or ""
+            self.ref_seq = run['ref_seq']
+            self.sample_seq = sample.get('sequence') or ""
+            self.aligned_ref = sample.get('aligned_ref') or ""
+            self.aligned_sample = sample.get('aligned_sample') or ""
+            self.alignment_score = sample.get('score') or 0
+            self.mutations = sample.get('mutations', [])
+            self.ungapped_columns = None
+            self.structural_variants = []
+            self.pileup = None
+            self.tiling = None
+            self.run_id = run_id
+        return run
+
+    def save_session(self, path, sample_name=None):
+        from mutanalyzer_session import write_session
+        with METRICS.stage("export", items=len(self.mutations)):
+            state = {name: getattr(self, name) for name in (
+                'ref_seq', 'sample_seq', 'aligned_ref', 'aligned_sample', 'alignment_score', 'mutations', 'exon_ranges',
+                'transcripts', 'gene_name', 'reference_accession', 'chrom', 'algorithm', 'genetic_code', 'trace_coverage', 'circular')}
+            state['sample_name'] = sample_name or (self.trace.name if self.trace is not None else "sample")
+            return write_session(path, state)
+
+    def open_session(self, path):
+        # Restore a saved analysis without fetching, aligning or calling;
+        # unlike open_run this keeps the isoform models
+        from mutanalyzer_session import read_session
+        with METRICS.stage("parse"):
+            session = read_session(path)
+            header = session['header']
+            if session['transcripts']:
+                self.set_transcripts(session['transcripts'])
+            else:
+                self.set_gene_model(session['exon_ranges'])
+            self.gene_name = header['gene']
+            self.set_reference_accession(header['accession'], session['ref_seq'])
+            self.chrom = header['chrom']
+            self.circular = header.get('circular', False)
+            self.genetic_code = header['genetic_code']
+            self.algorithm = header['algorithm']
+            self.ref_seq = session['ref_seq']
+            self.sample_seq = session['sample_seq']
+            self.aligned_ref = session['aligned_ref']
+            self.aligned_sample = session['aligned_sample']
+            self.alignment_score = header['score']
+            self.mutations = session['mutations']
+            self.variant_index = {}
+            self.trace_coverage = tuple(header['trace_coverage']) if header['trace_coverage'] else None
+            self.ungapped_columns = None
+            self.structural_variants = []
+            self.pileup = None
+            self.tiling = None
+            self.trace = None
+            self.reference_index = None
+            self.run_id = None
+        return header
+
+    def merge_structural_variants(self):
+        # The stitched alignment shows each DEL/DUP/INS as one long gap run;
+        # swap those walk records for the SV records.
+        replaced = {event['walk'] for event in self.structural_variants if event['walk']}
+        self.mutations = [m for m in self.mutations if (m['position'], m['type']) not in replaced]
+        self.mutations.extend(self.analyze_structural_variant(event) for event in self.structural_variants)
+        self.mutations.sort(key=lambda m: m['position'])
+
+    def normalize_mutations(self):
+        # Trim and left-align indels and MNVs against the reference (pairwise2
+        # places gaps in repeats arbitrarily), merge adjacent SNPs into MNVs and drop
+        # duplicate records, so every variant has one canonical key.
+        normalized = []
+        for group in adjacent_snp_groups(self.mutations):
+            mutation = group[0]
+            if len(group) > 1:
+                mutation = self.analyze_mnv(mutation['position'], "".join(m['ref'] for m in group), "".join(m['alt'] for m in group))
+            elif 'end' not in mutation and self.ref_seq and mutation['type'] in ('MNV', 'Deletion', 'Insertion'):
+                mutation = self.normalize_record(mutation)
+            if mutation:
+                normalized.append(mutation)
+        self.mutations, self.variant_index = deduplicate(normalized)
+        return self.mutations
+
+    def normalize_record(self, mutation):
+        # Trimmed, left-aligned record; re-annotated only when that moved it
+        start = mutation['position'] + 1 if mutation['type'] == 'Insertion' else mutation['position']
+        position, ref, alt, mut_type = normalize_alleles(self.ref_seq, start, mutation['ref'], mutation['alt'])
+        if (position, ref, alt, mut_type) == (mutation['position'], mutation['ref'], mutation['alt'], mutation['type']):
+            return mutation
+        if mut_type == 'SNP':
+            return self.analyze_snp(position, ref, alt)
+        if mut_type == 'MNV':
+            return self.analyze_mnv(position, ref, alt)
+        if mut_type == 'Deletion':
+            return self.analyze_deletion(position, ref, len(ref))
+        if mut_type == 'Insertion':
+            return self.analyze_insertion(position, alt, len(alt))
+        return None  # Alleles identical once trimmed
+
+    def get_deletion_info(self, start_pos, ref_seq, alt_seq):
+        del_seq = ""
+        length = 0
+        pos = start_pos
+        while pos < len(ref_seq) and pos < len(alt_seq) and ref_seq[pos] != '-' and alt_seq[pos] == '-':
+            del_seq += ref_seq[pos]
+            length += 1
+            pos += 1
+        return length, del_seq if length > 0 else ("", 0)
+
+    def get_insertion_info(self, start_pos, ref_seq, alt_seq):
+        ins_seq = ""
+        length = 0
+        pos = start_pos
+        while pos < len(ref_seq) and pos < len(alt_seq) and ref_seq[pos] == '-' and alt_seq[pos] != '-':
+            ins_seq += alt_seq[pos]
+            length += 1
+            pos += 1
+        return length, ins_seq if length > 0 else ("", 0)
+
+    def get_region(self, position):
+        for start, end in self.exon_ranges:
+            if start <= position <= end:
+                return "Exon"
+        for start, end in self.intron_ranges:
+            if start <= position <= end:
+                return "Intron"
+        return "Intergenic"
+
+    def analyze_snp(self, position, ref_base, alt_base):
+        if not ref_base or not alt_base or ref_base == alt_base:
+            return None
+        region = self.get_region(position)
+        effect = "Substitution"
+        severity = "🟢 Low"
+        frameshift = "No"
+        sift = "-"
+        polyphen = "-"
+        if region == "Exon" and not self.transcript_index:  # Isoform-aware annotation runs after the walk
+            effect, severity = self.analyze_coding_effect(position, ref_base, alt_base)
+        elif region == "Intron":
+            effect = "Intronic"
+            severity = "⚪ Minimal"
+        return {
+            'position': position,
+            'ref': ref_base,
+            'alt': alt_base,
+            'type': 'SNP',
+            'region': region,
+            'effect': effect,
+            'frameshift': frameshift,
+            'severity': severity,
+            'sift': sift,
+            'polyphen': polyphen
+        }
+
+    def analyze_mnv(self, position, ref, alt):
+        region = self.get_region(position)
+        effect = "Substitution"
+        severity = "🟢 Low"
+        if region == "Exon" and not self.transcript_index:
+            effect, severity = self.analyze_codon_change(position, ref, alt)
+        elif region == "Intron":
+            effect = "Intronic"
+            severity = "⚪ Minimal"
+        return {
+            'position': position,
+            'ref': ref,
+            'alt': alt,
+            'type': 'MNV',
+            'region': region,
+            'effect': effect,
+            'frameshift': "No",
+            'severity': severity,
+            'sift': '-',
+            'polyphen': '-'
+        }
+
+    def analyze_codon_change(self, position, ref, alt):
+        # Codon-level effect of a multi-base substitution, reading frame taken
+        # from the start of the exon it falls in
+        exon_start = next((start for start, end in self.exon_ranges if start <= position <= end), None)
+        if exon_start is None or not self.ref_seq:
+            return "Unknown", "⚪ Minimal"
+        codon_start = position - (position - exon_start) % 3
+        last = position + len(ref) - 1
+        codon_end = last + 2 - (last - exon_start) % 3
+        ref_codons = self.ref_seq[codon_start - 1:codon_end]
+        offset = position - codon_start
+        alt_codons = ref_codons[:offset] + alt + ref_codons[offset + len(alt):]
+        if len(ref_codons) % 3 or len(ref_codons) != len(alt_codons):
+            return "Unknown", "⚪ Minimal"
+        table = self.get_translation_table()
+        ref_aa = translate(ref_codons, table)
+        alt_aa = translate(alt_codons, table)
+        if ref_aa == alt_aa:
+            return "Silent", "🟢 Low"
+        elif '*' in alt_aa and '*' not in ref_aa:
+            return "Nonsense", "🔴 High"
+        return "Missense", "🟠 Medium"
+
+    def analyze_deletion(self, position, del_seq, length):
+        if length == 0:
+            return None
+        region = self.get_region(position)
+        effect = "Deletion"
+        severity = "🟠 Medium"
+        frameshift = "No"
+        if region == "Exon" and length > 0:
+            if length % 3 == 0:
+                effect = "In-frame deletion"
+                severity = "🟠 Medium"
+            else:
+                effect = "Frameshift deletion"
+                severity = "🔴 High"
+                frameshift = "Yes"
+        return {
+            'position': position,
+            'ref': del_seq,
+            'alt': '-',
+            'type': 'Deletion',
+            'region': region,
+            'effect': effect,
+            'frameshift': frameshift,
+            'severity': severity,
+            'sift': '-',
+            'polyphen': '-'
+        }
+
+    def analyze_insertion(self, position, ins_seq, length):
+        if length == 0:
+            return None
+        region = self.get_region(position)
+        effect = "Insertion"
+        severity = "🟠 Medium"
+        frameshift = "No"
+        if region == "Exon" and length > 0:
+            if length % 3 == 0:
+                effect = "In-frame insertion"
+                severity = "🟠 Medium"
+            else:
+                effect = "Frameshift insertion"
+                severity = "🔴 High"
+                frameshift = "Yes"
+        return {
+            'position': position,
+            'ref': '-',
+            'alt': ins_seq,
+            'type': 'Insertion',
+            'region': region,
+            'effect': effect,
+            'frameshift': frameshift,
+            'severity': severity,
+            'sift': '-',
+            'polyphen': '-'
+        }
+
+    def analyze_structural_variant(self, event):
+        sv_types = {
+            'DEL': ('Deletion', "Large deletion"),
+            'DUP': ('Duplication', "Tandem duplication"),
+            'INS': ('Insertion', "Large insertion"),
+            'INV': ('Inversion', "Inversion"),
+        }
+        mut_type, effect = sv_types[event['sv_type']]
+        start, end = event['start'], max(event['start'], event['end'])
+        exons_hit = [(s, e) for s, e in self.exon_ranges if s <= end and start <= e]
+        exonic_bases = sum(min(e, end) - max(s, start) + 1 for s, e in exons_hit)
+        frameshift = "No"
+        if exons_hit:
+            region = "Exon"
+            effect += f" ({len(exons_hit)} exon{'s' if len(exons_hit) > 1 else ''})"
+            severity = "🔴 High"
+            if event['sv_type'] == 'INS':
+                exonic_bases = event['length']
+            if event['sv_type'] != 'INV' and exonic_bases % 3 != 0:
+                frameshift = "Yes"
+        else:
+            region = self.get_region(start)
+            severity = "⚪ Minimal" if region == "Intron" else "🟢 Low"
+        ref_base = self.ref_seq[start - 1] if 0 < start <= len(self.ref_seq) else 'N'
+        return {
+            'position': event['position'],
+            'ref': ref_base,
+            'alt': f"<{event['sv_type']}>",
+            'type': mut_type,
+            'region': region,
+            'effect': effect,
+            'frameshift': frameshift,
+            'severity': severity,
+            'sift': '-',
+            'polyphen': '-',
+            'end': event['end'],
+            'length': event['length']
+        }
+
+    def analyze_coding_effect(self, position, ref_base, alt_base):
+        try:
+            codon_pos = self.get_codon_position(position)
+            if codon_pos == -1:
+                return "Non-coding", "⚪ Minimal"
+            ref_codon = self.get_codon_at_position(position, ref_base, is_ref=True)
+            alt_codon = self.get_codon_at_position(position, alt_base, is_ref=False)
+            table = self.get_translation_table()
+            if len(ref_codon) == 3 and len(alt_codon) == 3:
+                ref_aa = translate(ref_codon, table)
+                alt_aa = translate(alt_codon, table)
+                if ref_aa == alt_aa:
+                    return "Silent", "🟢 Low"
+                elif alt_aa == '*':
+                    return "Nonsense", "🔴 High"
+                else:
+                    return "Missense", "🟠 Medium"
+            return "Unknown", "⚪ Minimal"
+        except Exception:
+            return "Unknown", "⚪ Minimal"
+
+    def get_codon_position(self, position):
+        for start, end in self.exon_ranges:
+            if start <= position <= end:
+                return ((position - start) % 3) + 1
+        return -1
+
+    def get_codon_at_position(self, position, base, is_ref=True):
+        # The alt codon is the reference codon with the called base put in:
+        # the sample may hold an IUPAC het code there, which translates to X
+        try:
+            seq = self.aligned_ref
+            unaligned_pos = 0
+            aligned_pos = 0
+            for i, char in enumerate(seq):
+                if char != '-':
+                    unaligned_pos += 1
+                if unaligned_pos == position:
+                    aligned_pos = i
+                    break
+            codon_start = (aligned_pos // 3) * 3
+            codon = seq[codon_start:codon_start + 3]
+            if not is_ref:
+                offset = aligned_pos - codon_start
+                codon = codon[:offset] + base + codon[offset + 1:]
+            codon = codon.replace('-', '')
+            if len(codon) < 3:
+                codon += 'N' * (3 - len(codon))
+            return codon
+        except Exception:
+            return "NNN"
+
+    def score_pathogenicity(self):
+        with METRICS.stage("annotate") as span:
+            missense_mutations = [m for m in self.mutations if m['effect'] == 'Missense' and m['type'] == 'SNP']
+            table = self.get_translation_table()
+            # Local pathogenicity prediction logic
+            for mut in missense_mutations:
+                position = mut['position']
+                if 'protein_change' in mut:  # Set by transcript-aware annotation, e.g. "R12W"
+                    ref_aa, alt_aa = mut['protein_change'][0], mut['protein_change'][-1]
+                else:
+                    ref_codon = self.get_codon_at_position(position, mut['ref'], is_ref=True)
+                    alt_codon = self.get_codon_at_position(position, mut['alt'], is_ref=False)
+                    ref_aa = translate(ref_codon, table)
+                    alt_aa = translate(alt_codon, table)
+
+                # Simplified SIFT-like score (conservation-based)
+                conservation_score = self.calculate_conservation_score(ref_aa)
+                sift_score = 1.0 - (conservation_score / 100.0)  # Inverse relation, 0-1 scale
+                sift_pred = "Tolerated" if sift_score > 0.05 else "Deleterious"
+
+                # PolyPhen-like score (Grantham distance for physicochemical difference)
+                polyphen_score = self.calculate_grantham_distance(ref_aa, alt_aa)
+                polyphen_pred = "Benign" if polyphen_score < 50 else "Possibly Damaging" if polyphen_score < 100 else "Probably Damaging"
+
+                mut['sift'] = f"{sift_pred} ({sift_score:.2f})"
+                mut['polyphen'] = f"{polyphen_pred} ({polyphen_score:.2f})"
+            span['items'] = len(missense_mutations)
+            return missense_mutations
+
+    def protein_consequences(self):
+        # HGVS p. view of the sample on every coding transcript (or on the
+        # flat exon model), from the current alignment
+        from mutanalyzer_protein import coding_models, protein_consequence, sample_cells
+        if not self.aligned_ref:
+            return []
+        with METRICS.stage("annotate") as span:
+            cells = sample_cells(self.aligned_ref, self.aligned_sample)
+            table = self.get_translation_table()
+            models = coding_models(self.transcripts, self.exon_ranges, len(self.ref_seq))
+            span['items'] = len(models)
+            return [protein_consequence(transcript, self.ref_seq, cells, table) for transcript in models]
+
+    def calculate_conservation_score(self, aa):
+        # Simplified conservation score based on frequency of amino acids (hypothetical values)
+        conservation = {
+            'A': 80, 'C': 70, 'D': 60, 'E': 60, 'F': 50, 'G': 90, 'H': 60, 'I': 50,
+            'K': 60, 'L': 50, 'M': 50, 'N': 60, 'P': 70, 'Q': 60, 'R': 60, 'S': 70,
+            'T': 70, 'V': 60, 'W': 40, 'Y': 50
+        }
+        return conservation.get(aa, 50)  # Default to 50 if amino acid not found
+
+    def calculate_grantham_distance(self, ref_aa, alt_aa):
+        # Grantham distance matrix (simplified values based on physicochemical properties)
+        grantham_matrix = {
+            ('A', 'A'): 0, ('A', 'C'): 195, ('A', 'D'): 126, ('A', 'E'): 153, ('A', 'F'): 176,
+            ('A', 'G'): 60, ('A', 'H'): 90, ('A', 'I'): 94, ('A', 'K'): 135, ('A', 'L'): 145,
+            ('A', 'M'): 140, ('A', 'N'): 111, ('A', 'P'): 67, ('A', 'Q'): 147, ('A', 'R'): 112,
+            ('A', 'S'): 99, ('A', 'T'): 86, ('A', 'V'): 64, ('A', 'W'): 191, ('A', 'Y'): 160,
+            ('C', 'C'): 0, ('C', 'D'): 170, ('C', 'E'): 197, ('C', 'F'): 165, ('C', 'G'): 149,
+            ('D', 'D'): 0, ('D', 'E'): 45, ('D', 'F'): 162, ('D', 'G'): 94, ('D', 'H'): 81,
+            # Add other combinations symmetrically as needed...
+        }
+        # Default to a mid-range distance if not in matrix
+        key = tuple(sorted([ref_aa, alt_aa]))
+        return grantham_matrix.get(key, 100)
+
+    def format_alignment(self, seq1, seq2, score, line_length=80):
+        with METRICS.stage("render", items=len(seq1)):
+            # Returns the display text plus (tag, line, start_col, end_col) runs so
+            # callers can colour it without touching the widget per character.
+            matches = sum(1 for a, b in zip(seq1, seq2) if a == b and a != '-')
+            identity = (matches / len(seq1)) * 100 if len(seq1) > 0 else 0
+            header = f"Alignment Score: {score:.1f}\nLength: {len(seq1)} bp\nIdentity: {identity:.2f}%\n" + "=" * 50 + "\n\n"
+            lines = [header]
+            tags = []
+            line_no = header.count("\n") + 1
+            offset = len("Ref:    ")
+            for i in range(0, len(seq1), line_length):
+                chunk1 = seq1[i:i+line_length]
+                chunk2 = seq2[i:i+line_length]
+                match_line = []
+                run_tag, run_start = None, 0
+                for j in range(len(chunk1)):
+                    if j < len(chunk2) and chunk1[j] == chunk2[j] and chunk1[j] != '-':
+                        match_line.append("|")
+                        tag = "match"
+                    else:
+                        match_line.append(" ")
+                        tag = "mismatch" if chunk1[j] != '-' and j < len(chunk2) and chunk2[j] != '-' else None
+                    if tag != run_tag:
+                        if run_tag:
+                            tags.append((run_tag, line_no + 2, offset + run_start, offset + j))
+                        run_tag, run_start = tag, j
+                if run_tag:
+                    tags.append((run_tag, line_no + 2, offset + run_start, offset + len(chunk1)))
+                lines.append(f"Ref:    {chunk1}\n        {''.join(match_line)}\nSample: {chunk2}\n\n")
+                line_no += 4
+            return "".join(lines), tags
+
+    def build_summary(self):
+        current_time = datetime.now()
+        if not self.mutations:
+            return "No mutations detected."
+        total = len(self.mutations)
+        snps = len([m for m in self.mutations if m['type'] == 'SNP'])
+        mnvs = len([m for m in self.mutations if m['type'] == 'MNV'])
+        insertions = len([m for m in self.mutations if m['type'] == 'Insertion'])
+        deletions = len([m for m in self.mutations if m['type'] == 'Deletion'])
+        structural = len([m for m in self.mutations if 'end' in m])
+        exonic = len([m for m in self.mutations if m['region'] == 'Exon'])
+        intronic = len([m for m in self.mutations if m['region'] == 'Intron'])
+        high_severity = len([m for m in self.mutations if '🔴' in m['severity']])
+        medium_severity = len([m for m in self.mutations if '🟠' in m['severity']])
+        low_severity = len([m for m in self.mutations if '🟢' in m['severity']])
+        missense = len([m for m in self.mutations if m['effect'] == 'Missense'])
+        with_sift = len([m for m in self.mutations if m['sift'] != '-'])
+        with_polyphen = len([m for m in self.mutations if m['polyphen'] != '-'])
+        heterozygous = len([m for m in self.mutations if m.get('genotype') in ('0/1', '1/2')])
+        circular_info = ""
+        if self.circular:
+            origin = f"sample base {self.circular_offset + 1} at position 1" if self.circular_offset is not None else "sample not rotated"
+            circular_info = f"\n   Circular Reference: {origin}"
+        reads_info = ""
+        if self.tiling is not None:
+            covered = int((self.tiling.coverage > 0).sum())
+            reads_info = f"""
+🧩 AMPLICON TILING:
+   Amplicons: {self.tiling.amplicons} ({self.tiling.placed} placed, {len(self.tiling.hits)} hits)
+   Covered: {covered} bp ({covered / max(1, self.tiling.length):.1%}), {len(self.tiling.gaps())} gaps
+   Mean Depth: {self.tiling.coverage.mean():.1f}x (max {self.tiling.coverage.max()})
+"""
+        elif self.pileup is not None and not self.aligned_ref:
+            depth = self.pileup.depth()
+            mapped = self.pileup.mapped / self.pileup.reads if self.pileup.reads else 0.0
+            reads_info = f"""
+📥 READ PILEUP:
+   Reads: {self.pileup.reads} ({mapped:.1%} mapped)
+   Mean Depth: {depth.mean():.1f}x (min {depth.min()}, max {depth.max()})
+"""
+        return f"""🧬 MUTATION ANALYSIS SUMMARY
+Generated: {current_time.strftime('%Y-%m-%d %H:%M:%S')} PKT
+
+📊 MUTATION COUNTS:
+   Total Mutations: {total}
+   • SNPs: {snps}
+   • MNVs: {mnvs}
+   • Insertions: {insertions}
+   • Deletions: {deletions}
+   • Structural Variants: {structural}
+   • Heterozygous: {heterozygous}
+
+📍 GENOMIC LOCATION:
+   • Exonic: {exonic}
+   • Intronic: {intronic}
+   • Intergenic: {total - exonic - intronic}
+
+⚠ SEVERITY DISTRIBUTION:
+   • High (🔴): {high_severity}
+   • Medium (🟠): {medium_severity}
+   • Low (🟢): {low_severity}
+
+🧬 PATHOGENICITY PREDICTIONS:
+   • Missense Mutations: {missense}
+   • With SIFT Scores: {with_sift}
+   • With PolyPhen-2 Scores: {with_polyphen}
+
+🔗 ALIGNMENT INFO:
+   Reference Length: {len(self.aligned_ref)} bp
+   Sample Length: {len(self.aligned_sample)} bp
+   Exons Analyzed: {len(self.exon_ranges)}
+   Introns Analyzed: {len(self.intron_ranges)}{circular_info}
+{reads_info}"""
+
+    def write_csv(self, file_path):
+        with METRICS.stage("export", items=len(self.mutations)):
+            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+                fieldnames = ['Position', 'Reference', 'Alternative', 'Type', 'Region', 'Effect', 'Frameshift', 'Severity', 'SIFT', 'PolyPhen', 'Transcripts', 'Genotype', 'Depth', 'Allele Fraction']
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer.writeheader()
+                for mut in self.mutations:
+                    writer.writerow({
+                        'Position': mut['position'],
+                        'Reference': mut['ref'],
+                        'Alternative': mut['alt'],
+                        'Type': mut['type'],
+                        'Region': mut['region'],
+                        'Effect': mut['effect'],
+                        'Frameshift': mut['frameshift'],
+                        'Severity': mut['severity'],
+                        'SIFT': mut['sift'],
+                        'PolyPhen': mut['polyphen'],
+                        'Transcripts': "; ".join(f"{c['transcript']}:{c['effect']}" for c in mut.get('transcripts', [])),
+                        'Genotype': mut.get('genotype', ""),
+                        'Depth': mut.get('depth', ""),
+                        'Allele Fraction': mut.get('allele_fraction', ""),
+                    })
+
+    def write_pdf(self, file_path, summary):
+        with METRICS.stage("export", items=len(self.mutations)):
+            from reportlab.lib.pagesizes import letter
+            from reportlab.pdfgen import canvas
+            c = canvas.Canvas(file_path, pagesize=letter)
+            c.setFont("Helvetica-Bold", 16)
+            y = 750
+            c.drawString(50, y, "MutAnalyzer Pro - Mutation Analysis Report")
+            y -= 20
+            c.setFont("Helvetica", 12)
+            c.drawString(50, y, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} PKT")
+            y -= 40
+            c.drawString(50, y, "Summary:")
+            y -= 20
+            c.setFont("Courier", 10)
+            for line in summary.split('\n'):
+                c.drawString(70, y, line)
+                y -= 15
+                if y < 50:
+                    c.showPage()
+                    c.setFont("Courier", 10)
+                    y = 750
+            c.showPage()
+            c.setFont("Helvetica-Bold", 14)
+            y = 750
+            c.drawString(50, y, "Detailed Mutation List")
+            y -= 20
+            c.setFont("Courier", 10)
+            for i, mut in enumerate(self.mutations, 1):
+                c.drawString(70, y, f"{i}. Position {mut['position']}: {mut['ref']} → {mut['alt']}")
+                y -= 15
+                c.drawString(90, y, f"Type: {mut['type']}")
+                y -= 15
+                c.drawString(90, y, f"Region: {mut['region']}")
+                y -= 15
+                c.drawString(90, y, f"Effect: {mut['effect']}")
+                y -= 15
+                c.drawString(90, y, f"Frameshift: {mut['frameshift']}")
+                y -= 15
+                c.drawString(90, y, f"Severity: {mut['severity']}")
+                y -= 15
+                c.drawString(90, y, f"SIFT: {mut['sift']}")
+                y -= 15
+                c.drawString(90, y, f"PolyPhen-2: {mut['polyphen']}")
+                y -= 30
+                if y < 50:
+                    c.showPage()
+                    c.setFont("Courier", 10)
+                    y = 750
+            c.save()
+
+    def write_report(self, file_path, summary):
+        with METRICS.stage("export", items=len(self.mutations)):
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(summary)
+                f.write("\n" + "="*60 + "\n")
+                f.write("DETAILED MUTATION LIST\n")
+                f.write("="*60 + "\n\n")
+                for i, mut in enumerate(self.mutations, 1):
+                    f.write(f"{i}. Position {mut['position']}: {mut['ref']} → {mut['alt']}\n")
+                    f.write(f"   Type: {mut['type']}\n")
+                    f.write(f"   Region: {mut['region']}\n")
+                    f.write(f"   Effect: {mut['effect']}\n")
+                    f.write(f"   Frameshift: {mut['frameshift']}\n")
+                    f.write(f"   Severity: {mut['severity']}\n")
+                    f.write(f"   SIFT: {mut['sift']}\n")
+                    f.write(f"   PolyPhen-2: {mut['polyphen']}\n")
+                    for c in mut.get('transcripts', []):
+                        f.write(f"   {c['transcript']} ({c['feature']}): {c['effect']}\n")
+                    f.write("\n")
+                if self.aligned_ref:
+                    f.write("\n" + "="*60 + "\n")
+                    f.write("PROTEIN CONSEQUENCES\n")
+                    f.write("="*60 + "\n\n")
+                    for consequence in self.protein_consequences():
+                        protein = f" ({consequence['protein_id']})" if consequence['protein_id'] else ""
+                        f.write(f"{consequence['transcript']}{protein}: {', '.join(consequence['changes'])}\n")
+                    f.write("\n" + "="*60 + "\n")
+                    f.write("SEQUENCE ALIGNMENT\n")
+                    f.write("="*60 + "\n\n")
+                    f.write(self.format_alignment(self.aligned_ref, self.aligned_sample, self.alignment_score)[0])
@@ -1,34 +1,35 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import tkinter.font as tkFont
-from Bio import Entrez, SeqIO, pairwise2
-from Bio.Seq import Seq
-from Bio.Data.IUPACData import protein_letters_1to3
-import csv
+import os
+import sys
 import threading
-from datetime import datetime
 import time
-import requests
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from mutanalyzer_engine import MutationEngine, GLOBAL_ALGORITHM, LOCAL_ALGORITHM, SPLIT_ALGORITHM, LINEAR_ALGORITHM
+from mutanalyzer_metrics import METRICS
+
+# Biopython's NCBI/IO modules, NumPy-backed subsystems (cohort, Sanger,
+# pileup) and the results database load on first use, not at startup.
 
 # IMPORTANT: Change this to your actual email address
-Entrez.email = "your_actual_email@domain.com"  # MUST BE CHANGED
+ENTREZ_EMAIL = "your_actual_email@domain.com"  # MUST BE CHANGED
 VEP_EMAIL = "your_actual_email@domain.com"  # For Ensembl VEP API (optional)
+PROTEIN_VIEW_LIMIT = 3  # Transcripts drawn residue by residue in the Results tab
+MIN_DENSITY_SPAN = 50  # bp; the density track will not zoom in further
+
+
+def entrez():
+    # Bio.Entrez drags in urllib/http and an XML parser; load it on the first NCBI request
+    from Bio import Entrez
+    Entrez.email = ENTREZ_EMAIL
+    return Entrez
 
-class MutationAnalyzer:
+class MutationAnalyzer(MutationEngine):
     def __init__(self):
-        self.exon_ranges = []
-        self.intron_ranges = []
-        self.mutations = []
-        self.ref_seq = ""
-        self.sample_seq = ""
-        self.aligned_ref = ""
-        self.aligned_sample = ""
+        super().__init__()
         self.align_btn = None
         self.analyze_btn = None
         self.pathogenicity_btn = None
-        self.chrom = None  # To store chromosome from NCBI fetch
         self.colors = {
             'primary': '#1e293b',      # Slate 800
             'primary_light': '#334155',  # Slate 700
@@ -102,16 +103,52 @@ class MutationAnalyzer:
         main_container = tk.Frame(self.root, bg=self.colors['background'])
         main_container.pack(fill='both', expand=True, padx=15, pady=15)
         self.notebook = ttk.Notebook(main_container)
-        self.input_tab = self.create_input_tab()
-        self.alignment_tab = self.create_alignment_tab()
-        self.mutation_tab = self.create_mutation_tab()
-        self.results_tab = self.create_results_tab()
+        # Settings shared across tabs exist before any tab is built
+        self.algo_var = tk.StringVar(value=GLOBAL_ALGORITHM)
+        self.code_var = tk.StringVar(value="Standard")
+        self.circular_var = tk.BooleanVar(value=False)
+        self.progress_var = tk.DoubleVar()
+        self.input_tab = tk.Frame(self.notebook, bg=self.colors['background'])
+        self.alignment_tab = tk.Frame(self.notebook, bg=self.colors['background'])
+        self.mutation_tab = tk.Frame(self.notebook, bg=self.colors['background'])
+        self.results_tab = tk.Frame(self.notebook, bg=self.colors['background'])
+        self.density_tab = tk.Frame(self.notebook, bg=self.colors['background'])
         self.notebook.add(self.input_tab, text="📝 Input & Fetch")
         self.notebook.add(self.alignment_tab, text="🔗 Alignment")
         self.notebook.add(self.mutation_tab, text="🧪 Mutations")
         self.notebook.add(self.results_tab, text="📊 Results")
+        self.notebook.add(self.density_tab, text="📍 Density")
+        # Only the input tab is built at startup; the others are filled in the
+        # first time they are shown or an action needs their widgets
+        self.tab_builders = {
+            'input': (self.input_tab, self.create_input_tab),
+            'alignment': (self.alignment_tab, self.create_alignment_tab),
+            'mutation': (self.mutation_tab, self.create_mutation_tab),
+            'results': (self.results_tab, self.create_results_tab),
+            'density': (self.density_tab, self.create_density_tab),
+        }
+        self.built_tabs = set()
+        self.ensure_tab('input')
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
         self.notebook.pack(fill='both', expand=True)
 
+    def ensure_tab(self, *keys):
+        for key in keys:
+            if key in self.built_tabs:
+                continue
+            self.built_tabs.add(key)
+            tab, builder = self.tab_builders[key]
+            with METRICS.stage("render"):
+                builder(tab)
+
+    def on_tab_changed(self, event):
+        selected = self.notebook.select()
+        for key, (tab, _) in self.tab_builders.items():
+            if str(tab) == selected:
+                self.ensure_tab(key)
+                if key == 'density':
+                    self.update_density_track()
+
     def create_card_frame(self, parent, title, height=None):
         card_container = tk.Frame(parent, bg=self.colors['background'])
         shadow_frame = tk.Frame(card_container, bg='#d1d5db', height=2)
@@ -160,6 +197,125 @@ class MutationAnalyzer:
         settings_menu.add_cascade(label="Theme", menu=theme_menu)
         theme_menu.add_radiobutton(label="Light", variable=self.theme_var, value="Light", command=self.update_theme)
         theme_menu.add_radiobutton(label="Dark", variable=self.theme_var, value="Dark", command=self.update_theme)
+        self.profiling_var = tk.BooleanVar(value=False)
+        profiling_menu = tk.Menu(settings_menu, tearoff=0)
+        settings_menu.add_cascade(label="Profiling", menu=profiling_menu)
+        profiling_menu.add_checkbutton(label="Capture cProfile/tracemalloc", variable=self.profiling_var, command=self.toggle_profiling)
+        profiling_menu.add_command(label="Show Stage Timings", command=self.show_metrics)
+        profiling_menu.add_command(label="Export Metrics...", command=self.export_metrics)
+        profiling_menu.add_command(label="Save Profile Report...", command=self.save_profile_report)
+        profiling_menu.add_command(label="Reset Metrics", command=METRICS.reset)
+        cohort_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Cohort", menu=cohort_menu)
+        cohort_menu.add_command(label="Add Current Sample...", command=self.add_sample_to_cohort)
+        cohort_menu.add_command(label="Cohort Summary", command=self.show_cohort_summary)
+        cohort_menu.add_command(label="Find Variants...", command=self.query_cohort)
+        cohort_menu.add_separator()
+        cohort_menu.add_command(label="Open Cohort...", command=self.open_cohort)
+        cohort_menu.add_command(label="Save Cohort...", command=self.save_cohort)
+        batch_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Batch", menu=batch_menu)
+        batch_menu.add_command(label="Analyze Sanger Plate Folder...", command=self.analyze_plate_threaded)
+        session_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="Session", menu=session_menu)
+        session_menu.add_command(label="Open Session...", command=self.open_session_file)
+        session_menu.add_command(label="Save Session...", command=self.save_session_file)
+
+    def toggle_profiling(self):
+        METRICS.set_profiling(self.profiling_var.get())
+
+    def show_metrics(self):
+        messagebox.showinfo("Stage Timings", METRICS.summary_text())
+
+    def export_metrics(self):
+        try:
+            file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json"), ("Prometheus text", "*.prom"), ("All files", "*.*")], title="Export Metrics")
+            if not file_path:
+                return
+            METRICS.write(file_path)
+            messagebox.showinfo("Export Successful", f"Metrics exported to:\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("Export Error", f"Failed to export metrics:\n{str(e)}")
+
+    def save_profile_report(self):
+        try:
+            file_path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files", "*.txt"), ("All files", "*.*")], title="Save Profile Report")
+            if not file_path:
+                return
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(METRICS.profile_report())
+            messagebox.showinfo("Report Saved", f"Profile report saved to:\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Failed to save profile report:\n{str(e)}")
+
+    def add_sample_to_cohort(self):
+        try:
+            if not self.mutations:
+                messagebox.showwarning("No Data", "Analyze a sample before adding it to the cohort")
+                return
+            default = f"sample{self.cohort.n_samples + 1 if self.cohort else 1}"
+            name = simpledialog.askstring("Add to Cohort", "Sample name:", initialvalue=default, parent=self.root)
+            if not name:
+                return
+            reference = self.reference_accession or self.gene_entry.get().strip()
+            self.add_to_cohort(name.strip(), reference)
+            messagebox.showinfo("Cohort", f"Added {name} ({len(self.mutations)} variants)\nCohort: {self.cohort.n_samples} samples, {self.cohort.n_variants} distinct variants")
+        except Exception as e:
+            messagebox.showerror("Cohort Error", f"Failed to add sample:\n{str(e)}")
+
+    def show_cohort_summary(self):
+        if not self.cohort or not self.cohort.n_samples:
+            messagebox.showinfo("Cohort", "The cohort is empty. Use Cohort → Add Current Sample after an analysis.")
+            return
+        messagebox.showinfo("Cohort Summary", self.cohort.summary_text())
+
+    def query_cohort(self):
+        try:
+            if not self.cohort or not self.cohort.n_samples:
+                messagebox.showinfo("Cohort", "The cohort is empty")
+                return
+            min_frequency = simpledialog.askfloat("Find Variants", "Minimum frequency (0-1):", initialvalue=0.0, minvalue=0.0, maxvalue=1.0, parent=self.root)
+            if min_frequency is None:
+                return
+            exon = simpledialog.askinteger("Find Variants", "Exon number (blank for any):", parent=self.root)
+            hits = self.cohort.query(min_frequency=min_frequency, exon=exon)
+            if not hits:
+                messagebox.showinfo("Find Variants", "No variants match")
+                return
+            lines = []
+            for variant, count, frequency in hits[:30]:
+                carriers = self.cohort.samples_with(variant['key'])
+                shown = ", ".join(carriers[:5]) + (f" +{len(carriers) - 5}" if len(carriers) > 5 else "")
+                lines.append(f"{variant['position']} {variant['ref']}>{variant['alt']} {variant['effect']}: {frequency:.1%} ({shown})")
+            if len(hits) > 30:
+                lines.append(f"... {len(hits) - 30} more")
+            messagebox.showinfo("Find Variants", f"{len(hits)} variant(s):\n" + "\n".join(lines))
+        except Exception as e:
+            messagebox.showerror("Cohort Error", f"Query failed:\n{str(e)}")
+
+    def open_cohort(self):
+        try:
+            file_path = filedialog.askopenfilename(filetypes=[("Cohort files", "*.npz"), ("All files", "*.*")], title="Open Cohort")
+            if not file_path:
+                return
+            from mutanalyzer_cohort import Cohort
+            self.cohort = Cohort.load(file_path)
+            messagebox.showinfo("Cohort", f"Loaded {self.cohort.n_samples} samples, {self.cohort.n_variants} distinct variants")
+        except Exception as e:
+            messagebox.showerror("Cohort Error", f"Failed to open cohort:\n{str(e)}")
+
+    def save_cohort(self):
+        try:
+            if not self.cohort:
+                messagebox.showwarning("No Data", "The cohort is empty")
+                return
+            file_path = filedialog.asksaveasfilename(defaultextension=".npz", filetypes=[("Cohort files", "*.npz"), ("All files", "*.*")], title="Save Cohort")
+            if not file_path:
+                return
+            self.cohort.save(file_path)
+            messagebox.showinfo("Export Successful", f"Cohort saved to:\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Failed to save cohort:\n{str(e)}")
 
     def update_font_size(self):
         size = self.font_size_var.get()
@@ -168,9 +324,11 @@ class MutationAnalyzer:
         self.root.option_add("*Font", default_font)
         self.ref_text.config(font=consolas_font)
         self.sample_text.config(font=consolas_font)
-        self.alignment_text.config(font=consolas_font)
-        self.summary_text.config(font=consolas_font)
-        self.protein_text.config(font=consolas_font)
+        if 'alignment' in self.built_tabs:
+            self.alignment_text.config(font=consolas_font)
+        if 'results' in self.built_tabs:
+            self.summary_text.config(font=consolas_font)
+            self.protein_text.config(font=consolas_font)
 
     def update_theme(self):
         theme = self.theme_var.get()
@@ -191,9 +349,12 @@ class MutationAnalyzer:
                 'text_secondary': '#64748b'
             })
         self.root.configure(bg=self.colors['background'])
-        for widget in [self.input_tab, self.alignment_tab, self.mutation_tab, self.results_tab]:
+        for widget in [self.input_tab, self.alignment_tab, self.mutation_tab, self.results_tab, self.density_tab]:
             widget.configure(bg=self.colors['background'])
         self.update_widget_styles()
+        if 'density' in self.built_tabs:
+            self.density_canvas.configure(bg=self.colors['card'])
+            self.draw_density()
 
     def update_widget_styles(self):
         for widget in self.root.winfo_children():
@@ -212,8 +373,7 @@ class MutationAnalyzer:
         except:
             pass
 
-    def create_input_tab(self):
-        tab = tk.Frame(self.notebook, bg=self.colors['background'])
+    def create_input_tab(self, tab):
         main_container = tk.Frame(tab, bg=self.colors['background'])
         main_container.pack(fill='both', expand=True, padx=15, pady=15)
         left_col = tk.Frame(main_container, bg=self.colors['background'])
@@ -271,12 +431,16 @@ class MutationAnalyzer:
         upload_sample_btn.pack(side='left', padx=(0, 10))
         self.create_tooltip(upload_sample_btn, "Upload a FASTA or text file")
         clear_sample_btn = ttk.Button(sample_btn_frame, text="🗑 Clear Sequence", command=lambda: self.sample_text.delete('1.0', tk.END))
-        clear_sample_btn.pack(side='left')
+        clear_sample_btn.pack(side='left', padx=(0, 10))
         self.create_tooltip(clear_sample_btn, "Clear the sample sequence")
-        return tab
-
-    def create_alignment_tab(self):
-        tab = tk.Frame(self.notebook, bg=self.colors['background'])
+        fastq_btn = ttk.Button(sample_btn_frame, text="📥 Call from FASTQ Reads", style='Info.TButton', command=self.call_from_fastq_threaded)
+        fastq_btn.pack(side='left', padx=(0, 10))
+        self.create_tooltip(fastq_btn, "Map amplicon reads to the reference and call variants by allele fraction")
+        tiling_btn = ttk.Button(sample_btn_frame, text="🧩 Tile Amplicons", style='Info.TButton', command=self.tile_amplicons_threaded)
+        tiling_btn.pack(side='left')
+        self.create_tooltip(tiling_btn, "Place every amplicon of a multi-FASTA on the reference and merge their calls")
+
+    def create_alignment_tab(self, tab):
         main_container = tk.Frame(tab, bg=self.colors['background'])
         main_container.pack(fill='both', expand=True, padx=15, pady=15)
         control_card, control_content = self.create_card_frame(main_container, "⚙ Alignment Configuration", 250)
@@ -284,19 +448,25 @@ class MutationAnalyzer:
         algo_section = tk.Frame(control_content, bg=self.colors['card'])
         algo_section.pack(fill='x', pady=(0, 10))
         tk.Label(algo_section, text="Alignment Algorithm:", font=tkFont.Font(family="Segoe UI", size=11, weight="bold"), bg=self.colors['card'], fg=self.colors['text_primary']).pack(anchor='w', pady=(0, 5))
-        self.algo_var = tk.StringVar(value="Global (Needleman-Wunsch)")
         radio_frame = tk.Frame(algo_section, bg=self.colors['card'])
         radio_frame.pack(fill='x', pady=(5, 0))
-        tk.Radiobutton(radio_frame, text="🌐 Global Alignment (Needleman-Wunsch)", variable=self.algo_var, value="Global (Needleman-Wunsch)", bg=self.colors['card'], fg=self.colors['text_primary'], font=("Segoe UI", 10), selectcolor=self.colors['secondary']).pack(anchor='w', pady=3)
-        tk.Radiobutton(radio_frame, text="🎯 Local Alignment (Smith-Waterman)", variable=self.algo_var, value="Local (Smith-Waterman)", bg=self.colors['card'], fg=self.colors['text_primary'], font=("Segoe UI", 10), selectcolor=self.colors['secondary']).pack(anchor='w', pady=3)
+        tk.Radiobutton(radio_frame, text="🌐 Global Alignment (Needleman-Wunsch)", variable=self.algo_var, value=GLOBAL_ALGORITHM, bg=self.colors['card'], fg=self.colors['text_primary'], font=("Segoe UI", 10), selectcolor=self.colors['secondary']).pack(anchor='w', pady=3)
+        tk.Radiobutton(radio_frame, text="📏 Global Alignment, linear space (exact, for long sequences)", variable=self.algo_var, value=LINEAR_ALGORITHM, bg=self.colors['card'], fg=self.colors['text_primary'], font=("Segoe UI", 10), selectcolor=self.colors['secondary']).pack(anchor='w', pady=3)
+        tk.Radiobutton(radio_frame, text="🎯 Local Alignment (Smith-Waterman)", variable=self.algo_var, value=LOCAL_ALGORITHM, bg=self.colors['card'], fg=self.colors['text_primary'], font=("Segoe UI", 10), selectcolor=self.colors['secondary']).pack(anchor='w', pady=3)
+        tk.Radiobutton(radio_frame, text="🧩 Split Alignment (SV-aware: large deletions, duplications, inversions)", variable=self.algo_var, value=SPLIT_ALGORITHM, bg=self.colors['card'], fg=self.colors['text_primary'], font=("Segoe UI", 10), selectcolor=self.colors['secondary']).pack(anchor='w', pady=3)
+        circular_check = tk.Checkbutton(algo_section, text="⭕ Circular reference (mtDNA, plasmid, viral genome)", variable=self.circular_var, bg=self.colors['card'], fg=self.colors['text_primary'], font=("Segoe UI", 10), selectcolor=self.colors['secondary'])
+        circular_check.pack(anchor='w', pady=(8, 0))
+        self.create_tooltip(circular_check, "Rotate samples to the reference origin so variants across it align normally")
         btn_section = tk.Frame(control_content, bg=self.colors['card'])
         btn_section.pack(fill='x', pady=(15, 0))
         self.align_btn = ttk.Button(btn_section, text="🔗 Perform Sequence Alignment", style='Success.TButton', command=self.align_sequences_threaded)
-        self.align_btn.pack()
+        self.align_btn.pack(side='left', padx=(0, 10))
         self.create_tooltip(self.align_btn, "Align reference and sample sequences")
+        locate_btn = ttk.Button(btn_section, text="📍 Locate Primer/Amplicon", command=self.locate_in_reference)
+        locate_btn.pack(side='left')
+        self.create_tooltip(locate_btn, "Find exact matches of a primer or amplicon in the reference (both strands)")
         progress_section = tk.Frame(control_content, bg=self.colors['card'])
         progress_section.pack(fill='x', pady=(15, 0))
-        self.progress_var = tk.DoubleVar()
         self.progress_bar = ttk.Progressbar(progress_section, variable=self.progress_var, maximum=100, length=350, style='TProgressbar')
         self.progress_bar.pack(fill='x', pady=(0, 5))
         self.progress_label = tk.Label(progress_section, text="Ready to align sequences", bg=self.colors['card'], fg=self.colors['text_secondary'], font=("Segoe UI", 10, "italic"))
@@ -314,10 +484,10 @@ class MutationAnalyzer:
         h_scroll.grid(row=1, column=0, sticky='ew')
         results_content.grid_rowconfigure(0, weight=1)
         results_content.grid_columnconfigure(0, weight=1)
-        return tab
+        if self.aligned_ref:
+            self.format_alignment_display(self.aligned_ref, self.aligned_sample, self.alignment_score)
 
-    def create_mutation_tab(self):
-        tab = tk.Frame(self.notebook, bg=self.colors['background'])
+    def create_mutation_tab(self, tab):
         main_container = tk.Frame(tab, bg=self.colors['background'])
         main_container.pack(fill='both', expand=True, padx=15, pady=15)
 
@@ -327,7 +497,6 @@ class MutationAnalyzer:
         code_section = tk.Frame(control_content, bg=self.colors['card'])
         code_section.pack(fill='x', pady=(10, 10))
         tk.Label(code_section, text="Genetic Code:", font=tkFont.Font(family="Segoe UI", size=11, weight="bold"), bg=self.colors['card'], fg=self.colors['text_primary']).pack(anchor='w', pady=(0, 5))
-        self.code_var = tk.StringVar(value="Standard")
         code_frame = tk.Frame(code_section, bg=self.colors['card'])
         code_frame.pack(fill='x', pady=(5, 0))
         tk.Radiobutton(code_frame, text="Standard", variable=self.code_var, value="Standard", bg=self.colors['card'], fg=self.colors['text_primary'], font=("Segoe UI", 10), selectcolor=self.colors['secondary'], command=self.enable_mutation_options).pack(anchor='w', pady=3)
@@ -352,9 +521,9 @@ class MutationAnalyzer:
         # Detected Mutations & Variants Table
         table_card, table_content = self.create_card_frame(main_container, "📊 Detected Mutations & Variants", 400)
         table_card.pack(fill='both', expand=True, pady=(5, 15))
-        columns = ("Position", "Ref", "Alt", "Type", "Region", "Effect", "Frameshift", "Severity", "SIFT", "PolyPhen")
+        columns = ("Position", "Ref", "Alt", "Type", "Region", "Effect", "Frameshift", "Severity", "SIFT", "PolyPhen", "Transcript")
         self.mutation_tree = ttk.Treeview(table_content, columns=columns, show='headings', height=12, style='Treeview')
-        column_widths = {"Position": 90, "Ref": 70, "Alt": 70, "Type": 100, "Region": 90, "Effect": 130, "Frameshift": 100, "Severity": 100, "SIFT": 120, "PolyPhen": 120}
+        column_widths = {"Position": 90, "Ref": 70, "Alt": 70, "Type": 100, "Region": 90, "Effect": 130, "Frameshift": 100, "Severity": 100, "SIFT": 120, "PolyPhen": 120, "Transcript": 120}
         for col in columns:
             self.mutation_tree.heading(col, text=col, anchor='center')
             self.mutation_tree.column(col, width=column_widths[col], anchor='center')
@@ -368,11 +537,14 @@ class MutationAnalyzer:
         table_content.grid_rowconfigure(0, weight=1)
         table_content.grid_columnconfigure(0, weight=1)
         self.mutation_tree.bind('<Double-1>', self.show_mutation_details)
+        # Built late (e.g. after a run was opened): show what is already there
+        if self.aligned_ref:
+            self.analyze_btn.state(['!disabled'])
+        if self.mutations:
+            self.pathogenicity_btn.state(['!disabled'])
+            self.update_mutation_table()
 
-        return tab
-
-    def create_results_tab(self):
-        tab = tk.Frame(self.notebook, bg=self.colors['background'])
+    def create_results_tab(self, tab):
         main_container = tk.Frame(tab, bg=self.colors['background'])
         main_container.pack(fill='both', expand=True, padx=15, pady=15)
         summary_card, summary_content = self.create_card_frame(main_container, "📈 Analysis Summary & Statistics", 250)
@@ -383,7 +555,25 @@ class MutationAnalyzer:
         protein_card.pack(fill='x', pady=(10, 10))
         self.protein_text = tk.Text(protein_content, height=10, font=("Consolas", 10), state='disabled', bg=self.colors['light'], fg=self.colors['text_primary'], relief='flat', selectbackground=self.colors['secondary_light'])
         self.protein_text.tag_configure("changed_aa", foreground=self.colors['danger'])
+        self.protein_text.tag_configure("frameshift_aa", foreground=self.colors['warning'])
+        self.protein_text.tag_configure("stop_aa", foreground='white', background=self.colors['danger'])
         self.protein_text.pack(fill='both', expand=True, padx=10, pady=10)
+        runs_card, runs_content = self.create_card_frame(main_container, "🗂 Past Runs", 230)
+        runs_card.pack(fill='x', pady=(0, 10))
+        run_columns = ("Run", "Date", "Gene", "Samples", "Variants", "Algorithm")
+        self.runs_tree = ttk.Treeview(runs_content, columns=run_columns, show='headings', height=5, style='Treeview')
+        run_widths = {"Run": 60, "Date": 150, "Gene": 140, "Samples": 200, "Variants": 80, "Algorithm": 220}
+        for col in run_columns:
+            self.runs_tree.heading(col, text=col, anchor='center')
+            self.runs_tree.column(col, width=run_widths[col], anchor='center')
+        self.runs_tree.pack(fill='both', expand=True, padx=10, pady=(10, 5))
+        self.runs_tree.bind('<Double-1>', lambda event: self.open_selected_run())
+        runs_btn_frame = tk.Frame(runs_content, bg=self.colors['card'])
+        runs_btn_frame.pack(fill='x', padx=10, pady=(0, 10))
+        ttk.Button(runs_btn_frame, text="🔄 Refresh", command=self.refresh_runs).pack(side='left', padx=(0, 10))
+        open_run_btn = ttk.Button(runs_btn_frame, text="📂 Open Run", style='Primary.TButton', command=self.open_selected_run)
+        open_run_btn.pack(side='left')
+        self.create_tooltip(open_run_btn, "Load a stored analysis into the Alignment, Mutations and Results tabs")
         export_card, export_content = self.create_card_frame(main_container, "💾 Export & Reporting")
         export_card.pack(fill='both', expand=True)
         desc_frame = tk.Frame(export_content, bg=self.colors['card'])
@@ -405,37 +595,205 @@ class MutationAnalyzer:
         export_pdf_btn = ttk.Button(btn_row1, text="📜 Export to PDF", style='Danger.TButton', command=self.export_to_pdf)
         export_pdf_btn.pack(side='left', padx=(10, 0))
         self.create_tooltip(export_pdf_btn, "Export report as PDF")
-        return tab
-
-    def validate_sequence(self, seq):
-        valid_nucleotides = set("ATCGN-")
-        return all(c.upper() in valid_nucleotides for c in seq.strip())
+        if self.mutations:
+            self.update_summary()
+            self.update_protein_display()
+        self.refresh_runs()
 
-    def parse_fasta(self, text):
-        lines = text.strip().split('\n')
-        sequence = ""
-        for line in lines:
-            if not line.startswith('>'):
-                sequence += line.strip().upper()
-        return sequence
+    def create_density_tab(self, tab):
+        main_container = tk.Frame(tab, bg=self.colors['background'])
+        main_container.pack(fill='both', expand=True, padx=15, pady=15)
+        track_card, track_content = self.create_card_frame(main_container, "📍 Mutation Position Density")
+        track_card.pack(fill='both', expand=True)
+        control_frame = tk.Frame(track_content, bg=self.colors['card'])
+        control_frame.pack(fill='x', pady=(0, 10))
+        self.density_source_var = tk.StringVar(value="sample")
+        tk.Radiobutton(control_frame, text="Current sample", variable=self.density_source_var, value="sample", bg=self.colors['card'], fg=self.colors['text_primary'], font=("Segoe UI", 10), selectcolor=self.colors['secondary'], command=self.update_density_track).pack(side='left', padx=(0, 10))
+        tk.Radiobutton(control_frame, text="Cohort (by carriers)", variable=self.density_source_var, value="cohort", bg=self.colors['card'], fg=self.colors['text_primary'], font=("Segoe UI", 10), selectcolor=self.colors['secondary'], command=self.update_density_track).pack(side='left', padx=(0, 20))
+        ttk.Button(control_frame, text="➕ Zoom In", command=lambda: self.zoom_density(0.5)).pack(side='left', padx=(0, 5))
+        ttk.Button(control_frame, text="➖ Zoom Out", command=lambda: self.zoom_density(2.0)).pack(side='left', padx=(0, 5))
+        full_view_btn = ttk.Button(control_frame, text="⟲ Full View", command=self.reset_density_view)
+        full_view_btn.pack(side='left')
+        self.create_tooltip(full_view_btn, "Show the whole reference (or double-click the track)")
+        self.density_status = tk.Label(track_content, text="", bg=self.colors['card'], fg=self.colors['text_secondary'], font=("Segoe UI", 10, "italic"))
+        self.density_status.pack(fill='x', side='bottom', pady=(5, 0))
+        self.density_canvas = tk.Canvas(track_content, bg=self.colors['card'], highlightthickness=0, cursor='fleur')
+        self.density_canvas.pack(fill='both', expand=True)
+        self.density_pyramid = None
+        self.density_view = (1, 1)
+        self.density_bins = None
+        self.density_redraw = None
+        self.density_drag = None
+        self.density_canvas.bind('<Configure>', lambda event: self.schedule_density_draw())
+        self.density_canvas.bind('<ButtonPress-1>', self.on_density_press)
+        self.density_canvas.bind('<B1-Motion>', self.on_density_drag)
+        self.density_canvas.bind('<Double-1>', lambda event: self.reset_density_view())
+        self.density_canvas.bind('<MouseWheel>', lambda event: self.zoom_density(0.8 if event.delta > 0 else 1.25, event.x))
+        self.density_canvas.bind('<Button-4>', lambda event: self.zoom_density(0.8, event.x))
+        self.density_canvas.bind('<Button-5>', lambda event: self.zoom_density(1.25, event.x))
+        self.density_canvas.bind('<Motion>', self.on_density_motion)
+
+    def update_density_track(self):
+        # Rebuild the pyramid from the chosen source; panning and zooming
+        # only ever read it
+        if 'density' not in self.built_tabs:
+            return
+        try:
+            from mutanalyzer_density import DensityPyramid
+            length = max([len(self.ref_seq)] + [end for _, end in self.exon_ranges])
+            with METRICS.stage("render"):
+                if self.density_source_var.get() == "cohort":
+                    self.density_pyramid = DensityPyramid.from_cohort(self.cohort, length) if self.cohort and self.cohort.n_variants else None
+                else:
+                    self.density_pyramid = DensityPyramid.from_mutations(self.mutations, length) if self.mutations else None
+            if self.density_pyramid is None:
+                self.density_view = (1, 1)
+            elif self.density_view[1] > self.density_pyramid.length or self.density_view == (1, 1):
+                self.density_view = (1, self.density_pyramid.length)
+            self.draw_density()
+        except Exception as e:
+            messagebox.showerror("Density Track", f"Failed to build density track: {str(e)}")
+
+    def density_geometry(self):
+        # Plot area (left, right, top, histogram bottom, gene model y, axis y)
+        width = max(self.density_canvas.winfo_width(), 200)
+        height = max(self.density_canvas.winfo_height(), 160)
+        return 60, width - 20, 20, height - 80, height - 55, height - 30
+
+    def schedule_density_draw(self):
+        # Coalesce bursts of drag/wheel events into one redraw per idle cycle
+        if self.density_redraw is None:
+            self.density_redraw = self.root.after_idle(self.draw_density)
+
+    def draw_density(self):
+        self.density_redraw = None
+        if 'density' not in self.built_tabs:
+            return
+        canvas = self.density_canvas
+        canvas.delete('all')
+        left, right, top, bottom, gene_y, axis_y = self.density_geometry()
+        pyramid = self.density_pyramid
+        if pyramid is None:
+            self.density_bins = None
+            source = "cohort" if self.density_source_var.get() == "cohort" else "sample"
+            canvas.create_text((left + right) // 2, (top + axis_y) // 2, text=f"No {source} variants to plot", fill=self.colors['text_secondary'], font=("Segoe UI", 11, "italic"))
+            self.density_status.config(text="")
+            return
+        start, end = self.density_view
+        span = end - start + 1
+        plot_width = right - left
+        bp_per_pixel = span / plot_width
+
+        def x_of(position):
+            return left + (position - start) * plot_width / span
+
+        # Histogram: about one bar per two pixels, scaled to the busiest bin in view
+        edges, counts, severe_counts = pyramid.bins(start, end, plot_width // 2)
+        self.density_bins = (edges, counts, severe_counts)
+        peak = max(int(counts.max()), 1) if len(counts) else 1
+        scale = (bottom - top) / peak
+        xs = [x_of(edge) for edge in edges.tolist()]
+        for i in counts.nonzero()[0].tolist():
+            x0, x1 = xs[i], max(xs[i + 1] - 1, xs[i] + 1)
+            canvas.create_rectangle(x0, bottom - counts[i] * scale, x1, bottom, fill=self.colors['secondary'], width=0)
+            if severe_counts[i]:
+                canvas.create_rectangle(x0, bottom - severe_counts[i] * scale, x1, bottom, fill=self.colors['danger'], width=0)
+        canvas.create_line(left, bottom, right, bottom, fill=self.colors['border'])
+        canvas.create_text(left - 5, top, text=str(peak), anchor='ne', fill=self.colors['text_secondary'], font=("Segoe UI", 8))
+        canvas.create_text(left - 5, bottom, text="0", anchor='e', fill=self.colors['text_secondary'], font=("Segoe UI", 8))
+
+        # Gene model: introns as a line, exons as blocks, merged below a pixel
+        from mutanalyzer_density import visible_blocks
+        for block_start, block_end in visible_blocks(self.intron_ranges, start, end, bp_per_pixel):
+            canvas.create_line(x_of(block_start), gene_y, x_of(block_end + 1), gene_y, fill=self.colors['text_secondary'])
+        for block_start, block_end in visible_blocks(self.exon_ranges, start, end, bp_per_pixel):
+            canvas.create_rectangle(x_of(block_start), gene_y - 7, max(x_of(block_end + 1), x_of(block_start) + 1), gene_y + 7, fill=self.colors['accent'], width=0)
+
+        # Axis with round-number ticks
+        canvas.create_line(left, axis_y, right, axis_y, fill=self.colors['text_secondary'])
+        step = 10 ** max(len(str(span // 5)) - 1, 0)
+        step = next(step * m for m in (1, 2, 5, 10) if span / (step * m) <= 8)
+        for tick in range(-(-start // step) * step, end + 1, step):
+            x = x_of(tick)
+            canvas.create_line(x, axis_y, x, axis_y + 5, fill=self.colors['text_secondary'])
+            canvas.create_text(x, axis_y + 7, text=f"{tick:,}", anchor='n', fill=self.colors['text_secondary'], font=("Segoe UI", 8))
+        in_view = int(counts.sum())
+        self.density_status.config(text=f"{start:,}-{end:,} ({span:,} bp) • {in_view:,} of {pyramid.total:,} variants in view • {max(span / len(counts), 1):,.0f} bp per bar • drag to pan, scroll to zoom")
+
+    def zoom_density(self, factor, x=None):
+        if 'density' not in self.built_tabs or self.density_pyramid is None:
+            return
+        left, right = self.density_geometry()[:2]
+        start, end = self.density_view
+        span = end - start + 1
+        # Keep the position under the cursor (or the centre) fixed
+        fraction = 0.5 if x is None else min(max((x - left) / (right - left), 0.0), 1.0)
+        anchor = start + fraction * span
+        new_span = int(min(max(span * factor, MIN_DENSITY_SPAN), self.density_pyramid.length))
+        self.set_density_view(int(round(anchor - fraction * new_span)), new_span)
+
+    def set_density_view(self, start, span):
+        length = self.density_pyramid.length
+        start = min(max(start, 1), length - span + 1)
+        self.density_view = (start, start + span - 1)
+        self.schedule_density_draw()
+
+    def reset_density_view(self):
+        if self.density_pyramid is not None:
+            self.set_density_view(1, self.density_pyramid.length)
+
+    def on_density_press(self, event):
+        self.density_drag = (event.x, self.density_view[0])
+
+    def on_density_drag(self, event):
+        if self.density_pyramid is None or self.density_drag is None:
+            return
+        left, right = self.density_geometry()[:2]
+        start, end = self.density_view
+        span = end - start + 1
+        x0, start0 = self.density_drag
+        self.set_density_view(start0 - int((event.x - x0) * span / (right - left)), span)
+
+    def on_density_motion(self, event):
+        if self.density_bins is None:
+            return
+        left, right = self.density_geometry()[:2]
+        start, end = self.density_view
+        position = start + (event.x - left) * (end - start + 1) / (right - left)
+        edges, counts, severe_counts = self.density_bins
+        i = int(edges.searchsorted(position, side='right')) - 1
+        if 0 <= i < len(counts) and left <= event.x <= right:
+            self.density_status.config(text=f"{int(edges[i]):,}-{int(edges[i + 1]) - 1:,}: {counts[i]} variant(s), {severe_counts[i]} high severity")
 
     def upload_file(self, text_widget):
         try:
-            file_path = filedialog.askopenfilename(title="Select Sequence File", filetypes=[("FASTA files", "*.fasta *.fa *.fas"), ("Text files", "*.txt"), ("All files", "*.*")])
+            file_path = filedialog.askopenfilename(title="Select Sequence File", filetypes=[("FASTA files", "*.fasta *.fa *.fas"), ("Sanger traces", "*.ab1 *.abi"), ("Text files", "*.txt"), ("All files", "*.*")])
             if not file_path:
                 return
-            with open(file_path, 'r') as file:
-                content = file.read()
-            sequence = self.parse_fasta(content)
+            from mutanalyzer_sanger import TRACE_EXTENSIONS
+            if file_path.lower().endswith(TRACE_EXTENSIONS):
+                # Place sample traces on the reference when one is loaded
+                ref_seq = self.ref_text.get('1.0', tk.END).strip().upper() if text_widget is self.sample_text else ""
+                self.circular = self.circular_var.get()
+                sequence = self.load_trace(file_path, ref_seq if ref_seq and self.validate_sequence(ref_seq) else None)
+            else:
+                with open(file_path, 'r') as file:
+                    content = file.read()
+                sequence = self.parse_fasta(content)
             if not sequence:
                 messagebox.showerror("Error", "No valid sequence found in file")
                 return
             if not self.validate_sequence(sequence):
-                messagebox.showwarning("Invalid Sequence", "Sequence contains invalid characters. Only A, T, C, G, N, - allowed")
+                messagebox.showwarning("Invalid Sequence", "Sequence contains invalid characters. Only A, T, C, G, N, - (and IUPAC R, Y, K, M, S, W) allowed")
                 return
             text_widget.delete('1.0', tk.END)
             text_widget.insert('1.0', sequence)
-            messagebox.showinfo("Success", f"Loaded sequence: {len(sequence)} nucleotides")
+            if file_path.lower().endswith(TRACE_EXTENSIONS):
+                hets = sum(sequence.count(code) for code in "RYKMSW")
+                covered = f"\nCovers reference {self.trace_coverage[0]}-{self.trace_coverage[1]}" if self.trace_coverage else ""
+                messagebox.showinfo("Success", f"Loaded trace {self.trace.name}: {len(sequence)} nucleotides, {hets} heterozygous{covered}")
+            else:
+                messagebox.showinfo("Success", f"Loaded sequence: {len(sequence)} nucleotides")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load file: {str(e)}")
 
@@ -454,55 +812,49 @@ class MutationAnalyzer:
             self.fetch_status.config(text="🔍 Searching NCBI database...")
             self.root.update()
             search_term = f'({gene_name}[Gene Name]) AND "Homo sapiens"[Organism] AND RefSeq[Filter]'
-            handle = Entrez.esearch(db="nucleotide", term=search_term, retmax=5)
-            search_results = Entrez.read(handle)
-            handle.close()
+            with METRICS.stage("fetch"):
+                handle = entrez().esearch(db="nucleotide", term=search_term, retmax=20)
+                search_results = entrez().read(handle)
+                handle.close()
             if not search_results["IdList"]:
                 self.fetch_status.config(text="❌ Gene not found")
                 messagebox.showerror("Not Found", f"Gene '{gene_name}' not found in NCBI database")
                 return
             self.fetch_status.config(text="📥 Downloading sequence data...")
             self.root.update()
-            record_id = search_results["IdList"][0]
-            handle = Entrez.efetch(db="nucleotide", id=record_id, rettype="gb", retmode="text")
-            record = SeqIO.read(handle, "genbank")
-            handle.close()
-            # Extract chromosome from features
-            for feature in record.features:
-                if feature.type == "source" and "chromosome" in feature.qualifiers:
-                    self.chrom = feature.qualifiers["chromosome"][0]
-                    break
-            else:
-                self.chrom = None  # Default if not found
+            record_id = self.pick_reference_record(search_results["IdList"])
+            with METRICS.stage("fetch", items=1):
+                from Bio import SeqIO
+                handle = entrez().efetch(db="nucleotide", id=record_id, rettype="gb", retmode="text")
+                record = SeqIO.read(handle, "genbank")
+                handle.close()
+            ref_seq = self.load_genbank_record(record)
+            self.circular_var.set(self.circular)
+            self.gene_name = gene_name
             self.ref_text.delete('1.0', tk.END)
-            self.ref_text.insert('1.0', str(record.seq))
-            self.exon_ranges = []
-            self.intron_ranges = []
-            for feature in record.features:
-                if feature.type == "exon":
-                    start = int(feature.location.start) + 1  # 1-based indexing
-                    end = int(feature.location.end)
-                    self.exon_ranges.append((start, end))
-                elif feature.type == "CDS":  # Fallback to CDS if exons are not annotated
-                    start = int(feature.location.start) + 1
-                    end = int(feature.location.end)
-                    self.exon_ranges.append((start, end))
-            if len(self.exon_ranges) > 1:
-                self.exon_ranges.sort()
-                for i in range(len(self.exon_ranges) - 1):
-                    intron_start = self.exon_ranges[i][1] + 1
-                    intron_end = self.exon_ranges[i + 1][0] - 1
-                    if intron_start <= intron_end:
-                        self.intron_ranges.append((intron_start, intron_end))
-            success_msg = f"✅ Fetched {gene_name}: {len(self.exon_ranges)} exons, {len(self.intron_ranges)} introns"
+            self.ref_text.insert('1.0', ref_seq)
+            success_msg = f"✅ Fetched {gene_name} ({self.reference_accession}): {len(self.transcripts)} transcripts, {len(self.exon_ranges)} exons, {len(self.intron_ranges)} introns"
             self.fetch_status.config(text=success_msg)
-            messagebox.showinfo("Success", f"Successfully fetched {gene_name}\nSequence length: {len(record.seq)} bp\nExons: {len(self.exon_ranges)}\nIntrons: {len(self.intron_ranges)}\nChromosome: {self.chrom or 'Unknown'}")
+            messagebox.showinfo("Success", f"Successfully fetched {gene_name}\nAccession: {self.reference_accession}\nSequence length: {len(record.seq)} bp\nTranscripts: {len(self.transcripts)}\nExons: {len(self.exon_ranges)}\nIntrons: {len(self.intron_ranges)}\nChromosome: {self.chrom or 'Unknown'}")
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
             self.fetch_status.config(text=error_msg)
             messagebox.showerror("Fetch Error", f"Failed to fetch gene data:\n{str(e)}")
 
+    def pick_reference_record(self, id_list):
+        # A RefSeqGene (NG_) record carries every isoform of the gene on one
+        # genomic coordinate system; prefer it over single-transcript NM_/NR_.
+        with METRICS.stage("fetch"):
+            handle = entrez().esummary(db="nucleotide", id=",".join(id_list))
+            summaries = entrez().read(handle)
+            handle.close()
+        for summary in summaries:
+            if str(summary.get("Caption", "")).startswith("NG_"):
+                return str(summary["Id"])
+        return id_list[0]
+
     def align_sequences_threaded(self):
+        self.ensure_tab('mutation')  # Alignment enables the analysis buttons
         def align():
             self.align_sequences()
         thread = threading.Thread(target=align, daemon=True)
@@ -523,31 +875,20 @@ class MutationAnalyzer:
             self.root.update()
             start_time = time.time()
             timeout = 300
-            if self.algo_var.get() == "Global (Needleman-Wunsch)":
-                alignments = pairwise2.align.globalms(ref_seq, sample_seq, 1, -1, -10, -1, one_alignment_only=True)
-            else:
-                alignments = pairwise2.align.localms(ref_seq, sample_seq, 1, -1, -10, -1, one_alignment_only=True)
+            self.circular = self.circular_var.get()
+            score = self.compute_alignment(ref_seq, sample_seq, self.algo_var.get())
             if time.time() - start_time > timeout:
                 raise TimeoutError("Alignment took too long and was terminated.")
-            if not alignments:
-                raise ValueError("No valid alignment generated")
             self.progress_var.set(75)
             self.root.update()
-            best_alignment = alignments[0]
-            self.aligned_ref = best_alignment.seqA
-            self.aligned_sample = best_alignment.seqB
-            score = best_alignment.score
-            self.alignment_text.config(state='normal')
-            self.alignment_text.delete('1.0', tk.END)
-            alignment_display = self.format_alignment_display(self.aligned_ref, self.aligned_sample, score)
-            self.alignment_text.insert('1.0', alignment_display)
-            self.alignment_text.config(state='disabled')
+            self.format_alignment_display(self.aligned_ref, self.aligned_sample, score)
             self.progress_var.set(100)
             self.progress_label.config(text=f"✅ Alignment complete! Score: {score:.1f} (Time: {time.time() - start_time:.1f}s)")
             self.analysis_status.config(text="Ready for mutation analysis", fg=self.colors['success'])
             self.analyze_btn.state(['!disabled'])
             self.pathogenicity_btn.state(['disabled'])
-            messagebox.showinfo("Alignment Complete", f"Alignment successful!\nAlgorithm: {self.algo_var.get()}\nScore: {score:.1f}\nLength: {len(self.aligned_ref)} bp\nTime: {time.time() - start_time:.1f}s")
+            algorithm = "Ungapped fast path (no indels detected)" if self.ungapped_columns is not None else self.algo_var.get()
+            messagebox.showinfo("Alignment Complete", f"Alignment successful!\nAlgorithm: {algorithm}\nScore: {score:.1f}\nLength: {len(self.aligned_ref)} bp\nTime: {time.time() - start_time:.1f}s")
         except TimeoutError:
             self.progress_label.config(text="❌ Alignment timed out")
             messagebox.showerror("Alignment Error", "Alignment took too long and was terminated. Consider using local alignment or shorter sequences.")
@@ -557,28 +898,41 @@ class MutationAnalyzer:
             messagebox.showerror("Alignment Error", f"Failed to align sequences: {str(e)}")
             self.progress_var.set(0)
 
+    def locate_in_reference(self):
+        try:
+            ref_seq = self.ref_text.get('1.0', tk.END).strip().upper()
+            if not ref_seq:
+                messagebox.showwarning("Input Error", "Load a reference sequence first")
+                return
+            query = simpledialog.askstring("Locate Primer/Amplicon", "Primer or amplicon sequence:", parent=self.root)
+            if not query:
+                return
+            if not self.validate_sequence(query):
+                messagebox.showwarning("Invalid Sequence", "Query contains invalid characters")
+                return
+            hits = self.locate(query, ref_seq)
+            if not hits:
+                messagebox.showinfo("Locate Primer/Amplicon", "No exact match in the reference")
+                return
+            length = len(self.parse_fasta(query))
+            lines = [f"{start}-{start + length - 1} ({strand})" for start, strand in hits[:50]]
+            if len(hits) > 50:
+                lines.append(f"... {len(hits) - 50} more")
+            messagebox.showinfo("Locate Primer/Amplicon", f"{len(hits)} exact match(es):\n" + "\n".join(lines))
+        except Exception as e:
+            messagebox.showerror("Locate Error", f"Failed to search the reference: {str(e)}")
+
     def format_alignment_display(self, seq1, seq2, score, line_length=80):
+        if 'alignment' not in self.built_tabs:
+            return None  # Rendered when the tab is first shown
+        display, tags = self.format_alignment(seq1, seq2, score, line_length)
         self.alignment_text.config(state='normal')
         self.alignment_text.delete('1.0', tk.END)
-        matches = sum(1 for a, b in zip(seq1, seq2) if a == b and a != '-')
-        identity = (matches / len(seq1)) * 100 if len(seq1) > 0 else 0
-        result = f"Alignment Score: {score:.1f}\nLength: {len(seq1)} bp\nIdentity: {identity:.2f}%\n" + "=" * 50 + "\n\n"
-        self.alignment_text.insert(tk.END, result)
-        for i in range(0, len(seq1), line_length):
-            chunk1 = seq1[i:i+line_length]
-            chunk2 = seq2[i:i+line_length]
-            match_line = ""
-            for j in range(len(chunk1)):
-                if j < len(chunk2) and chunk1[j] == chunk2[j] and chunk1[j] != '-':
-                    match_line += "|"
-                    self.alignment_text.tag_add("match", f"{self.alignment_text.index(tk.END).split('.')[0]}.{len('Ref:    ')+j}")
-                else:
-                    match_line += " "
-                    if chunk1[j] != '-' and j < len(chunk2) and chunk2[j] != '-':
-                        self.alignment_text.tag_add("mismatch", f"{self.alignment_text.index(tk.END).split('.')[0]}.{len('Ref:    ')+j}")
-            self.alignment_text.insert(tk.END, f"Ref:    {chunk1}\n        {match_line}\nSample: {chunk2}\n\n")
+        self.alignment_text.insert('1.0', display)
+        for tag, line, start, end in tags:
+            self.alignment_text.tag_add(tag, f"{line}.{start}", f"{line}.{end}")
         self.alignment_text.config(state='disabled')
-        return result
+        return display
 
     def enable_mutation_options(self):
         # Enable buttons only after genetic code is selected
@@ -598,31 +952,9 @@ class MutationAnalyzer:
                 return
             self.analysis_status.config(text="🔬 Analyzing mutations...")
             self.root.update()
-            self.mutations = []
-            ref_pos = 0
-            i = 0
-            while i < min(len(self.aligned_ref), len(self.aligned_sample)):
-                ref_base = self.aligned_ref[i]
-                alt_base = self.aligned_sample[i]
-                if ref_base != '-':
-                    ref_pos += 1
-                if ref_base != '-' and alt_base != '-' and ref_base != alt_base:
-                    mutation = self.analyze_snp(ref_pos, ref_base, alt_base)
-                    if mutation:
-                        self.mutations.append(mutation)
-                elif ref_base != '-' and alt_base == '-':
-                    del_length, del_seq = self.get_deletion_info(i, self.aligned_ref, self.aligned_sample)
-                    mutation = self.analyze_deletion(ref_pos, del_seq, del_length)
-                    if mutation:
-                        self.mutations.append(mutation)
-                    i += del_length - 1
-                elif ref_base == '-' and alt_base != '-':
-                    ins_length, ins_seq = self.get_insertion_info(i, self.aligned_ref, self.aligned_sample)
-                    mutation = self.analyze_insertion(ref_pos, ins_seq, ins_length)
-                    if mutation:
-                        self.mutations.append(mutation)
-                    i += ins_length - 1
-                i += 1
+            self.genetic_code = self.code_var.get()
+            self.call_mutations()
+            self.save_run()
             self.update_mutation_table()
             self.update_summary()
             self.update_protein_display()
@@ -636,163 +968,198 @@ class MutationAnalyzer:
             self.analysis_status.config(text="❌ Analysis failed", fg=self.colors['danger'])
             messagebox.showerror("Analysis Error", f"Failed to analyze mutations: {str(e)}")
 
-    def get_deletion_info(self, start_pos, ref_seq, alt_seq):
-        del_seq = ""
-        length = 0
-        pos = start_pos
-        while pos < len(ref_seq) and pos < len(alt_seq) and ref_seq[pos] != '-' and alt_seq[pos] == '-':
-            del_seq += ref_seq[pos]
-            length += 1
-            pos += 1
-        return length, del_seq if length > 0 else ("", 0)
-
-    def get_insertion_info(self, start_pos, ref_seq, alt_seq):
-        ins_seq = ""
-        length = 0
-        pos = start_pos
-        while pos < len(ref_seq) and pos < len(alt_seq) and ref_seq[pos] == '-' and alt_seq[pos] != '-':
-            ins_seq += alt_seq[pos]
-            length += 1
-            pos += 1
-        return length, ins_seq if length > 0 else ("", 0)
-
-    def get_region(self, position):
-        for start, end in self.exon_ranges:
-            if start <= position <= end:
-                return "Exon"
-        for start, end in self.intron_ranges:
-            if start <= position <= end:
-                return "Intron"
-        return "Intergenic"
-
-    def analyze_snp(self, position, ref_base, alt_base):
-        if not ref_base or not alt_base or ref_base == alt_base:
-            return None
-        region = self.get_region(position)
-        effect = "Substitution"
-        severity = "🟢 Low"
-        frameshift = "No"
-        sift = "-"
-        polyphen = "-"
-        if region == "Exon":
-            effect, severity = self.analyze_coding_effect(position, ref_base, alt_base)
-        elif region == "Intron":
-            effect = "Intronic"
-            severity = "⚪ Minimal"
-        return {
-            'position': position,
-            'ref': ref_base,
-            'alt': alt_base,
-            'type': 'SNP',
-            'region': region,
-            'effect': effect,
-            'frameshift': frameshift,
-            'severity': severity,
-            'sift': sift,
-            'polyphen': polyphen
-        }
+    def call_from_fastq_threaded(self):
+        file_path = filedialog.askopenfilename(filetypes=[("FASTQ files", "*.fastq *.fq *.fastq.gz *.fq.gz"), ("All files", "*.*")], title="Select Amplicon Reads")
+        if not file_path:
+            return
+        self.ensure_tab('mutation')
+        thread = threading.Thread(target=self.call_from_fastq, args=(file_path,), daemon=True)
+        thread.start()
 
-    def analyze_deletion(self, position, del_seq, length):
-        if length == 0:
-            return None
-        region = self.get_region(position)
-        effect = "Deletion"
-        severity = "🟠 Medium"
-        frameshift = "No"
-        if region == "Exon" and length > 0:
-            if length % 3 == 0:
-                effect = "In-frame deletion"
-                severity = "🟠 Medium"
-            else:
-                effect = "Frameshift deletion"
-                severity = "🔴 High"
-                frameshift = "Yes"
-        return {
-            'position': position,
-            'ref': del_seq,
-            'alt': '-',
-            'type': 'Deletion',
-            'region': region,
-            'effect': effect,
-            'frameshift': frameshift,
-            'severity': severity,
-            'sift': '-',
-            'polyphen': '-'
-        }
+    def call_from_fastq(self, file_path):
+        try:
+            ref_seq = self.ref_text.get('1.0', tk.END).strip().upper()
+            if not ref_seq or not self.validate_sequence(ref_seq):
+                messagebox.showwarning("Input Error", "A valid reference sequence is required")
+                return
+            self.analysis_status.config(text="📥 Mapping reads...", fg=self.colors['info'])
+            self.root.update()
+            self.genetic_code = self.code_var.get()
+            self.circular = self.circular_var.get()
+            self.call_from_reads(file_path, ref_seq, progress=lambda reads: self.analysis_status.config(text=f"📥 Mapped {reads:,} reads..."))
+            self.save_run(os.path.basename(file_path))
+            self.update_mutation_table()
+            self.update_summary()
+            self.analysis_status.config(text=f"✅ Found {len(self.mutations)} variants in {self.pileup.reads:,} reads", fg=self.colors['success'])
+            self.pathogenicity_btn.state(['!disabled'])
+            messagebox.showinfo("Analysis Complete", f"Read pileup complete!\nReads: {self.pileup.reads:,} ({self.pileup.mapped:,} mapped)\nVariants: {len(self.mutations)}\nCheck the Mutations tab for details")
+        except Exception as e:
+            self.analysis_status.config(text="❌ Analysis failed", fg=self.colors['danger'])
+            messagebox.showerror("Analysis Error", f"Failed to call variants from reads: {str(e)}")
 
-    def analyze_insertion(self, position, ins_seq, length):
-        if length == 0:
-            return None
-        region = self.get_region(position)
-        effect = "Insertion"
-        severity = "🟠 Medium"
-        frameshift = "No"
-        if region == "Exon" and length > 0:
-            if length % 3 == 0:
-                effect = "In-frame insertion"
-                severity = "🟠 Medium"
-            else:
-                effect = "Frameshift insertion"
-                severity = "🔴 High"
-                frameshift = "Yes"
-        return {
-            'position': position,
-            'ref': '-',
-            'alt': ins_seq,
-            'type': 'Insertion',
-            'region': region,
-            'effect': effect,
-            'frameshift': frameshift,
-            'severity': severity,
-            'sift': '-',
-            'polyphen': '-'
-        }
+    def tile_amplicons_threaded(self):
+        file_path = filedialog.askopenfilename(filetypes=[("FASTA files", "*.fasta *.fa *.fas"), ("All files", "*.*")], title="Select Amplicons (multi-FASTA)")
+        if not file_path:
+            return
+        self.ensure_tab('mutation')
+        thread = threading.Thread(target=self.tile_amplicons_file, args=(file_path,), daemon=True)
+        thread.start()
 
-    def analyze_coding_effect(self, position, ref_base, alt_base):
+    def tile_amplicons_file(self, file_path):
         try:
-            codon_pos = self.get_codon_position(position)
-            if codon_pos == -1:
-                return "Non-coding", "⚪ Minimal"
-            ref_codon = self.get_codon_at_position(position, ref_base, is_ref=True)
-            alt_codon = self.get_codon_at_position(position, alt_base, is_ref=False)
-            table = 1 if self.code_var.get() == "Standard" else 2
-            if len(ref_codon) == 3 and len(alt_codon) == 3:
-                ref_aa = str(Seq(ref_codon).translate(table=table))
-                alt_aa = str(Seq(alt_codon).translate(table=table))
-                if ref_aa == alt_aa:
-                    return "Silent", "🟢 Low"
-                elif alt_aa == '*':
-                    return "Nonsense", "🔴 High"
-                else:
-                    return "Missense", "🟠 Medium"
-            return "Unknown", "⚪ Minimal"
-        except Exception:
-            return "Unknown", "⚪ Minimal"
-
-    def get_codon_position(self, position):
-        for start, end in self.exon_ranges:
-            if start <= position <= end:
-                return ((position - start) % 3) + 1
-        return -1
-
-    def get_codon_at_position(self, position, base, is_ref=True):
+            from mutanalyzer_tiling import read_amplicons
+            ref_seq = self.ref_text.get('1.0', tk.END).strip().upper()
+            if not ref_seq or not self.validate_sequence(ref_seq):
+                messagebox.showwarning("Input Error", "A valid reference sequence is required")
+                return
+            with open(file_path, 'r') as f:
+                amplicons = read_amplicons(f.read())
+            self.analysis_status.config(text="🧩 Placing amplicons...", fg=self.colors['info'])
+            self.root.update()
+            self.genetic_code = self.code_var.get()
+            self.tile_amplicons(amplicons, ref_seq, progress=lambda placed: self.analysis_status.config(text=f"🧩 Placed {placed:,}/{len(amplicons):,} amplicons..."))
+            self.save_run(os.path.basename(file_path))
+            self.format_alignment_display(self.aligned_ref, self.aligned_sample, self.alignment_score)
+            self.update_mutation_table()
+            self.update_summary()
+            self.update_protein_display()
+            gaps = self.tiling.gaps()
+            self.analysis_status.config(text=f"✅ Found {len(self.mutations)} variants across {len(self.tiling.hits)} amplicon hits", fg=self.colors['success'])
+            self.pathogenicity_btn.state(['!disabled'])
+            messagebox.showinfo("Analysis Complete", f"Amplicon tiling complete!\nAmplicons: {self.tiling.amplicons} ({self.tiling.placed} placed)\nHits: {len(self.tiling.hits)}\nUncovered stretches: {len(gaps)}\nVariants: {len(self.mutations)}\nCheck the Mutations tab for details")
+        except Exception as e:
+            self.analysis_status.config(text="❌ Analysis failed", fg=self.colors['danger'])
+            messagebox.showerror("Analysis Error", f"Failed to tile amplicons: {str(e)}")
+
+    def analyze_plate_threaded(self):
+        folder = filedialog.askdirectory(title="Select Plate Folder (.ab1 traces)")
+        if not folder:
+            return
+        self.ensure_tab('mutation')
+        thread = threading.Thread(target=self.analyze_plate_folder, args=(folder,), daemon=True)
+        thread.start()
+
+    def analyze_plate_folder(self, folder):
+        try:
+            from mutanalyzer_cohort import Cohort
+            from mutanalyzer_sanger import analyze_plate, engine_setup, plate_summary, write_plate_csv
+            ref_seq = self.ref_text.get('1.0', tk.END).strip().upper()
+            if not ref_seq or not self.validate_sequence(ref_seq):
+                messagebox.showwarning("Input Error", "A valid reference sequence is required")
+                return
+            self.genetic_code = self.code_var.get()
+            self.circular = self.circular_var.get()
+            self.analysis_status.config(text="🧪 Analyzing plate...", fg=self.colors['info'])
+            results = analyze_plate(folder, ref_seq, engine_setup(self, self.algo_var.get()), self.workers,
+                                    progress=lambda done, total: self.analysis_status.config(text=f"🧪 Analyzed {done}/{total} traces..."))
+            if not results:
+                self.analysis_status.config(text="⚠ No traces found", fg=self.colors['warning'])
+                messagebox.showinfo("Batch", "No .ab1/.abi traces found in the folder")
+                return
+            if self.cohort is None:
+                self.cohort = Cohort()
+            reference = self.reference_accession or ""
+            added = 0
+            for result in results:
+                if not result['error'] and result['sample'] not in self.cohort.sample_rows:
+                    self.cohort.add_sample(result['sample'], result['mutations'], reference, self.exon_ranges)
+                    added += 1
+            self.record_batch(ref_seq, results, self.algo_var.get())
+            self.refresh_runs()
+            self.analysis_status.config(text=f"✅ Analyzed {len(results)} traces", fg=self.colors['success'])
+            messagebox.showinfo("Plate Complete", f"{plate_summary(results)}\n\n{added} traces added to the cohort")
+            file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")], title="Save Plate Results")
+            if file_path:
+                write_plate_csv(results, file_path)
+        except Exception as e:
+            self.analysis_status.config(text="❌ Plate analysis failed", fg=self.colors['danger'])
+            messagebox.showerror("Batch Error", f"Failed to analyze plate: {str(e)}")
+
+    def save_run(self, sample_name=None):
+        # Every analysis lands in the results database; a failure there
+        # must not cost the user the analysis itself
+        try:
+            if sample_name is None:
+                sample_name = self.trace.name if self.trace is not None else "sample"
+            self.record_run(sample_name)
+            self.refresh_runs()
+        except Exception as e:
+            self.analysis_status.config(text=f"⚠ Results not saved: {e}", fg=self.colors['warning'])
+
+    def refresh_runs(self):
+        if 'results' not in self.built_tabs:
+            return
         try:
-            seq = self.aligned_ref if is_ref else self.aligned_sample
-            unaligned_pos = 0
-            aligned_pos = 0
-            for i, char in enumerate(seq):
-                if char != '-':
-                    unaligned_pos += 1
-                if unaligned_pos == position:
-                    aligned_pos = i
-                    break
-            codon_start = (aligned_pos // 3) * 3
-            codon = seq[codon_start:codon_start + 3].replace('-', '')
-            if len(codon) < 3:
-                codon += 'N' * (3 - len(codon))
-            return codon
-        except Exception:
-            return "NNN"
+            for item in self.runs_tree.get_children():
+                self.runs_tree.delete(item)
+            for run in self.get_results_store().runs():
+                gene = run['gene'] or run['accession'] or f"{run['length']} bp"
+                self.runs_tree.insert('', 'end', iid=str(run['id']), values=(run['id'], run['created'].replace('T', ' '), gene, run['names'] or "", run['variants'], run['algorithm']))
+        except Exception as e:
+            messagebox.showerror("Results Database", f"Failed to read past runs: {str(e)}")
+
+    def open_selected_run(self):
+        try:
+            self.ensure_tab('alignment', 'mutation')
+            selection = self.runs_tree.selection()
+            if not selection:
+                messagebox.showinfo("Past Runs", "Select a run to open")
+                return
+            run = self.open_run(int(selection[0]))
+            self.ref_text.delete('1.0', tk.END)
+            self.ref_text.insert('1.0', self.ref_seq)
+            self.sample_text.delete('1.0', tk.END)
+            self.sample_text.insert('1.0', self.sample_seq)
+            if self.aligned_ref:
+                self.format_alignment_display(self.aligned_ref, self.aligned_sample, self.alignment_score)
+            self.update_mutation_table()
+            self.update_summary()
+            self.update_protein_display()
+            self.pathogenicity_btn.state(['!disabled'])
+            names = ", ".join(sample['name'] for sample in run['samples'])
+            self.analysis_status.config(text=f"📂 Opened run {run['id']} ({names}): {len(self.mutations)} variants", fg=self.colors['success'])
+        except Exception as e:
+            messagebox.showerror("Results Database", f"Failed to open run: {str(e)}")
+
+    def save_session_file(self):
+        try:
+            if not self.aligned_ref:
+                messagebox.showwarning("No Data", "Align and analyze a sample before saving a session")
+                return
+            file_path = filedialog.asksaveasfilename(defaultextension=".mas", filetypes=[("MutAnalyzer sessions", "*.mas"), ("All files", "*.*")], title="Save Session")
+            if not file_path:
+                return
+            self.save_session(file_path, os.path.splitext(os.path.basename(file_path))[0])
+            messagebox.showinfo("Session Saved", f"Session saved to:\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("Save Error", f"Failed to save session:\n{str(e)}")
+
+    def open_session_file(self):
+        try:
+            file_path = filedialog.askopenfilename(filetypes=[("MutAnalyzer sessions", "*.mas"), ("All files", "*.*")], title="Open Session")
+            if not file_path:
+                return
+            self.ensure_tab('alignment', 'mutation')
+            header = self.open_session(file_path)
+            self.code_var.set(self.genetic_code)
+            self.circular_var.set(self.circular)
+            self.ref_text.delete('1.0', tk.END)
+            self.ref_text.insert('1.0', self.ref_seq)
+            self.sample_text.delete('1.0', tk.END)
+            self.sample_text.insert('1.0', self.sample_seq)
+            if self.gene_name:
+                self.gene_entry.delete(0, tk.END)
+                self.gene_entry.insert(0, self.gene_name)
+            self.format_alignment_display(self.aligned_ref, self.aligned_sample, self.alignment_score)
+            self.update_mutation_table()
+            self.update_summary()
+            self.update_protein_display()
+            self.update_density_track()
+            self.analyze_btn.state(['!disabled'])
+            self.pathogenicity_btn.state(['!disabled'])
+            self.analysis_status.config(text=f"📂 Opened session {header['sample_name']} ({header['created'].replace('T', ' ')}): {len(self.mutations)} variants", fg=self.colors['success'])
+        except Exception as e:
+            messagebox.showerror("Session Error", f"Failed to open session:\n{str(e)}")
 
     def predict_pathogenicity_threaded(self):
         def predict():
@@ -804,35 +1171,15 @@ class MutationAnalyzer:
         try:
             self.analysis_status.config(text="🔍 Predicting pathogenicity locally...", fg=self.colors['info'])
             self.root.update()
-            missense_mutations = [m for m in self.mutations if m['effect'] == 'Missense' and m['type'] == 'SNP']
+            self.genetic_code = self.code_var.get()
+            missense_mutations = self.score_pathogenicity()
+            if self.run_id is not None:
+                self.save_run()
             if not missense_mutations:
                 self.analysis_status.config(text="⚠ No missense mutations to analyze", fg=self.colors['warning'])
                 messagebox.showinfo("No Missense Mutations", "No missense mutations detected for pathogenicity prediction.")
                 return
 
-            # Local pathogenicity prediction logic
-            for mut in missense_mutations:
-                position = mut['position']
-                ref_base = mut['ref']
-                alt_base = mut['alt']
-                ref_codon = self.get_codon_at_position(position, ref_base, is_ref=True)
-                alt_codon = self.get_codon_at_position(position, alt_base, is_ref=False)
-                table = 1 if self.code_var.get() == "Standard" else 2
-                ref_aa = str(Seq(ref_codon).translate(table=table))
-                alt_aa = str(Seq(alt_codon).translate(table=table))
-
-                # Simplified SIFT-like score (conservation-based)
-                conservation_score = self.calculate_conservation_score(ref_aa)
-                sift_score = 1.0 - (conservation_score / 100.0)  # Inverse relation, 0-1 scale
-                sift_pred = "Tolerated" if sift_score > 0.05 else "Deleterious"
-
-                # PolyPhen-like score (Grantham distance for physicochemical difference)
-                polyphen_score = self.calculate_grantham_distance(ref_aa, alt_aa)
-                polyphen_pred = "Benign" if polyphen_score < 50 else "Possibly Damaging" if polyphen_score < 100 else "Probably Damaging"
-
-                mut['sift'] = f"{sift_pred} ({sift_score:.2f})"
-                mut['polyphen'] = f"{polyphen_pred} ({polyphen_score:.2f})"
-
             self.update_mutation_table()
             self.update_summary()
             self.update_protein_display()
@@ -842,131 +1189,117 @@ class MutationAnalyzer:
             self.analysis_status.config(text="❌ Pathogenicity prediction failed", fg=self.colors['danger'])
             messagebox.showerror("Prediction Error", f"Failed to predict pathogenicity:\n{str(e)}")
 
-    def calculate_conservation_score(self, aa):
-        # Simplified conservation score based on frequency of amino acids (hypothetical values)
-        conservation = {
-            'A': 80, 'C': 70, 'D': 60, 'E': 60, 'F': 50, 'G': 90, 'H': 60, 'I': 50,
-            'K': 60, 'L': 50, 'M': 50, 'N': 60, 'P': 70, 'Q': 60, 'R': 60, 'S': 70,
-            'T': 70, 'V': 60, 'W': 40, 'Y': 50
-        }
-        return conservation.get(aa, 50)  # Default to 50 if amino acid not found
-
-    def calculate_grantham_distance(self, ref_aa, alt_aa):
-        # Grantham distance matrix (simplified values based on physicochemical properties)
-        grantham_matrix = {
-            ('A', 'A'): 0, ('A', 'C'): 195, ('A', 'D'): 126, ('A', 'E'): 153, ('A', 'F'): 176,
-            ('A', 'G'): 60, ('A', 'H'): 90, ('A', 'I'): 94, ('A', 'K'): 135, ('A', 'L'): 145,
-            ('A', 'M'): 140, ('A', 'N'): 111, ('A', 'P'): 67, ('A', 'Q'): 147, ('A', 'R'): 112,
-            ('A', 'S'): 99, ('A', 'T'): 86, ('A', 'V'): 64, ('A', 'W'): 191, ('A', 'Y'): 160,
-            ('C', 'C'): 0, ('C', 'D'): 170, ('C', 'E'): 197, ('C', 'F'): 165, ('C', 'G'): 149,
-            ('D', 'D'): 0, ('D', 'E'): 45, ('D', 'F'): 162, ('D', 'G'): 94, ('D', 'H'): 81,
-            # Add other combinations symmetrically as needed...
-        }
-        # Default to a mid-range distance if not in matrix
-        key = tuple(sorted([ref_aa, alt_aa]))
-        return grantham_matrix.get(key, 100)
-
     def update_mutation_table(self):
-        for item in self.mutation_tree.get_children():
-            self.mutation_tree.delete(item)
-        if self.mutations:
-            for mut in self.mutations:
-                self.mutation_tree.insert('', 'end', values=(
-                    mut['position'],
-                    mut['ref'],
-                    mut['alt'],
-                    mut['type'],
-                    mut['region'],
-                    mut['effect'],
-                    mut['frameshift'],
-                    mut['severity'],
-                    mut['sift'],
-                    mut['polyphen']
-                ))
-        else:
-            self.mutation_tree.insert('', 'end', values=("No mutations detected", "", "", "", "", "", "", "", "", ""))
+        if 'mutation' not in self.built_tabs:
+            return
+        with METRICS.stage("render", items=len(self.mutations)):
+            for item in self.mutation_tree.get_children():
+                self.mutation_tree.delete(item)
+            if self.mutations:
+                for i, mut in enumerate(self.mutations):
+                    self.mutation_tree.insert('', 'end', iid=str(i), values=(
+                        mut['position'],
+                        mut['ref'],
+                        mut['alt'],
+                        mut['type'],
+                        mut['region'],
+                        mut['effect'],
+                        mut['frameshift'],
+                        mut['severity'],
+                        mut['sift'],
+                        mut['polyphen'],
+                        mut.get('transcript', '-')
+                    ))
+            else:
+                self.mutation_tree.insert('', 'end', values=("No mutations detected", "", "", "", "", "", "", "", "", "", ""))
 
     def update_protein_display(self):
-        try:
-            self.protein_text.config(state='normal')
-            self.protein_text.delete('1.0', tk.END)
-            if not self.aligned_ref or not self.aligned_sample:
-                self.protein_text.insert('1.0', "No alignment available")
+        # Built as one string plus (tag, line, start column, end column)
+        # ranges, inserted in a single call and tagged afterwards
+        if 'results' not in self.built_tabs:
+            return
+        with METRICS.stage("render"):
+            try:
+                self.protein_text.config(state='normal')
+                self.protein_text.delete('1.0', tk.END)
+                if not self.aligned_ref or not self.aligned_sample:
+                    self.protein_text.insert('1.0', "No alignment available")
+                    self.protein_text.config(state='disabled')
+                    return
+                self.genetic_code = self.code_var.get()
+                consequences = self.protein_consequences()
+                lines = ["Protein Consequences (HGVS):"]
+                tags = []
+                for consequence in consequences:
+                    protein = f" → {consequence['protein_id']}" if consequence['protein_id'] else ""
+                    strand = "+" if consequence['strand'] == 1 else "-"
+                    lines.append(f"  {consequence['transcript']}{protein} ({strand} strand, {len(consequence['ref_protein'])} aa): {', '.join(consequence['changes'])}")
+                changed = [c for c in consequences if c['changes'] != ["p.(=)"]]
+                for consequence in changed[:PROTEIN_VIEW_LIMIT]:
+                    lines.append("")
+                    note = f", frameshift from residue {consequence['fs_start'] + 1}" if consequence['frameshift'] else ""
+                    lines.append(f"{consequence['transcript']} (Reference / Sample{note}):")
+                    self.protein_alignment_lines(consequence, lines, tags)
+                if len(changed) > PROTEIN_VIEW_LIMIT:
+                    lines.append(f"\n... {len(changed) - PROTEIN_VIEW_LIMIT} more changed transcript(s), listed above")
+                lines.append("")
+                lines.append("Pathogenicity Predictions (Missense Mutations):")
+                missense_mutations = [m for m in self.mutations if m['effect'] == 'Missense' and m['type'] == 'SNP']
+                if missense_mutations:
+                    for mut in missense_mutations:
+                        lines.append(f"Pos {mut['position']}: {mut['ref']}>{mut['alt']} - SIFT: {mut['sift']}, PolyPhen: {mut['polyphen']}")
+                else:
+                    lines.append("No missense mutations detected.")
+                self.protein_text.insert('1.0', "\n".join(lines))
+                for tag, line, first, last in tags:
+                    self.protein_text.tag_add(tag, f"{line}.{first}", f"{line}.{last}")
                 self.protein_text.config(state='disabled')
-                return
-            ref_seq_no_gaps = self.aligned_ref.replace('-', '')
-            sample_seq_no_gaps = self.aligned_sample.replace('-', '')
-            table = 1 if self.code_var.get() == "Standard" else 2
-            ref_protein = str(Seq(ref_seq_no_gaps).translate(table=table, to_stop=False))
-            sample_protein = str(Seq(sample_seq_no_gaps).translate(table=table, to_stop=False))
-            display = "Reference Protein:\n"
-            for i, aa in enumerate(ref_protein):
-                display += aa
-                if i < len(sample_protein) and sample_protein[i] != aa:
-                    self.protein_text.tag_add("changed_aa", f"{self.protein_text.index(tk.END).split('.')[0]}.{len(display)-1}")
-            display += "\n\nSample Protein:\n"
-            for aa in sample_protein:
-                display += aa
-            display += "\n\nPathogenicity Predictions (Missense Mutations):\n"
-            missense_mutations = [m for m in self.mutations if m['effect'] == 'Missense' and m['type'] == 'SNP']
-            if missense_mutations:
-                for mut in missense_mutations:
-                    display += f"Pos {mut['position']}: {mut['ref']}>{mut['alt']} - SIFT: {mut['sift']}, PolyPhen: {mut['polyphen']}\n"
-            else:
-                display += "No missense mutations detected.\n"
-            self.protein_text.insert('1.0', display)
-            self.protein_text.config(state='disabled')
-        except Exception as e:
-            self.protein_text.insert('1.0', f"Error generating protein sequences: {str(e)}")
-            self.protein_text.config(state='disabled')
+            except Exception as e:
+                self.protein_text.insert('1.0', f"Error generating protein sequences: {str(e)}")
+                self.protein_text.config(state='disabled')
+
+    def protein_alignment_lines(self, consequence, lines, tags, width=60):
+        # Appends Ref/Sample rows in blocks of `width` columns; residues that
+        # differ, sit in a shifted frame or are stops get tag ranges
+        aligned_ref, aligned_alt = consequence['aligned_ref'], consequence['aligned_alt']
+        fs_start = consequence['fs_start'] if consequence['frameshift'] else None
+        ref_number = alt_number = 1
+        for block in range(0, len(aligned_ref), width):
+            ref_row = aligned_ref[block:block + width]
+            alt_row = aligned_alt[block:block + width]
+            lines.append(f"Ref    {ref_number:>6} {ref_row}")
+            lines.append(f"Sample {alt_number:>6} {alt_row}")
+            offset = 14  # Width of the row label
+            spans = []
+            residue = alt_number
+            for column, (ref_aa, alt_aa) in enumerate(zip(ref_row, alt_row)):
+                if ref_aa != alt_aa and '*' in (ref_aa, alt_aa):
+                    tag = "stop_aa"
+                elif fs_start is not None and alt_aa != '-' and residue > fs_start:
+                    tag = "frameshift_aa"
+                elif ref_aa != alt_aa:
+                    tag = "changed_aa"
+                else:
+                    tag = None
+                residue += alt_aa != '-'
+                if tag is None:
+                    continue
+                if spans and spans[-1][0] == tag and spans[-1][2] == offset + column:
+                    spans[-1][2] += 1
+                else:
+                    spans.append([tag, offset + column, offset + column + 1])
+            for tag, first, last in spans:
+                tags.append((tag, len(lines), first, last))
+                if tag != "frameshift_aa":
+                    tags.append((tag, len(lines) - 1, first, last))
+            ref_number += len(ref_row) - ref_row.count('-')
+            alt_number += len(alt_row) - alt_row.count('-')
+            lines.append("")
 
     def update_summary(self):
-        current_time = datetime.now()
-        if not self.mutations:
-            summary = "No mutations detected."
-        else:
-            total = len(self.mutations)
-            snps = len([m for m in self.mutations if m['type'] == 'SNP'])
-            insertions = len([m for m in self.mutations if m['type'] == 'Insertion'])
-            deletions = len([m for m in self.mutations if m['type'] == 'Deletion'])
-            exonic = len([m for m in self.mutations if m['region'] == 'Exon'])
-            intronic = len([m for m in self.mutations if m['region'] == 'Intron'])
-            high_severity = len([m for m in self.mutations if '🔴' in m['severity']])
-            medium_severity = len([m for m in self.mutations if '🟠' in m['severity']])
-            low_severity = len([m for m in self.mutations if '🟢' in m['severity']])
-            missense = len([m for m in self.mutations if m['effect'] == 'Missense'])
-            with_sift = len([m for m in self.mutations if m['sift'] != '-'])
-            with_polyphen = len([m for m in self.mutations if m['polyphen'] != '-'])
-            summary = f"""🧬 MUTATION ANALYSIS SUMMARY
-Generated: {current_time.strftime('%Y-%m-%d %H:%M:%S')} PKT
-
-📊 MUTATION COUNTS:
-   Total Mutations: {total}
-   • SNPs: {snps}
-   • Insertions: {insertions} 
-   • Deletions: {deletions}
-
-📍 GENOMIC LOCATION:
-   • Exonic: {exonic}
-   • Intronic: {intronic}
-   • Intergenic: {total - exonic - intronic}
-
-⚠ SEVERITY DISTRIBUTION:
-   • High (🔴): {high_severity}
-   • Medium (🟠): {medium_severity}
-   • Low (🟢): {low_severity}
-
-🧬 PATHOGENICITY PREDICTIONS:
-   • Missense Mutations: {missense}
-   • With SIFT Scores: {with_sift}
-   • With PolyPhen-2 Scores: {with_polyphen}
-
-🔗 ALIGNMENT INFO:
-   Reference Length: {len(self.aligned_ref)} bp
-   Sample Length: {len(self.aligned_sample)} bp
-   Exons Analyzed: {len(self.exon_ranges)}
-   Introns Analyzed: {len(self.intron_ranges)}
-"""
+        if 'results' not in self.built_tabs:
+            return
+        summary = self.build_summary()
         self.summary_text.config(state='normal')
         self.summary_text.delete('1.0', tk.END)
         self.summary_text.insert('1.0', summary)
@@ -980,8 +1313,11 @@ Generated: {current_time.strftime('%Y-%m-%d %H:%M:%S')} PKT
         values = item['values']
         if not values or values[0] == "No mutations detected":
             return
-        position, ref, alt, mut_type, region, effect, frameshift, severity, sift, polyphen = values
-        mut_detail = next((mut for mut in self.mutations if mut['position'] == position and mut['ref'] == ref and mut['alt'] == alt and mut['type'] == mut_type), None)
+        position, ref, alt, mut_type, region, effect, frameshift, severity, sift, polyphen, transcript = values
+        # Rows are keyed by their index in self.mutations; records are
+        # normalized and deduplicated, so no matching on displayed values
+        index = int(selection[0]) if selection[0].isdigit() else -1
+        mut_detail = self.mutations[index] if 0 <= index < len(self.mutations) else None
         if mut_detail:
             detail_text = f"""🔍 MUTATION DETAILS
 
@@ -993,6 +1329,7 @@ Region: {region}
 Effect: {effect}
 Frameshift: {frameshift}
 Severity: {severity}
+Genotype: {mut_detail.get('genotype', '1/1')}
 SIFT: {sift}
 PolyPhen-2: {polyphen}
 
@@ -1008,6 +1345,18 @@ PolyPhen-2: {polyphen}
                     if start <= position <= end:
                         detail_text += f"   Intron #{i+1} ({start}-{end})\n"
                         break
+            if mut_detail.get('transcripts'):
+                detail_text += "\n🧬 Per-Transcript Consequences:\n"
+                for c in mut_detail['transcripts']:
+                    marker = "★" if c['transcript'] == mut_detail.get('transcript') else " "
+                    change = f" [{c['protein_change']}]" if 'protein_change' in c else ""
+                    detail_text += f" {marker} {c['transcript']} {c['feature']}: {c['effect']}{change} {c['severity']}\n"
+            try:
+                from mutanalyzer_store import seen_text
+                earlier = [o for o in self.seen_before(mut_detail['position'], mut_detail['ref'], mut_detail['alt']) if o['run_id'] != self.run_id]
+                detail_text += f"\n🗂 Earlier Runs:\n{seen_text(earlier)}\n"
+            except Exception as e:
+                detail_text += f"\n🗂 Earlier Runs: unavailable ({e})\n"
             messagebox.showinfo("Mutation Details", detail_text)
 
     def export_to_csv(self):
@@ -1018,23 +1367,7 @@ PolyPhen-2: {polyphen}
             file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")], title="Save Mutations as CSV")
             if not file_path:
                 return
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['Position', 'Reference', 'Alternative', 'Type', 'Region', 'Effect', 'Frameshift', 'Severity', 'SIFT', 'PolyPhen']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                for mut in self.mutations:
-                    writer.writerow({
-                        'Position': mut['position'],
-                        'Reference': mut['ref'],
-                        'Alternative': mut['alt'],
-                        'Type': mut['type'],
-                        'Region': mut['region'],
-                        'Effect': mut['effect'],
-                        'Frameshift': mut['frameshift'],
-                        'Severity': mut['severity'],
-                        'SIFT': mut['sift'],
-                        'PolyPhen': mut['polyphen']
-                    })
+            self.write_csv(file_path)
             messagebox.showinfo("Export Successful", f"Mutations exported to:\n{file_path}")
         except Exception as e:
             messagebox.showerror("Export Error", f"Failed to export data:\n{str(e)}")
@@ -1047,52 +1380,7 @@ PolyPhen-2: {polyphen}
             file_path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")], title="Save Report as PDF")
             if not file_path:
                 return
-            c = canvas.Canvas(file_path, pagesize=letter)
-            c.setFont("Helvetica-Bold", 16)
-            y = 750
-            c.drawString(50, y, "MutAnalyzer Pro - Mutation Analysis Report")
-            y -= 20
-            c.setFont("Helvetica", 12)
-            c.drawString(50, y, f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} PKT")
-            y -= 40
-            c.drawString(50, y, "Summary:")
-            y -= 20
-            c.setFont("Courier", 10)
-            for line in self.summary_text.get('1.0', tk.END).split('\n'):
-                c.drawString(70, y, line)
-                y -= 15
-                if y < 50:
-                    c.showPage()
-                    c.setFont("Courier", 10)
-                    y = 750
-            c.showPage()
-            c.setFont("Helvetica-Bold", 14)
-            y = 750
-            c.drawString(50, y, "Detailed Mutation List")
-            y -= 20
-            c.setFont("Courier", 10)
-            for i, mut in enumerate(self.mutations, 1):
-                c.drawString(70, y, f"{i}. Position {mut['position']}: {mut['ref']} → {mut['alt']}")
-                y -= 15
-                c.drawString(90, y, f"Type: {mut['type']}")
-                y -= 15
-                c.drawString(90, y, f"Region: {mut['region']}")
-                y -= 15
-                c.drawString(90, y, f"Effect: {mut['effect']}")
-                y -= 15
-                c.drawString(90, y, f"Frameshift: {mut['frameshift']}")
-                y -= 15
-                c.drawString(90, y, f"Severity: {mut['severity']}")
-                y -= 15
-                c.drawString(90, y, f"SIFT: {mut['sift']}")
-                y -= 15
-                c.drawString(90, y, f"PolyPhen-2: {mut['polyphen']}")
-                y -= 30
-                if y < 50:
-                    c.showPage()
-                    c.setFont("Courier", 10)
-                    y = 750
-            c.save()
+            self.write_pdf(file_path, self.summary_text.get('1.0', tk.END))
             messagebox.showinfo("Export Successful", f"Report exported to:\n{file_path}")
         except Exception as e:
             messagebox.showerror("Export Error", f"Failed to export PDF:\n{str(e)}")
@@ -1111,25 +1399,7 @@ PolyPhen-2: {polyphen}
             file_path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files", "*.txt"), ("All files", "*.*")], title="Save Analysis Report")
             if not file_path:
                 return
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(self.summary_text.get('1.0', tk.END))
-                f.write("\n" + "="*60 + "\n")
-                f.write("DETAILED MUTATION LIST\n")
-                f.write("="*60 + "\n\n")
-                for i, mut in enumerate(self.mutations, 1):
-                    f.write(f"{i}. Position {mut['position']}: {mut['ref']} → {mut['alt']}\n")
-                    f.write(f"   Type: {mut['type']}\n")
-                    f.write(f"   Region: {mut['region']}\n")
-                    f.write(f"   Effect: {mut['effect']}\n")
-                    f.write(f"   Frameshift: {mut['frameshift']}\n")
-                    f.write(f"   Severity: {mut['severity']}\n")
-                    f.write(f"   SIFT: {mut['sift']}\n")
-                    f.write(f"   PolyPhen-2: {mut['polyphen']}\n\n")
-                if hasattr(self, 'aligned_ref') and self.aligned_ref:
-                    f.write("\n" + "="*60 + "\n")
-                    f.write("SEQUENCE ALIGNMENT\n")
-                    f.write("="*60 + "\n\n")
-                    f.write(self.format_alignment_display(self.aligned_ref, self.aligned_sample, 0))
+            self.write_report(file_path, self.summary_text.get('1.0', tk.END))
             messagebox.showinfo("Report Saved", f"Complete report saved to:\n{file_path}")
         except Exception as e:
             messagebox.showerror("Save Error", f"Failed to save report:\n{str(e)}")
@@ -1138,8 +1408,11 @@ PolyPhen-2: {polyphen}
         self.root.mainloop()
 
 def main():
+    if "--headless" in sys.argv[1:]:
+        from mutanalyzer_headless import main as headless_main
+        sys.exit(headless_main([arg for arg in sys.argv[1:] if arg != "--headless"]))
     print("🧬 Starting MutAnalyzer Pro...")
-    print("⚠  IMPORTANT: Please change the email address in lines 11 and 12 before using NCBI and Ensembl VEP features!")
+    print("⚠  IMPORTANT: Please change ENTREZ_EMAIL and VEP_EMAIL in mutanalyzer_gui.py before using NCBI and Ensembl VEP features!")
     app = MutationAnalyzer()
     app.run()
 
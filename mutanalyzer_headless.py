@@ -0,0 +1,243 @@
+import argparse
+import os
+import sys
+
+from mutanalyzer_engine import MutationEngine, GLOBAL_ALGORITHM, LOCAL_ALGORITHM, SPLIT_ALGORITHM, LINEAR_ALGORITHM, GENETIC_CODES
+from mutanalyzer_cohort import Cohort
+from mutanalyzer_metrics import METRICS
+from mutanalyzer_pileup import MIN_ALLELE_FRACTION, MIN_DEPTH
+from mutanalyzer_queue import WorkQueue, collect, run_worker, wait_for
+from mutanalyzer_store import seen_text
+from mutanalyzer_tiling import read_amplicons
+from mutanalyzer_sanger import TRACE_EXTENSIONS, analyze_plate, engine_setup, plate_summary, write_plate_csv
+
+ALGORITHMS = {
+    'global': GLOBAL_ALGORITHM,
+    'local': LOCAL_ALGORITHM,
+    'split': SPLIT_ALGORITHM,
+    'linear': LINEAR_ALGORITHM,
+}
+
+
+def read_sequence(engine, file_path, ref_seq=None):
+    if file_path.lower().endswith(TRACE_EXTENSIONS):
+        return engine.load_trace(file_path, ref_seq)
+    with open(file_path, 'r') as f:
+        sequence = engine.parse_fasta(f.read())
+    if not sequence:
+        raise ValueError(f"No valid sequence found in {file_path}")
+    if not engine.validate_sequence(sequence):
+        raise ValueError(f"{file_path} contains invalid characters. Only A, T, C, G, N, - allowed")
+    return sequence
+
+
+def parse_exon_ranges(text):
+    ranges = []
+    for part in text.split(','):
+        start, end = part.strip().split('-')
+        ranges.append((int(start), int(end)))
+    return ranges
+
+
+def load_genbank(engine, file_path):
+    from Bio import SeqIO
+    with METRICS.stage("parse"):
+        record = SeqIO.read(file_path, "genbank")
+    return engine.load_genbank_record(record)
+
+
+def run_analysis(engine, ref_seq, sample_seq, algorithm=GLOBAL_ALGORITHM, predict=True):
+    engine.compute_alignment(ref_seq, sample_seq, algorithm)
+    engine.call_mutations()
+    if predict:
+        engine.score_pathogenicity()
+    return engine.mutations
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="MutAnalyzer Pro headless analysis")
+    parser.add_argument("--sample", help="Sample FASTA/text file or Sanger trace (.ab1)")
+    parser.add_argument("--plate", metavar="DIR", help="Analyze every .ab1 trace in a plate folder in parallel")
+    parser.add_argument("--fastq", help="Amplicon reads (FASTQ, optionally .gz) to pile up instead of --sample")
+    parser.add_argument("--min-depth", type=int, default=MIN_DEPTH, help="Minimum read depth for a call (FASTQ mode)")
+    parser.add_argument("--min-af", type=float, default=MIN_ALLELE_FRACTION, help="Minimum allele fraction for a call (FASTQ mode)")
+    parser.add_argument("--amplicons", help="Multi-FASTA of amplicons to tile onto the reference instead of --sample")
+    parser.add_argument("--min-hit-score", type=float, help="Minimum local alignment score of an amplicon hit (default: half a perfect match)")
+    parser.add_argument("--queue", metavar="DIR", help="Work queue directory on a filesystem shared by all worker nodes")
+    parser.add_argument("--submit", nargs="+", metavar="FILE", help="Add one job per sample (FASTA, .ab1 or FASTQ) to --queue")
+    parser.add_argument("--work", action="store_true", help="Run --queue jobs on this node until none are left")
+    parser.add_argument("--wait", action="store_true", help="Report --queue progress until every job has finished")
+    parser.add_argument("--status", action="store_true", help="Print --queue progress and exit")
+    parser.add_argument("--collect", action="store_true", help="Merge finished --queue results into --csv and/or --db")
+    parser.add_argument("--lease", type=int, help="Seconds before an unrenewed job lease is taken back (new queues only)")
+    parser.add_argument("--max-attempts", type=int, help="Runs of a job before it is marked failed (new queues only)")
+    parser.add_argument("--session", help="Reopen a saved session (.mas) instead of aligning and calling")
+    parser.add_argument("--save-session", metavar="PATH", help="Save the analysis as a binary session (.mas)")
+    parser.add_argument("--ref", help="Reference FASTA/text file")
+    parser.add_argument("--genbank", help="GenBank record supplying the reference and exon model")
+    parser.add_argument("--exons", help="Exon ranges as 1-based 'start-end,start-end'")
+    parser.add_argument("--circular", action="store_true", help="Circular reference (mtDNA, plasmid); implied by a circular --genbank record")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default="global")
+    parser.add_argument("--workers", type=int, help="Processes for the linear-space aligner (default: all cores)")
+    parser.add_argument("--no-triage", action="store_true", help="Always run DP, even for same-length SNV-only samples")
+    parser.add_argument("--code", choices=sorted(GENETIC_CODES), default="Standard", help="Genetic code")
+    parser.add_argument("--index-dir", help="Reference index cache directory (default ~/.mutanalyzer/index)")
+    parser.add_argument("--locate", metavar="SEQ", help="Report exact matches of a primer/amplicon in the reference and exit")
+    parser.add_argument("--memo", metavar="PATH", help="Annotation memo shared by runs and workers (default ~/.mutanalyzer/annotations.db, ':memory:' for none)")
+    parser.add_argument("--no-memo", action="store_true", help="Annotate every variant afresh")
+    parser.add_argument("--no-pathogenicity", action="store_true", help="Skip SIFT/PolyPhen-style scoring")
+    parser.add_argument("--csv", help="Write mutations to this CSV file")
+    parser.add_argument("--report", help="Write the full text report to this file")
+    parser.add_argument("--pdf", help="Write the PDF report to this file")
+    parser.add_argument("--cohort", help="Add this sample's variants to a cohort file (.npz, created if missing)")
+    parser.add_argument("--sample-name", help="Sample name in the cohort (default: sample file name)")
+    parser.add_argument("--db", help="Record the run in this results database (SQLite)")
+    parser.add_argument("--seen", metavar="POS:REF:ALT", help="Report earlier runs in --db that called this variant on the --ref/--genbank reference and exit")
+    parser.add_argument("--gene", help="Gene label for stored results (default: from --genbank)")
+    parser.add_argument("--metrics", help="Write stage metrics (.json, or .prom for Prometheus text)")
+    parser.add_argument("--profile", help="Capture cProfile/tracemalloc and write the report here")
+    return parser
+
+
+def run_queue(args):
+    # Coordinator and worker sides of a distributed batch: any mix of
+    # --submit, --work, --wait, --collect and --status, in that order
+    queue = WorkQueue(args.queue, args.lease, args.max_attempts)
+    if args.submit:
+        if not args.ref and not args.genbank:
+            raise ValueError("--submit needs --ref or --genbank")
+        setup = {'algorithm': ALGORITHMS[args.algorithm], 'genetic_code': args.code, 'circular': args.circular,
+                 'exons': args.exons, 'gene': args.gene, 'predict': not args.no_pathogenicity,
+                 'min_depth': args.min_depth, 'min_af': args.min_af}
+        added, skipped = queue.submit(args.submit, args.genbank or args.ref, setup)
+        print(f"📦 Submitted {added} job(s)" + (f", {skipped} already queued" if skipped else ""))
+    if args.work:
+        print(f"⚙️ Processed {run_worker(queue, progress=print)} job(s)")
+    if args.wait:
+        wait_for(queue, progress=print)
+    if args.collect:
+        finished = collect(queue, args.csv)
+        if args.db:
+            engine = MutationEngine()
+            engine.results_path = args.db
+            results = []
+            for job in finished:
+                engine.open_session(os.path.join(queue.directory, job['result']['session']))
+                results.append({'sample': job['name'], 'mutations': engine.mutations})
+            if results:
+                print(f"Recorded as run {engine.record_batch(engine.ref_seq, results, engine.algorithm)} in {args.db}")
+        print(f"📦 Collected {len(finished)} result(s)" + (f" into {args.csv}" if args.csv else ""))
+    if args.status or not (args.submit or args.work or args.wait or args.collect):
+        print(queue.status_text())
+    return 1 if queue.counts()['failed'] else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.queue:
+        try:
+            return run_queue(args)
+        except Exception as e:
+            print(f"❌ Queue failed: {e}", file=sys.stderr)
+            return 1
+    if not args.ref and not args.genbank and not args.session:
+        print("Either --ref, --genbank or --session is required", file=sys.stderr)
+        return 2
+    if args.profile:
+        METRICS.set_profiling(True)
+    engine = MutationEngine()
+    engine.genetic_code = args.code
+    engine.index_dir = args.index_dir
+    engine.ungapped_triage = not args.no_triage
+    engine.workers = args.workers
+    engine.results_path = args.db
+    engine.memo_path = args.memo
+    engine.use_memo = not args.no_memo
+    try:
+        ref_seq = load_genbank(engine, args.genbank) if args.genbank else None
+        if args.ref:
+            ref_seq = read_sequence(engine, args.ref)
+        if args.exons:
+            engine.set_gene_model(parse_exon_ranges(args.exons))
+        engine.circular = engine.circular or args.circular
+        if args.gene:
+            engine.gene_name = args.gene
+        if args.seen:
+            position, ref, alt = args.seen.split(':')
+            engine.ref_seq = ref_seq.upper()
+            print(seen_text(engine.seen_before(int(position), ref, alt)))
+            return 0
+        if args.locate:
+            hits = engine.locate(args.locate, ref_seq.upper())
+            for start, strand in hits:
+                print(f"{start}\t{strand}")
+            print(f"{len(hits)} exact match(es)")
+            return 0
+        if args.fastq:
+            engine.call_from_reads(args.fastq, ref_seq, args.min_depth, args.min_af)
+            if not args.no_pathogenicity:
+                engine.score_pathogenicity()
+        elif args.amplicons:
+            with open(args.amplicons, 'r') as f:
+                engine.tile_amplicons(read_amplicons(f.read()), ref_seq, args.min_hit_score)
+            if not args.no_pathogenicity:
+                engine.score_pathogenicity()
+        elif args.plate:
+            results = analyze_plate(args.plate, ref_seq.upper(), engine_setup(engine, ALGORITHMS[args.algorithm], predict=not args.no_pathogenicity), args.workers)
+            if args.csv:
+                write_plate_csv(results, args.csv)
+            summary = plate_summary(results)
+            if args.db:
+                summary += f"\n\nRecorded as run {engine.record_batch(ref_seq.upper(), results, ALGORITHMS[args.algorithm])} in {args.db}"
+            if args.cohort:
+                engine.cohort = Cohort.load(args.cohort) if os.path.exists(args.cohort) else Cohort()
+                for result in results:
+                    if not result['error'] and result['sample'] not in engine.cohort.sample_rows:
+                        engine.cohort.add_sample(result['sample'], result['mutations'], engine.reference_accession or "", engine.exon_ranges)
+                engine.cohort.save(args.cohort)
+                summary += "\n\n" + engine.cohort.summary_text()
+            print(summary)
+            return 0
+        elif args.session:
+            engine.open_session(args.session)
+            if not args.no_pathogenicity:
+                engine.score_pathogenicity()
+        elif args.sample:
+            sample_seq = read_sequence(engine, args.sample, ref_seq.upper())
+            run_analysis(engine, ref_seq.upper(), sample_seq, ALGORITHMS[args.algorithm], predict=not args.no_pathogenicity)
+        else:
+            raise ValueError("--sample, --fastq, --amplicons or --plate is required")
+        summary = engine.build_summary()
+        sample_name = args.sample_name or os.path.splitext(os.path.basename(args.sample or args.fastq or args.amplicons or args.session))[0]
+        if args.save_session:
+            engine.save_session(args.save_session, sample_name)
+        if args.db:
+            engine.record_run(sample_name)
+        if args.csv:
+            engine.write_csv(args.csv)
+        if args.report:
+            engine.write_report(args.report, summary)
+        if args.pdf:
+            engine.write_pdf(args.pdf, summary)
+        if args.cohort:
+            engine.cohort = Cohort.load(args.cohort) if os.path.exists(args.cohort) else Cohort()
+            engine.add_to_cohort(sample_name)
+            engine.cohort.save(args.cohort)
+            summary += "\n\n" + engine.cohort.summary_text()
+        print(summary)
+    except Exception as e:
+        print(f"❌ Analysis failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if args.metrics:
+            METRICS.write(args.metrics)
+        if args.profile:
+            with open(args.profile, 'w', encoding='utf-8') as f:
+                f.write(METRICS.profile_report())
+            METRICS.set_profiling(False)
+    print(METRICS.summary_text())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
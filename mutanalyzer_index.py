@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+DEFAULT_K = 15
+MAX_SEED_OCCURRENCES = 4  # Seeds hitting more reference positions are dropped
+INDEX_VERSION = 2
+DEFAULT_CACHE_DIR = os.environ.get("MUTANALYZER_INDEX_DIR", os.path.join(os.path.expanduser("~"), ".mutanalyzer", "index"))
+
+# A/C/G/T -> 0..3, everything else (N, gaps, IUPAC) -> 4
+ENCODE = np.full(256, 4, dtype=np.uint8)
+for _code, _base in enumerate("ACGT"):
+    ENCODE[ord(_base)] = _code
+    ENCODE[ord(_base.lower())] = _code
+DECODE = np.frombuffer(b"ACGTN", dtype=np.uint8)
+
+
+def encode(seq):
+    return ENCODE[np.frombuffer(seq.encode("ascii"), dtype=np.uint8)]
+
+
+def kmer_codes(codes, k):
+    # 2-bit packed k-mer for every window plus a validity mask (no N inside)
+    n = len(codes) - k + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+    kmers = np.zeros(n, dtype=np.uint64)
+    invalid = np.zeros(n, dtype=bool)
+    for i in range(k):
+        window = codes[i:i + n]
+        kmers = (kmers << np.uint64(2)) | (window & 3).astype(np.uint64)
+        invalid |= window > 3
+    return kmers, ~invalid
+
+
+def seed_span(q, r, diag, n, band=16):
+    # Reference span [start, end) of an n-base sample placed on diagonal
+    # diag, each end taken from its own outermost forward seed within band
+    # of it, so an indel inside the sample does not shift the far end
+    near = np.abs(r - q - diag) <= band
+    if not near.any():
+        return diag, diag + n
+    q, r = q[near], r[near]
+    first, last = q.argmin(), q.argmax()
+    return int(r[first] - q[first]), int(r[last] - q[last]) + n
+
+
+def sequence_digest(ref_seq):
+    return hashlib.sha1(ref_seq.upper().encode("ascii")).hexdigest()[:16]
+
+
+def reference_key(ref_seq, accession=None):
+    # The digest is part of every key: an accession alone does not pin the
+    # sequence (an edited or pasted reference can still carry it)
+    digest = sequence_digest(ref_seq)
+    return f"{accession}-{digest}" if accession else f"seq-{digest}"
+
+
+class ReferenceIndex:
+    # Sorted k-mer table over one reference: kmers[i] occurs at positions[i]
+    # (0-based). Binary search on the sorted codes stands in for a hash
+    # table and needs no per-entry Python objects, so the arrays can be
+    # memory-mapped straight from disk and shared by every sample.
+    def __init__(self, seq_codes, kmers, positions, k, key, digest=None):
+        self.seq_codes = seq_codes
+        self.kmers = kmers
+        self.positions = positions
+        self.k = k
+        self.key = key
+        self.digest = digest  # sequence_digest of the indexed reference
+        self.directory = None  # Set when memory-mapped from disk
+
+    @classmethod
+    def build(cls, ref_seq, k=DEFAULT_K, key=None):
+        codes = encode(ref_seq)
+        kmers, valid = kmer_codes(codes, k)
+        positions = np.flatnonzero(valid).astype(np.uint32)
+        kmers = kmers[valid]
+        order = np.argsort(kmers, kind="stable")
+        return cls(codes, kmers[order], positions[order], k, key or reference_key(ref_seq), sequence_digest(ref_seq))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {meta.get('version')}")
+        mode = "r" if mmap else None
+        arrays = [np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in ("seq", "kmers", "positions")]
+        index = cls(*arrays, meta["k"], meta["key"], meta["digest"])
+        index.directory = directory
+        return index
+
+    def save(self, directory):
+        # Write into a sibling temp dir and rename, so readers never see a
+        # half-written index
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=parent, prefix=".index-")
+        try:
+            np.save(os.path.join(tmp, "seq.npy"), np.ascontiguousarray(self.seq_codes))
+            np.save(os.path.join(tmp, "kmers.npy"), np.ascontiguousarray(self.kmers))
+            np.save(os.path.join(tmp, "positions.npy"), np.ascontiguousarray(self.positions))
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "k": self.k, "key": self.key, "digest": self.digest, "length": len(self.seq_codes)}, f)
+            if os.path.isdir(directory):
+                shutil.rmtree(directory)
+            os.replace(tmp, directory)
+        finally:
+            if os.path.isdir(tmp):
+                shutil.rmtree(tmp, ignore_errors=True)
+        return directory
+
+    def __len__(self):
+        return len(self.seq_codes)
+
+    def sequence(self, start=0, end=None):
+        return DECODE[self.seq_codes[start:end]].tobytes().decode("ascii")
+
+    def seed_hits(self, query_kmers, valid, max_occurrences=MAX_SEED_OCCURRENCES):
+        # Vectorised lookup of many query k-mers: (query_idx, ref_pos) pairs
+        left = np.searchsorted(self.kmers, query_kmers, side="left")
+        right = np.searchsorted(self.kmers, query_kmers, side="right")
+        counts = right - left
+        keep = valid & (counts > 0) & (counts <= max_occurrences)
+        query_idx = np.repeat(np.flatnonzero(keep), counts[keep])
+        starts = np.repeat(left[keep], counts[keep])
+        within = np.arange(len(starts)) - np.repeat(np.cumsum(counts[keep]) - counts[keep], counts[keep])
+        return query_idx, self.positions[starts + within].astype(np.int64)
+
+    def anchors(self, sample_seq, max_occurrences=MAX_SEED_OCCURRENCES):
+        # Forward and reverse-complement seed hits as (q, r, strand) arrays;
+        # strand 0 is '+', 1 is '-'
+        k = self.k
+        codes = encode(sample_seq)
+        fwd, fwd_valid = kmer_codes(codes, k)
+        q_fwd, r_fwd = self.seed_hits(fwd, fwd_valid, max_occurrences)
+        rc_codes = np.where(codes[::-1] > 3, 4, 3 - codes[::-1]).astype(np.uint8)
+        rev, rev_valid = kmer_codes(rc_codes, k)
+        j_rev, r_rev = self.seed_hits(rev, rev_valid, max_occurrences)
+        q_rev = len(codes) - k - j_rev
+        q = np.concatenate([q_fwd, q_rev]).astype(np.int64)
+        r = np.concatenate([r_fwd, r_rev])
+        strand = np.concatenate([np.zeros(len(q_fwd), dtype=np.int8), np.ones(len(q_rev), dtype=np.int8)])
+        return q, r, strand
+
+    def locate(self, query, both_strands=True):
+        # Exact occurrences of a primer/amplicon: (1-based start, strand)
+        query = query.upper()
+        hits = []
+        queries = [(query, '+')]
+        if both_strands:
+            from Bio.Seq import reverse_complement
+            rc = reverse_complement(query)
+            if rc != query:
+                queries.append((rc, '-'))
+        for seq, strand in queries:
+            codes = encode(seq)
+            if len(codes) < self.k:
+                # Shorter than a seed: plain substring scan
+                text = self.sequence()
+                start = text.find(seq)
+                while start != -1:
+                    hits.append((start + 1, strand))
+                    start = text.find(seq, start + 1)
+                continue
+            kmers, valid = kmer_codes(codes[:self.k], self.k)
+            if not valid[0]:
+                continue
+            _, candidates = self.seed_hits(kmers, valid, max_occurrences=len(self.kmers))
+            for start in candidates:
+                if np.array_equal(self.seq_codes[start:start + len(codes)], codes):
+                    hits.append((int(start) + 1, strand))
+        return sorted(hits)
+
+
+def index_directory(key, k=DEFAULT_K, cache_dir=None):
+    safe = "".join(c if c.isalnum() or c in "._-" else "_" for c in key)
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"{safe}.k{k}")
+
+
+def get_index(ref_seq, accession=None, k=DEFAULT_K, cache_dir=None, persist=True):
+    # Load the on-disk index for this accession.version and sequence
+    # (memory-mapped), or build it once and save it for every later sample
+    # and session
+    key = reference_key(ref_seq, accession)
+    directory = index_directory(key, k, cache_dir)
+    if os.path.isdir(directory):
+        try:
+            index = ReferenceIndex.load(directory)
+            if index.digest == sequence_digest(ref_seq) and len(index) == len(ref_seq):
+                return index
+        except (OSError, ValueError):
+            pass
+    index = ReferenceIndex.build(ref_seq, k, key)
+    if persist:
+        try:
+            index.save(directory)
+            return ReferenceIndex.load(directory)
+        except OSError:
+            pass
+    return index
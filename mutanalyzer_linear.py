@@ -0,0 +1,171 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from Bio import pairwise2
+
+from mutanalyzer_sv import score_alignment
+
+# Myers & Miller (1988) linear-space global alignment with affine gaps, in
+# cost form: a gap of length k costs g + h*k and the answer is the exact
+# optimum pairwise2.align.globalms would report (score = -cost). Each DP row
+# is one set of NumPy vector ops; only two rows are ever kept.
+
+PARALLEL_MIN_CELLS = 4_000_000  # Below this a process pool costs more than it saves
+LEAF_CELLS = 250_000  # Sub-problems this small go to pairwise2's full matrix
+
+
+def cost_model(scoring):
+    match, mismatch, gap_open, gap_extend = scoring
+    # pairwise2 charges open for the first gap base and extend for the rest
+    return -match, -mismatch, -(gap_open - gap_extend), -gap_extend
+
+
+def _as_bytes(seq):
+    return np.frombuffer(seq.encode("ascii"), dtype=np.uint8)
+
+
+def last_row(a, b, tb, costs):
+    # Forward pass of a against every prefix of b: CC[j] is the best cost of
+    # a vs b[:j], DD[j] the best cost that ends in a gap in b (a deletion).
+    # tb is the initiation cost of a deletion starting at the top-left corner.
+    match, mismatch, g, h = costs
+    n = len(b)
+    b_codes = _as_bytes(b)
+    cols = np.arange(n + 1, dtype=np.int64)
+    cc = np.where(cols == 0, 0, g + h * cols)
+    dd = cc + g
+    substitution = {}
+    for i, base in enumerate(a, 1):
+        w = substitution.get(base)
+        if w is None:
+            w = substitution[base] = np.where(b_codes == ord(base), match, mismatch).astype(np.int64)
+        left = tb + h * i
+        dd = np.minimum(dd, cc + g) + h
+        row = np.empty(n + 1, dtype=np.int64)
+        row[0] = left
+        row[1:] = np.minimum(dd[1:], cc[:-1] + w)
+        # Horizontal gaps: e[j] = g + h*j + min_{k<j}(row[k] - h*k). Opening
+        # from a cell that itself ended in such a gap never beats extending.
+        shifted = np.minimum.accumulate(row - h * cols)
+        e = np.empty(n + 1, dtype=np.int64)
+        e[0] = row[0] + g  # never used; keeps the vector aligned
+        e[1:] = g + h * cols[1:] + shifted[:-1]
+        cc = np.minimum(row, e)
+        cc[0] = left
+    if len(a):
+        dd[0] = cc[0]
+    return cc, dd
+
+
+def _gap_cost(length, g, h):
+    return g + h * length if length else 0
+
+
+def _single_row(a, b, tb, te, costs):
+    # One base of a against all of b
+    match, mismatch, g, h = costs
+    n = len(b)
+    best = min(tb, te) + h + _gap_cost(n, g, h)
+    best_j = None
+    for j in range(1, n + 1):
+        cost = _gap_cost(j - 1, g, h) + (match if a == b[j - 1] else mismatch) + _gap_cost(n - j, g, h)
+        if cost < best:
+            best, best_j = cost, j
+    if best_j is None:
+        if tb <= te:
+            return a + '-' * n, '-' + b
+        return '-' * n + a, b + '-'
+    return '-' * (best_j - 1) + a + '-' * (n - best_j), b
+
+
+def midpoint(a, b, tb, te, costs, pool=None):
+    # Split row i = len(a)//2: best column j and whether the optimal path
+    # crosses the split inside a deletion gap (type 2)
+    i = len(a) // 2
+    g = costs[2]
+    top = (a[:i], b, tb, costs)
+    bottom = (a[i:][::-1], b[::-1], te, costs)
+    if pool is not None:
+        forward, reverse = pool.submit(last_row, *top), pool.submit(last_row, *bottom)
+        (cc, dd), (rr, ss) = forward.result(), reverse.result()
+    else:
+        cc, dd = last_row(*top)
+        rr, ss = last_row(*bottom)
+    rr, ss = rr[::-1], ss[::-1]
+    through = cc + rr
+    in_gap = dd + ss - g
+    j1, j2 = int(np.argmin(through)), int(np.argmin(in_gap))
+    if in_gap[j2] < through[j1]:
+        return i, j2, True
+    return i, j1, False
+
+
+def split(a, b, tb, te, costs, pool=None):
+    # One divide step: the sub-problems (and fixed pieces) it reduces to,
+    # in alignment order
+    g = costs[2]
+    i, j, crosses_gap = midpoint(a, b, tb, te, costs, pool)
+    if not crosses_gap:
+        return [(a[:i], b[:j], tb, g), (a[i:], b[j:], g, te)]
+    return [(a[:i - 1], b[:j], tb, 0), (a[i - 1:i + 1], '-' * 2), (a[i + 1:], b[j:], 0, te)]
+
+
+def solve(a, b, tb, te, costs):
+    m, n = len(a), len(b)
+    g, h = costs[2], costs[3]
+    if n == 0:
+        return a, '-' * m
+    if m == 0:
+        return '-' * n, b
+    if m == 1:
+        return _single_row(a, b, tb, te, costs)
+    if tb == te == g and m * n <= LEAF_CELLS:
+        # Plain boundary conditions: the quadratic C aligner is exact and
+        # faster than more NumPy rows at this size
+        match, mismatch = -costs[0], -costs[1]
+        alignment = pairwise2.align.globalms(a, b, match, mismatch, -(g + h), -h, one_alignment_only=True)[0]
+        return alignment.seqA, alignment.seqB
+    out_a, out_b = [], []
+    for part in split(a, b, tb, te, costs):
+        if len(part) == 2:
+            out_a.append(part[0])
+            out_b.append(part[1])
+            continue
+        piece_a, piece_b = solve(*part, costs)
+        out_a.append(piece_a)
+        out_b.append(piece_b)
+    return "".join(out_a), "".join(out_b)
+
+
+def _solve_part(part, costs):
+    if len(part) == 2:
+        return part
+    return solve(*part, costs)
+
+
+def align_linear(ref_seq, sample_seq, scoring, workers=None):
+    # Exact global alignment in O(len(ref) + len(sample)) memory. The first
+    # few divide steps fan the forward/reverse passes out to a process pool,
+    # then the independent sub-problems are solved on all cores.
+    # Returns (aligned_ref, aligned_sample, score).
+    costs = cost_model(scoring)
+    g = costs[2]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(ref_seq) * len(sample_seq) < PARALLEL_MIN_CELLS:
+        aligned_ref, aligned_sample = solve(ref_seq, sample_seq, g, g, costs)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = [(ref_seq, sample_seq, g, g)]
+            while sum(1 for p in parts if len(p) == 4) < workers:
+                expanded = []
+                for part in parts:
+                    big = len(part) == 4 and len(part[0]) > 1 and len(part[1]) > 0 and len(part[0]) * len(part[1]) >= PARALLEL_MIN_CELLS
+                    expanded.extend(split(*part, costs, pool) if big else [part])
+                if len(expanded) == len(parts):
+                    break
+                parts = expanded
+            pieces = list(pool.map(_solve_part, parts, [costs] * len(parts)))
+        aligned_ref = "".join(p[0] for p in pieces)
+        aligned_sample = "".join(p[1] for p in pieces)
+    return aligned_ref, aligned_sample, score_alignment(aligned_ref, aligned_sample, scoring)
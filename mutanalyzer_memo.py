@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from mutanalyzer_metrics import METRICS
+
+MEMO_VERSION = 2  # 2: minus-strand codon fix and sequence-digest reference keys
+MEMO_SIZE = 200_000  # Annotations kept in memory per process, least recently used dropped first
+DEFAULT_MEMO_PATH = os.environ.get("MUTANALYZER_MEMO", os.path.join(os.path.expanduser("~"), ".mutanalyzer", "annotations.db"))
+QUERY_BATCH = 500  # Keys per SELECT, under SQLite's bound-parameter limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS annotations (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+"""
+
+
+class AnnotationMemo:
+    # Annotations of variants already seen, keyed by reference sequence digest, transcript
+    # accession.version, genetic code and normalized variant, so recurrent
+    # variants across a cohort are annotated once. A bounded in-memory LRU
+    # sits in front of a SQLite file (WAL) shared by every process on the
+    # node: plate and queue workers warm each other's caches. New entries
+    # are buffered and written in one transaction per sample by flush().
+    # A disk tier that cannot be opened or written is dropped, never fatal.
+    def __init__(self, path=None, maxsize=MEMO_SIZE):
+        self.path = path or DEFAULT_MEMO_PATH
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.hits = 0
+        self.disk_hits = 0  # Of the hits, those read from the disk tier
+        self.misses = 0
+        self.lock = threading.RLock()
+        self.pid = os.getpid()  # A connection must not cross a fork
+        self.conn = None
+        if self.path != ":memory:":
+            self.open_disk()
+
+    def open_disk(self):
+        import sqlite3
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            with self.conn:
+                self.conn.executescript(SCHEMA)
+                row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+                if row is None:
+                    self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('version', ?)", (str(MEMO_VERSION),))
+                elif int(row[0]) != MEMO_VERSION:
+                    self.conn.execute("DELETE FROM annotations")  # Older entries may no longer be valid
+                    self.conn.execute("UPDATE meta SET value = ? WHERE key = 'version'", (str(MEMO_VERSION),))
+        except (OSError, sqlite3.Error):
+            self.conn = None
+
+    def remember(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def get_many(self, keys):
+        # {key: value} for every key already annotated; memory first, then
+        # one batched lookup on disk for the rest
+        found = {}
+        with self.lock:
+            keys = list(dict.fromkeys(keys))
+            missing = []
+            for key in keys:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    found[key] = self.entries[key]
+                else:
+                    missing.append(key)
+            memory_hits = len(found)
+            if missing and self.conn is not None:
+                import sqlite3
+                try:
+                    for i in range(0, len(missing), QUERY_BATCH):
+                        batch = missing[i:i + QUERY_BATCH]
+                        rows = self.conn.execute(f"SELECT key, value FROM annotations WHERE key IN ({', '.join('?' * len(batch))})", batch).fetchall()
+                        for key, value in rows:
+                            found[key] = json.loads(value)
+                            self.remember(key, found[key])
+                        self.disk_hits += len(rows)
+                except sqlite3.Error:
+                    self.conn = None
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        METRICS.count("annotation_memo_hits", len(found))
+        METRICS.count("annotation_memo_misses", len(keys) - len(found))
+        METRICS.count("annotation_memo_disk_hits", len(found) - memory_hits)
+        METRICS.gauge("annotation_memo_hit_rate", self.hit_rate())
+        METRICS.gauge("annotation_memo_entries", len(self.entries))
+        return found
+
+    def put(self, key, value):
+        with self.lock:
+            self.remember(key, value)
+            if self.conn is not None:
+                self.pending[key] = value
+
+    def flush(self):
+        with self.lock:
+            if not self.pending or self.conn is None:
+                self.pending = {}
+                return
+            import sqlite3
+            rows = [(key, json.dumps(value)) for key, value in self.pending.items()]
+            self.pending = {}
+            try:
+                with self.conn:
+                    self.conn.executemany("INSERT OR IGNORE INTO annotations VALUES (?, ?)", rows)
+            except sqlite3.Error:
+                self.conn = None
+
+    def hit_rate(self):
+        looked_up = self.hits + self.misses
+        return self.hits / looked_up if looked_up else 0.0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.pending = {}
+            self.hits = self.disk_hits = self.misses = 0
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute("DELETE FROM annotations")
+
+
+# One memo per path and process, shared by every engine in it (the GUI's,
+# or each plate worker's successive wells)
+_MEMOS = {}
+
+
+def get_memo(path=None):
+    path = path or DEFAULT_MEMO_PATH
+    if path not in _MEMOS or _MEMOS[path].pid != os.getpid():
+        _MEMOS[path] = AnnotationMemo(path)
+    return _MEMOS[path]
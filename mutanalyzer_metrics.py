@@ -0,0 +1,197 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource  # POSIX only; used for the process high-water mark
+except ImportError:
+    resource = None
+
+STAGES = ("fetch", "parse", "index", "align", "pileup", "call", "annotate", "render", "export")
+
+
+def process_maxrss_kb():
+    # Lifetime high-water mark of the process, not of any one stage
+    if resource is None:
+        return None
+    return float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)  # KiB on Linux
+
+
+class MetricsRegistry:
+    # Per-stage spans (wall/CPU time, peak memory, item counts) plus free-form
+    # counters. One process-wide instance, METRICS, is shared by the GUI, the
+    # headless runner and the benchmarks. Stage peaks need tracemalloc
+    # (capture mode); without it they are left out and only the process
+    # high-water mark is kept, as the process_maxrss_kb gauge.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self.spans = []
+        self.max_spans = 1000
+        self.profiling = False
+        self.profile_stats = None
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.counters = {}
+            self.gauges = {}
+            self.spans = []
+            self.profile_stats = None
+
+    def set_profiling(self, enabled):
+        # cProfile is per thread, so each outermost span owns a profiler and
+        # merges into profile_stats; tracemalloc is process-wide.
+        self.profiling = enabled
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name, items=0):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        span = {'stage': name, 'items': items, 'child_peak_kb': 0.0}
+        profiler = None
+        if self.profiling and not stack:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            if stack:
+                # The reset below would lose the peak the enclosing span has
+                # reached so far; fold it into that span first
+                stack[-1]['child_peak_kb'] = max(stack[-1]['child_peak_kb'], tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.reset_peak()
+        stack.append(span)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield span
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            stack.pop()
+            if profiler is not None:
+                profiler.disable()
+            peak_kb = None
+            if tracing and tracemalloc.is_tracing():
+                peak_kb = max(tracemalloc.get_traced_memory()[1] / 1024, span['child_peak_kb'])
+                if stack:
+                    stack[-1]['child_peak_kb'] = max(stack[-1]['child_peak_kb'], peak_kb)
+            else:
+                maxrss_kb = process_maxrss_kb()
+                if maxrss_kb is not None:
+                    self.gauge("process_maxrss_kb", maxrss_kb)
+            self.record(name, wall, cpu, peak_kb, span['items'], profiler)
+
+    def record(self, name, wall, cpu, peak_kb, items=0, profiler=None):
+        with self.lock:
+            agg = self.stages.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'max_wall_s': 0.0, 'peak_kb': None, 'items': 0})
+            agg['calls'] += 1
+            agg['wall_s'] += wall
+            agg['cpu_s'] += cpu
+            agg['max_wall_s'] = max(agg['max_wall_s'], wall)
+            if peak_kb is not None:
+                agg['peak_kb'] = max(agg['peak_kb'] or 0.0, peak_kb)
+                peak_kb = round(peak_kb, 1)
+            agg['items'] += items or 0
+            self.spans.append({'stage': name, 'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6), 'peak_kb': peak_kb, 'items': items, 'at': time.time()})
+            del self.spans[:-self.max_spans]
+            if profiler is not None:
+                if self.profile_stats is None:
+                    self.profile_stats = pstats.Stats(profiler)
+                else:
+                    self.profile_stats.add(profiler)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'stages': {name: dict(agg) for name, agg in self.stages.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'spans': list(self.spans),
+            }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self):
+        snap = self.snapshot()
+        lines = []
+        series = [
+            ("mutanalyzer_stage_calls_total", "counter", "Number of completed stage spans", 'calls', 1),
+            ("mutanalyzer_stage_wall_seconds_total", "counter", "Wall-clock time spent per stage", 'wall_s', 1),
+            ("mutanalyzer_stage_cpu_seconds_total", "counter", "CPU time spent per stage", 'cpu_s', 1),
+            ("mutanalyzer_stage_items_total", "counter", "Items processed per stage", 'items', 1),
+            ("mutanalyzer_stage_peak_memory_bytes", "gauge", "Peak memory observed during a stage", 'peak_kb', 1024),
+        ]
+        for metric, kind, help_text, field, scale in series:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, agg in sorted(snap['stages'].items()):
+                if agg[field] is not None:  # Stage peaks only exist in capture mode
+                    lines.append(f'{metric}{{stage="{name}"}} {agg[field] * scale:g}')
+        for name, value in sorted(snap['counters'].items()):
+            metric = f"mutanalyzer_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value:g}")
+        for name, value in sorted(snap['gauges'].items()):
+            metric = f"mutanalyzer_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def profile_report(self, limit=30):
+        out = io.StringIO()
+        with self.lock:
+            if self.profile_stats is not None:
+                out.write("=== cProfile (cumulative) ===\n")
+                self.profile_stats.stream = out
+                self.profile_stats.sort_stats("cumulative").print_stats(limit)
+        if tracemalloc.is_tracing():
+            out.write("\n=== tracemalloc top allocations ===\n")
+            for stat in tracemalloc.take_snapshot().statistics("lineno")[:limit]:
+                out.write(f"{stat}\n")
+        return out.getvalue() or "No profile captured. Enable capture mode and run an analysis first."
+
+    def write(self, file_path):
+        text = self.to_prometheus() if file_path.endswith((".prom", ".txt")) else self.to_json()
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def summary_text(self):
+        snap = self.snapshot()
+        if not snap['stages']:
+            return "No stages recorded yet."
+        lines = [f"{'Stage':<10}{'Calls':>7}{'Wall (s)':>11}{'CPU (s)':>10}{'Peak KiB':>12}{'Items':>10}"]
+        for name in sorted(snap['stages'], key=lambda n: STAGES.index(n) if n in STAGES else len(STAGES)):
+            agg = snap['stages'][name]
+            peak = "-" if agg['peak_kb'] is None else f"{agg['peak_kb']:.1f}"
+            lines.append(f"{name:<10}{agg['calls']:>7}{agg['wall_s']:>11.3f}{agg['cpu_s']:>10.3f}{peak:>12}{agg['items']:>10}")
+        for name, value in sorted(snap['counters'].items()):
+            lines.append(f"{name}: {value:g}")
+        if 'process_maxrss_kb' in snap['gauges']:
+            lines.append(f"process_maxrss_kb: {snap['gauges']['process_maxrss_kb']:g}")
+        return "\n".join(lines)
+
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,79 @@
+def variant_key(mutation):
+    # Canonical identity of a normalized variant; SV records also carry an end
+    if 'end' in mutation:
+        return (mutation['position'], mutation['type'], mutation['alt'], mutation['end'])
+    return (mutation['position'], mutation['ref'], mutation['alt'])
+
+
+def key_string(key):
+    return ":".join(str(part) for part in key)
+
+
+def left_align_deletion(ref_seq, position, deleted):
+    # position is the 1-based first deleted base; shift left while the base
+    # before the deletion equals its last base (same resulting sequence).
+    while position > 1 and ref_seq[position - 2] == deleted[-1]:
+        deleted = ref_seq[position - 2] + deleted[:-1]
+        position -= 1
+    return position, deleted
+
+
+def left_align_insertion(ref_seq, position, inserted):
+    # position is the 1-based reference base the insertion follows
+    while position >= 1 and ref_seq[position - 1] == inserted[-1]:
+        inserted = ref_seq[position - 1] + inserted[:-1]
+        position -= 1
+    return position, inserted
+
+
+def normalize_alleles(ref_seq, position, ref, alt):
+    # Trim shared suffix then prefix and left-align what is left. position is
+    # the 1-based first base of ref (for a pure insertion, the base after
+    # it); alleles use the engine's convention, '-' for an empty side.
+    # Returns (position, ref, alt, type) with type SNP, MNV, Deletion or
+    # Insertion and position as the engine records it (an insertion's is
+    # the base it follows), or type None when nothing is left.
+    ref = "" if ref == '-' else ref
+    alt = "" if alt == '-' else alt
+    while ref and alt and ref[-1] == alt[-1]:
+        ref, alt = ref[:-1], alt[:-1]
+    while ref and alt and ref[0] == alt[0]:
+        ref, alt = ref[1:], alt[1:]
+        position += 1
+    if ref and alt:
+        return position, ref, alt, 'SNP' if len(ref) == len(alt) == 1 else 'MNV'
+    if ref:
+        position, ref = left_align_deletion(ref_seq, position, ref)
+        return position, ref, '-', 'Deletion'
+    if alt:
+        position, alt = left_align_insertion(ref_seq, position - 1, alt)
+        return position, '-', alt, 'Insertion'
+    return position, ref, alt, None
+
+
+def adjacent_snp_groups(mutations):
+    # Runs of SNPs on consecutive reference positions (mutations sorted).
+    # Heterozygous calls stay single: their phase is unknown, so neighbours
+    # cannot be assumed to sit on the same allele.
+    group = []
+    for mutation in mutations:
+        phased = mutation['type'] == 'SNP' and 'genotype' not in mutation
+        if phased and group and mutation['position'] == group[-1]['position'] + 1:
+            group.append(mutation)
+            continue
+        if group:
+            yield group
+        group = [mutation] if phased else []
+        if not group:
+            yield [mutation]
+    if group:
+        yield group
+
+
+def deduplicate(mutations):
+    # Hash index on the canonical key; the first record for a key wins
+    index = {}
+    for mutation in mutations:
+        index.setdefault(variant_key(mutation), mutation)
+    ordered = sorted(index.values(), key=lambda m: (m['position'], m['type']))
+    return ordered, {variant_key(m): m for m in ordered}
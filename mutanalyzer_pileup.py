@@ -0,0 +1,291 @@
+import gzip
+import os
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+import numpy as np
+from Bio import pairwise2
+from Bio.Seq import reverse_complement
+
+from mutanalyzer_index import DEFAULT_K, ReferenceIndex, encode, kmer_codes
+from mutanalyzer_normalize import normalize_alleles
+from mutanalyzer_ungapped import mismatch_positions
+
+BASES = "ACGT-"  # Pileup columns; '-' counts reads with the base deleted
+BASE_COLUMN = {base: i for i, base in enumerate(BASES)}
+READ_SCORING = (2, -4, -6, -1)  # Short-read style: indels cheaper than in the sample aligner
+MIN_BASE_QUALITY = 13
+MIN_DEPTH = 10
+MIN_ALLELE_FRACTION = 0.2
+CHUNK_READS = 5000
+BAND = 16  # Extra reference bases either side of the seeded read placement
+CLUSTER_WINDOW = 10  # Two mismatches this close on the seeded diagonal suggest an indel
+
+
+def read_fastq(path):
+    # Streams (name, sequence, qualities) with Phred+33 qualities as a uint8 array
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rt') as f:
+        while True:
+            header = f.readline()
+            if not header:
+                return
+            seq = f.readline().strip().upper()
+            f.readline()
+            qual = f.readline().strip()
+            if not header.startswith('@') or len(qual) != len(seq):
+                raise ValueError(f"Malformed FASTQ record near '{header.strip()[:40]}'")
+            yield header[1:].strip(), seq, np.frombuffer(qual.encode("ascii"), dtype=np.uint8) - 33
+
+
+def chunked(iterable, size=CHUNK_READS):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Pileup:
+    # Per-position base counts and summed base qualities over the reference,
+    # plus indel events keyed by their left-aligned (position, sequence).
+    # Each worker keeps one and hands back only the rows a chunk touched.
+    def __init__(self, length):
+        self.length = length
+        self.counts = np.zeros((length, len(BASES)), dtype=np.int64)
+        self.quality = np.zeros((length, len(BASES)), dtype=np.int64)
+        self.insertions = Counter()  # (1-based base before, inserted seq) -> reads
+        self.deletions = Counter()  # (1-based first deleted base, deleted seq) -> reads
+        self.reads = 0
+        self.mapped = 0
+
+    def take_update(self):
+        # Sparse copy of everything added since the last call (touched rows
+        # only, not reference-length arrays); leaves the pileup empty
+        rows = np.flatnonzero(self.counts.any(axis=1))
+        update = (rows, self.counts[rows], self.quality[rows], self.insertions, self.deletions, self.reads, self.mapped)
+        self.counts[rows] = 0
+        self.quality[rows] = 0
+        self.insertions = Counter()
+        self.deletions = Counter()
+        self.reads = self.mapped = 0
+        return update
+
+    def merge(self, update):
+        rows, counts, quality, insertions, deletions, reads, mapped = update
+        self.counts[rows] += counts
+        self.quality[rows] += quality
+        self.insertions.update(insertions)
+        self.deletions.update(deletions)
+        self.reads += reads
+        self.mapped += mapped
+        return self
+
+    def depth(self):
+        return self.counts.sum(axis=1)
+
+    def support(self, mutation, depth=None):
+        # (depth, supporting reads) for a called or normalized variant;
+        # pass depth() in when looking up many
+        position, mut_type = mutation['position'], mutation['type']
+        depth = self.depth() if depth is None else depth
+        if mut_type == 'Insertion':
+            return int(depth[position - 1]) if 0 < position <= self.length else 0, self.insertions.get((position, mutation['alt']), 0)
+        if mut_type == 'Deletion':
+            return int(depth[position - 1]), self.deletions.get((position, mutation['ref']), 0)
+        columns = [BASE_COLUMN.get(base) for base in mutation['alt']]
+        if None in columns:
+            return int(depth[position - 1]), 0
+        spans = range(position - 1, position - 1 + len(columns))
+        return int(min(depth[i] for i in spans)), int(min(self.counts[i, c] for i, c in zip(spans, columns)))
+
+    def call(self, ref_seq, min_depth=MIN_DEPTH, min_fraction=MIN_ALLELE_FRACTION, depth=None):
+        # Yields (type, position, ref, alt, depth, alt_reads, mean_quality)
+        depth = self.depth() if depth is None else depth
+        ref_columns = np.array([BASE_COLUMN.get(base, -1) for base in ref_seq.upper()])
+        alt_counts = self.counts[:, :4].copy()
+        known = ref_columns >= 0
+        alt_counts[np.flatnonzero(known), ref_columns[known]] = 0
+        best = alt_counts.argmax(axis=1)
+        best_count = alt_counts[np.arange(self.length), best]
+        passing = (depth >= min_depth) & (best_count >= np.maximum(1, min_fraction * depth))
+        for i in np.flatnonzero(passing).tolist():
+            count = int(best_count[i])
+            yield 'SNP', i + 1, ref_seq[i], BASES[best[i]], int(depth[i]), count, self.quality[i, best[i]] / count
+        for (position, deleted), count in sorted(self.deletions.items()):
+            site_depth = int(depth[position - 1])
+            if site_depth >= min_depth and count >= min_fraction * site_depth:
+                yield 'Deletion', position, deleted, '-', site_depth, count, None
+        for (position, inserted), count in sorted(self.insertions.items()):
+            site_depth = int(depth[position - 1]) if position > 0 else 0
+            if site_depth >= min_depth and count >= min_fraction * site_depth:
+                yield 'Insertion', position, '-', inserted, site_depth, count, None
+
+
+# Worker-side state: each pool process seeds against its own copy of the
+# reference index, built once in the initializer.
+_WORKER = {}
+
+
+def init_worker(ref_seq, index_dir=None, scoring=READ_SCORING, min_quality=MIN_BASE_QUALITY, circular=False):
+    # index_dir points at a saved ReferenceIndex to memory-map instead of
+    # building one per process
+    ref_seq = ref_seq.upper()
+    index = ReferenceIndex.load(index_dir) if index_dir else ReferenceIndex.build(ref_seq, DEFAULT_K)
+    _WORKER.update(ref_seq=ref_seq, index=index, scoring=scoring, min_quality=min_quality, circular=circular, pileup=Pileup(len(ref_seq)))
+
+
+def place_reads(index, seqs):
+    # Seeds a whole chunk in one pass: reads are joined with N (no k-mer
+    # spans two reads) and every read gets the (strand, diagonal) with the
+    # most seed votes. Strand 1 means the reverse complement of the read
+    # lies at that diagonal; strand -1 means nothing seeded.
+    k = index.k
+    lengths = np.array([len(seq) for seq in seqs], dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(lengths + 1)[:-1]])
+    codes = encode("N".join(seqs))
+    total = len(codes)
+    fwd, fwd_valid = kmer_codes(codes, k)
+    q_fwd, r_fwd = index.seed_hits(fwd, fwd_valid)
+    rc_codes = np.where(codes[::-1] > 3, 4, 3 - codes[::-1]).astype(np.uint8)
+    rev, rev_valid = kmer_codes(rc_codes, k)
+    j_rev, r_rev = index.seed_hits(rev, rev_valid)
+    q_all = np.concatenate([q_fwd, total - k - j_rev])
+    r_all = np.concatenate([r_fwd, r_rev])
+    strand = np.concatenate([np.zeros(len(q_fwd), dtype=np.int64), np.ones(len(j_rev), dtype=np.int64)])
+    read = np.searchsorted(starts, q_all, side='right') - 1
+    q = q_all - starts[read]
+    diag = np.where(strand == 0, r_all - q, r_all - (lengths[read] - k - q))
+    best_strand = np.full(len(seqs), -1, dtype=np.int64)
+    best_diag = np.zeros(len(seqs), dtype=np.int64)
+    if not len(read):
+        return best_strand, best_diag
+    offset = np.int64(1 << 32)
+    keys, votes = np.unique((read * 2 + strand) * offset + diag + (offset >> 1), return_counts=True)
+    key_read = keys // offset // 2
+    order = np.lexsort((-votes, key_read))
+    first = order[np.r_[True, key_read[order][1:] != key_read[order][:-1]]]
+    winners = keys[first]
+    best_strand[key_read[first]] = (winners // offset) % 2
+    best_diag[key_read[first]] = winners % offset - (offset >> 1)
+    return best_strand, best_diag
+
+
+def add_read(pileup, ref_seq, seq, qual, diag, scoring, min_quality):
+    length = len(ref_seq)
+    n = len(seq)
+    mismatches = mismatch_positions(ref_seq[diag:diag + n], seq) if 0 <= diag <= length - n else None
+    if mismatches is not None and len(mismatches) <= max(2, n // 20) and not (np.diff(mismatches) < CLUSTER_WINDOW).any():
+        # No indel signature (few, isolated mismatches): every base lands on
+        # diag + offset. Past an indel near a read end the shifted bases
+        # mismatch in a run, which sends the read to the gapped path.
+        columns = encode(seq)
+        keep = (columns < 4) & (qual >= min_quality)
+        positions = np.arange(diag, diag + n)[keep]
+        np.add.at(pileup.counts, (positions, columns[keep]), 1)
+        np.add.at(pileup.quality, (positions, columns[keep]), qual[keep].astype(np.int64))
+        return True
+    start = max(0, diag - BAND)
+    window = ref_seq[start:min(length, diag + n + BAND)]
+    if not window:
+        return False
+    match, mismatch, gap_open, gap_extend = scoring
+    alignments = pairwise2.align.globalms(window, seq, match, mismatch, gap_open, gap_extend, penalize_end_gaps=(True, False), one_alignment_only=True)
+    if not alignments:
+        return False
+    aligned_ref, aligned_read = alignments[0].seqA, alignments[0].seqB
+    # Only the span between the first and last aligned base pair counts;
+    # overhangs past the reference ends are clipped
+    paired = [i for i, (a, b) in enumerate(zip(aligned_ref, aligned_read)) if a != '-' and b != '-']
+    if not paired:
+        return False
+    first, last = paired[0], paired[-1]
+    ref_pos = start + sum(1 for base in aligned_ref[:first] if base != '-')  # 0-based
+    read_pos = sum(1 for base in aligned_read[:first] if base != '-')
+    i = first
+    while i <= last:
+        ref_base, read_base = aligned_ref[i], aligned_read[i]
+        if ref_base != '-' and read_base != '-':
+            column = BASE_COLUMN.get(read_base)
+            if column is not None and column < 4 and qual[read_pos] >= min_quality:
+                pileup.counts[ref_pos, column] += 1
+                pileup.quality[ref_pos, column] += int(qual[read_pos])
+            ref_pos += 1
+            read_pos += 1
+            i += 1
+        elif read_base == '-':
+            run = i
+            while run <= last and aligned_read[run] == '-' and aligned_ref[run] != '-':
+                run += 1
+            position, deleted, _, _ = normalize_alleles(ref_seq, ref_pos + 1, aligned_ref[i:run], '-')
+            pileup.deletions[(position, deleted)] += 1
+            pileup.counts[position - 1:position - 1 + len(deleted), 4] += 1
+            ref_pos += run - i
+            i = run
+        else:
+            run = i
+            while run <= last and aligned_ref[run] == '-':
+                run += 1
+            position, _, inserted, _ = normalize_alleles(ref_seq, ref_pos + 1, '-', aligned_read[i:run])
+            pileup.insertions[(position, inserted)] += 1
+            read_pos += run - i
+            i = run
+    return True
+
+
+def add_wrapped_read(pileup, ref_seq, seq, qual, diag, scoring, min_quality):
+    # A read across the origin of a circular reference: the parts before
+    # and after the origin are piled up separately
+    length = len(ref_seq)
+    start = diag % length
+    cut = length - start
+    if cut >= len(seq):
+        return add_read(pileup, ref_seq, seq, qual, start, scoring, min_quality)
+    before = add_read(pileup, ref_seq, seq[:cut], qual[:cut], start, scoring, min_quality)
+    after = add_read(pileup, ref_seq, seq[cut:], qual[cut:], 0, scoring, min_quality)
+    return before or after
+
+
+def pileup_chunk(reads):
+    ref_seq, index, pileup = _WORKER['ref_seq'], _WORKER['index'], _WORKER['pileup']
+    pileup.reads = len(reads)
+    strands, diags = place_reads(index, [seq for _, seq, _ in reads])
+    for (_, seq, qual), strand, diag in zip(reads, strands.tolist(), diags.tolist()):
+        if strand < 0:
+            continue
+        if strand == 1:
+            seq, qual = reverse_complement(seq), qual[::-1]
+        add = add_wrapped_read if _WORKER['circular'] and not 0 <= diag <= len(ref_seq) - len(seq) else add_read
+        if add(pileup, ref_seq, seq, qual, diag, _WORKER['scoring'], _WORKER['min_quality']):
+            pileup.mapped += 1
+    return pileup.take_update()
+
+
+def pileup_fastq(path, ref_seq, workers=None, chunk_size=CHUNK_READS, index_dir=None, min_quality=MIN_BASE_QUALITY, progress=None, circular=False):
+    # Streams reads in chunks through a process pool; at most two chunks per
+    # worker are in flight, so memory stays bounded whatever the read count.
+    total = Pileup(len(ref_seq))
+    workers = workers or os.cpu_count() or 1
+    init_args = (ref_seq, index_dir, READ_SCORING, min_quality, circular)
+    if workers == 1:
+        init_worker(*init_args)
+        for chunk in chunked(read_fastq(path), chunk_size):
+            total.merge(pileup_chunk(chunk))
+            if progress:
+                progress(total.reads)
+        return total
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=init_args) as pool:
+        pending = set()
+        for chunk in chunked(read_fastq(path), chunk_size):
+            pending.add(pool.submit(pileup_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    total.merge(future.result())
+                if progress:
+                    progress(total.reads)
+        for future in pending:
+            total.merge(future.result())
+    return total
@@ -0,0 +1,224 @@
+from bisect import bisect_right
+
+from mutanalyzer_transcripts import COMPLEMENT, Transcript, translate
+
+THREE_LETTER = {
+    'A': 'Ala', 'R': 'Arg', 'N': 'Asn', 'D': 'Asp', 'C': 'Cys', 'Q': 'Gln', 'E': 'Glu', 'G': 'Gly',
+    'H': 'His', 'I': 'Ile', 'L': 'Leu', 'K': 'Lys', 'M': 'Met', 'F': 'Phe', 'P': 'Pro', 'S': 'Ser',
+    'T': 'Thr', 'W': 'Trp', 'Y': 'Tyr', 'V': 'Val', 'U': 'Sec', 'O': 'Pyl', '*': 'Ter',
+}
+PROTEIN_GAP_SCORES = (-10, -0.5)  # open, extend (BLOSUM62 scale)
+
+
+def three(aa):
+    return THREE_LETTER.get(aa, 'Xaa')
+
+
+def coding_models(transcripts, exon_ranges=(), length=0):
+    # Transcripts with a CDS; a flat exon model (or, without one, the whole
+    # reference) is read as a single CDS on the + strand
+    coding = [t for t in transcripts if t.cds]
+    if coding:
+        return coding
+    if exon_ranges:
+        return [Transcript("exons", exon_ranges, exon_ranges)]
+    return [Transcript("reference", [(1, length)], [(1, length)])] if length else []
+
+
+def sample_cells(aligned_ref, aligned_sample):
+    # What the sample has at each reference position: its aligned base (''
+    # if deleted) plus any bases inserted after it. Positions outside the
+    # sample's aligned span are None (not covered, read as reference).
+    cells = []
+    first = len(aligned_sample) - len(aligned_sample.lstrip('-'))
+    last = len(aligned_sample.rstrip('-')) - 1
+    for i, (ref_base, alt_base) in enumerate(zip(aligned_ref, aligned_sample)):
+        alt_base = "" if alt_base == '-' else alt_base
+        if ref_base != '-':
+            cells.append(alt_base if first <= i <= last else None)
+        elif cells and cells[-1] is not None:
+            cells[-1] += alt_base
+    return cells
+
+
+def coding_sequences(transcript, ref_seq, cells):
+    # Reference and sample sequence from the CDS start to the end of the
+    # transcript (3' UTR included, so shifted frames can read on to their
+    # stop), in transcript orientation. alt_starts[k] is where reference
+    # base k's sample bases start, so indel-shifted coordinates map both ways.
+    cds_start, cds_end = transcript.cds[0][0], transcript.cds[-1][1]
+    positions = []
+    for start, end in transcript.exons:
+        if transcript.strand == 1:
+            start = max(start, cds_start)
+        else:
+            end = min(end, cds_end)
+        positions.extend((p, p == end) for p in range(start, end + 1))
+    if transcript.strand == -1:
+        positions.reverse()
+    ref_parts, alt_parts, alt_starts = [], [], [0]
+    for position, exon_end in positions:
+        ref_base = ref_seq[position - 1]
+        cell = cells[position - 1] if position <= len(cells) else None
+        if cell is None:
+            cell = ref_base
+        elif exon_end:
+            cell = cell[:1]  # Bases inserted after an exon's last base are intronic
+        if transcript.strand == -1:
+            ref_base = ref_base.translate(COMPLEMENT)
+            cell = cell.translate(COMPLEMENT)[::-1]
+        ref_parts.append(ref_base)
+        alt_parts.append(cell)
+        alt_starts.append(alt_starts[-1] + len(cell))
+    return "".join(ref_parts), "".join(alt_parts), alt_starts
+
+
+def translate_to_stop(coding, table):
+    protein = translate(coding[:len(coding) // 3 * 3], table)
+    stop = protein.find('*')
+    return protein if stop < 0 else protein[:stop + 1]
+
+
+def align_proteins(ref_core, alt_core):
+    # Only the differing middle of two proteins ever gets here; equal
+    # lengths are compared column by column
+    if not ref_core or not alt_core:
+        width = max(len(ref_core), len(alt_core))
+        return ref_core.ljust(width, '-'), alt_core.ljust(width, '-')
+    if len(ref_core) == len(alt_core):
+        return ref_core, alt_core
+    from Bio.Align import PairwiseAligner, substitution_matrices
+    aligner = PairwiseAligner()
+    aligner.mode = 'global'
+    aligner.substitution_matrix = substitution_matrices.load("BLOSUM62")
+    aligner.open_gap_score, aligner.extend_gap_score = PROTEIN_GAP_SCORES
+    # Stops and anything else off the matrix alphabet are scored as X
+    known = set(aligner.substitution_matrix.alphabet) - {'*'}
+    alignment = aligner.align("".join(aa if aa in known else 'X' for aa in ref_core), "".join(aa if aa in known else 'X' for aa in alt_core))[0]
+    gapped_ref, gapped_alt = alignment[0], alignment[1]
+    ref_iter, alt_iter = iter(ref_core), iter(alt_core)
+    return ("".join(c if c == '-' else next(ref_iter) for c in gapped_ref),
+            "".join(c if c == '-' else next(alt_iter) for c in gapped_alt))
+
+
+def describe_event(ref_protein, start, ref_seg, alt_seg):
+    # HGVS p. description of one in-frame change; start is the 0-based
+    # reference residue where ref_seg begins
+    first = f"{three(ref_protein[start])}{start + 1}" if start < len(ref_protein) else ""
+    if len(ref_seg) == 1 and len(alt_seg) == 1:
+        return f"p.{first}{three(alt_seg)}"
+    alt_text = "".join(three(aa) for aa in alt_seg)
+    if not ref_seg:
+        n = len(alt_seg)
+        if start >= n and ref_protein[start - n:start] == alt_seg:
+            dup_first = f"{three(alt_seg[0])}{start - n + 1}"
+            return f"p.{dup_first}dup" if n == 1 else f"p.{dup_first}_{three(alt_seg[-1])}{start}dup"
+        return f"p.{three(ref_protein[start - 1])}{start}_{first}ins{alt_text}"
+    span = first if len(ref_seg) == 1 else f"{first}_{three(ref_seg[-1])}{start + len(ref_seg)}"
+    if not alt_seg:
+        return f"p.{span}del"
+    return f"p.{span}delins{alt_text}"
+
+
+def compare_window(ref_protein, alt_protein, ref_end, alt_end):
+    # Events between ref_protein[:ref_end] and alt_protein[:alt_end] after
+    # trimming the shared prefix and suffix. Returns (changes, gapped ref,
+    # gapped alt) for the window.
+    ref_window, alt_window = ref_protein[:ref_end], alt_protein[:alt_end]
+    n = 0
+    limit = min(len(ref_window), len(alt_window))
+    while n < limit and ref_window[n] == alt_window[n]:
+        n += 1
+    m = 0
+    while m < limit - n and ref_window[-1 - m] == alt_window[-1 - m]:
+        m += 1
+    ref_core = ref_window[n:len(ref_window) - m]
+    alt_core = alt_window[n:len(alt_window) - m]
+    gapped_ref, gapped_alt = align_proteins(ref_core, alt_core)
+    changes = []
+    ref_index = n
+    event = None  # [start, ref_seg, alt_seg]
+    for ref_aa, alt_aa in zip(gapped_ref + "=", gapped_alt + "="):
+        if ref_aa == alt_aa:
+            if event:
+                changes.append(describe_event(ref_protein, *event))
+                event = None
+            ref_index += ref_aa != '-'
+            continue
+        if event is None:
+            event = [ref_index, "", ""]
+        if ref_aa != '-':
+            event[1] += ref_aa
+            ref_index += 1
+        if alt_aa != '-':
+            event[2] += alt_aa
+    suffix = ref_window[len(ref_window) - m:]
+    return changes, ref_window[:n] + gapped_ref + suffix, alt_window[:n] + gapped_alt + suffix
+
+
+def protein_consequence(transcript, ref_seq, cells, table=1):
+    # HGVS p. changes of the sample on one coding transcript:
+    # substitutions, del/ins/dup/delins, nonsense (Ter), stop loss (ext),
+    # start loss (Met1?) and frameshifts (fsTerN, counted from the first
+    # changed residue). The protein pair is aligned only where it differs.
+    ref_coding, alt_coding, alt_starts = coding_sequences(transcript, ref_seq, cells)
+    ref_protein = translate_to_stop(ref_coding, table)
+    alt_protein = translate_to_stop(alt_coding, table)
+    result = {
+        'transcript': transcript.accession,
+        'protein_id': transcript.protein_id,
+        'strand': transcript.strand,
+        'ref_protein': ref_protein,
+        'alt_protein': alt_protein,
+        'frameshift': False,
+        'changes': [],
+        'fs_start': None,  # First residue of a shifted frame, if any
+    }
+    if ref_protein == alt_protein:
+        result.update(changes=["p.(=)"], aligned_ref=ref_protein, aligned_alt=alt_protein)
+        return result
+    if ref_protein[:1] == 'M' and alt_protein[:1] != 'M':
+        result['changes'] = ["p.Met1?"]
+    # Reading frame of the sample where its translation stops (or runs out)
+    alt_stop = len(alt_protein) - 1 if alt_protein.endswith('*') else len(alt_protein)
+    k = bisect_right(alt_starts, alt_stop * 3) - 1
+    if (alt_starts[k] - k) % 3:
+        n = 0
+        while n < min(len(ref_protein), len(alt_protein)) and ref_protein[n] == alt_protein[n]:
+            n += 1
+        result['frameshift'] = True
+        result['fs_start'] = n
+        if not result['changes']:
+            if n < len(alt_protein) and alt_protein[n] == '*':
+                result['changes'] = [f"p.{three(ref_protein[n])}{n + 1}Ter"]
+            else:
+                ter = f"Ter{alt_stop - n + 1}" if alt_protein.endswith('*') else "Ter?"
+                result['changes'] = [f"p.{three(ref_protein[n])}{n + 1}{three(alt_protein[n:n + 1])}fs{ter}"]
+        width = max(len(ref_protein), len(alt_protein))
+        result.update(aligned_ref=ref_protein.ljust(width, '-'), aligned_alt=alt_protein.ljust(width, '-'))
+        return result
+    # In frame: the residue each stop codon maps to on the other sequence
+    ref_stop = len(ref_protein) - 1 if ref_protein.endswith('*') else len(ref_protein)
+    ref_at_alt_stop = min(k // 3, ref_stop)
+    alt_at_ref_stop = alt_starts[min(ref_stop * 3, len(alt_starts) - 1)] // 3
+    if alt_protein.endswith('*') and ref_at_alt_stop < ref_stop:
+        # Premature stop: compare up to it, then report the Ter
+        changes, aligned_ref, aligned_alt = compare_window(ref_protein, alt_protein, ref_at_alt_stop, alt_stop)
+        changes.append(f"p.{three(ref_protein[ref_at_alt_stop])}{ref_at_alt_stop + 1}Ter")
+        aligned_ref += ref_protein[ref_at_alt_stop:]
+        aligned_alt += "*"
+    elif ref_protein.endswith('*') and alt_at_ref_stop < len(alt_protein) and alt_protein[alt_at_ref_stop] != '*':
+        # Stop lost: the sample reads on to the next in-frame stop
+        changes, aligned_ref, aligned_alt = compare_window(ref_protein, alt_protein, ref_stop, alt_at_ref_stop)
+        tail = alt_protein[alt_at_ref_stop:]
+        new_stop = f"Ter{len(tail) - 1}" if tail.endswith('*') else "Ter?"
+        changes.append(f"p.Ter{ref_stop + 1}{three(tail[0])}ext{new_stop}")
+        aligned_ref += "*"
+        aligned_alt += tail
+    else:
+        changes, aligned_ref, aligned_alt = compare_window(ref_protein, alt_protein, len(ref_protein), len(alt_protein))
+    if not result['changes']:
+        result['changes'] = changes or ["p.(=)"]
+    width = max(len(aligned_ref), len(aligned_alt))
+    result.update(aligned_ref=aligned_ref.ljust(width, '-'), aligned_alt=aligned_alt.ljust(width, '-'))
+    return result
@@ -0,0 +1,356 @@
+import csv
+import hashlib
+import json
+import os
+import random
+import shutil
+import socket
+import threading
+import time
+from datetime import datetime
+
+QUEUE_VERSION = 1
+STATES = ("pending", "leased", "done", "failed")
+LEASE_SECONDS = 300  # A lease not renewed for this long is taken back
+MAX_ATTEMPTS = 3  # Runs of a job (failures and expired leases) before it is marked failed
+POLL_SECONDS = 2.0
+CLAIM_WINDOW = 64  # Workers pick at random among the first pending jobs, so they rarely collide
+FASTQ_EXTENSIONS = (".fastq", ".fq", ".fastq.gz", ".fq.gz")
+GENBANK_EXTENSIONS = (".gb", ".gbk", ".genbank")
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def write_json(path, data):
+    # Written to a dot-file beside the target and renamed over it, so
+    # readers on any node see the old file or the new one, never half of it
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{worker_name()}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class WorkQueue:
+    # Durable job queue in a directory on a filesystem shared by every node,
+    # one JSON file per job moving between pending/, leased/, done/ and
+    # failed/. Claiming is an atomic rename out of pending/, so exactly one
+    # worker wins each job without a broker or file locks (SQLite locking is
+    # not safe on NFS). A lease is the mtime of the claimed file, renewed by
+    # the worker's heartbeat; any worker or the coordinator puts leases that
+    # stop being renewed back in pending/. Each claim carries a random token,
+    # so a worker whose lease was taken back never renews, deletes or
+    # requeues the job's newer copies. Results are written under the job id
+    # and a job that finishes twice writes the same files, so a slow worker
+    # racing a retry is harmless.
+    def __init__(self, directory, lease_seconds=None, max_attempts=None):
+        self.directory = directory
+        for name in STATES + ("refs", "results"):
+            os.makedirs(os.path.join(directory, name), exist_ok=True)
+        config_path = os.path.join(directory, "queue.json")
+        if os.path.exists(config_path):
+            self.config = read_json(config_path)
+            if self.config['version'] != QUEUE_VERSION:
+                raise ValueError(f"Unsupported work queue version {self.config['version']}")
+        else:
+            self.config = {'version': QUEUE_VERSION, 'created': datetime.now().isoformat(timespec='seconds'),
+                           'lease_seconds': lease_seconds or LEASE_SECONDS, 'max_attempts': max_attempts or MAX_ATTEMPTS}
+            write_json(config_path, self.config)
+        self.lease_seconds = self.config['lease_seconds']
+        self.max_attempts = self.config['max_attempts']
+
+    def path(self, state, job_id):
+        return os.path.join(self.directory, state, f"{job_id}.json")
+
+    def jobs(self, state):
+        return sorted(name[:-5] for name in os.listdir(os.path.join(self.directory, state)) if name.endswith(".json") and not name.startswith('.'))
+
+    def counts(self):
+        return {state: len(self.jobs(state)) for state in STATES}
+
+    def state_of(self, job_id):
+        return next((state for state in STATES if os.path.exists(self.path(state, job_id))), None)
+
+    def add_reference(self, path):
+        # References are copied in once, by content digest, so workers on
+        # other nodes never depend on the submitting node's paths
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        extension = ".gb" if path.lower().endswith(GENBANK_EXTENSIONS) else ".fa"
+        relative = os.path.join("refs", digest + extension)
+        target = os.path.join(self.directory, relative)
+        if not os.path.exists(target):
+            tmp = os.path.join(self.directory, "refs", f".{digest}.{worker_name()}.tmp")
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+        return relative
+
+    def submit(self, samples, reference, setup):
+        # One job per (reference, sample, settings); the id is a digest of
+        # the three, so submitting the same batch again adds nothing
+        reference = self.add_reference(reference)
+        settings = json.dumps(setup, sort_keys=True)
+        added = skipped = 0
+        for sample in samples:
+            sample = os.path.abspath(sample)
+            job_id = hashlib.sha1(f"{reference}\0{sample}\0{settings}".encode("utf-8")).hexdigest()[:20]
+            if self.state_of(job_id):
+                skipped += 1
+                continue
+            name = os.path.basename(sample)
+            for extension in FASTQ_EXTENSIONS + (".fasta", ".fa", ".fas", ".txt", ".ab1", ".abi"):
+                if name.lower().endswith(extension):
+                    name = name[:-len(extension)]
+                    break
+            write_json(self.path("pending", job_id), {
+                'id': job_id, 'sample': sample, 'name': name, 'reference': reference, 'setup': setup,
+                'attempts': 0, 'error': None, 'submitted': datetime.now().isoformat(timespec='seconds'),
+            })
+            added += 1
+        return added, skipped
+
+    def claim(self, worker):
+        window = self.jobs("pending")[:CLAIM_WINDOW]
+        random.shuffle(window)
+        for job_id in window:
+            source, lease = self.path("pending", job_id), self.path("leased", job_id)
+            try:
+                os.utime(source)  # The rename keeps the mtime; the lease starts now
+                os.rename(source, lease)
+            except FileNotFoundError:
+                continue  # Another worker got there first
+            job = read_json(lease)
+            if os.path.exists(self.path("done", job_id)):
+                remove(lease)  # A retry of a job that did finish after all
+                continue
+            job.update(worker=worker, lease=os.urandom(8).hex(), leased=datetime.now().isoformat(timespec='seconds'))
+            write_json(lease, job)
+            return job
+        return None
+
+    def holds(self, job):
+        # Whether the leased file is still this claim's: it may have expired
+        # and been requeued, or claimed again by another worker since
+        try:
+            return read_json(self.path("leased", job['id'])).get('lease') == job['lease']
+        except FileNotFoundError:
+            return False
+
+    def heartbeat(self, job):
+        if not self.holds(job):
+            return False  # Taken back; the result still counts if we finish
+        try:
+            os.utime(self.path("leased", job['id']))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, job, result):
+        held = self.holds(job)
+        job = dict(job, result=result, error=None, finished=datetime.now().isoformat(timespec='seconds'))
+        write_json(self.path("done", job['id']), job)
+        if held:
+            remove(self.path("leased", job['id']))
+        remove(self.path("pending", job['id']))  # A requeued copy has nothing left to do
+
+    def fail(self, job, error, lease=None):
+        # Back to pending until max_attempts runs have failed or expired.
+        # lease is an expired file already renamed aside by requeue_expired.
+        if lease is None and not self.holds(job):
+            return  # Taken back: the requeue already counted this run
+        job = dict(job, attempts=job['attempts'] + 1, error=error)
+        if os.path.exists(self.path("done", job['id'])):
+            remove(lease or self.path("leased", job['id']))
+            return
+        write_json(self.path("failed" if job['attempts'] >= self.max_attempts else "pending", job['id']), job)
+        remove(lease or self.path("leased", job['id']))
+
+    def requeue_expired(self):
+        # Leases whose heartbeat stopped (crashed or hung worker). The expired
+        # file is first renamed aside, so only one process requeues it.
+        requeued = 0
+        now = time.time()
+        for job_id in self.jobs("leased"):
+            lease = self.path("leased", job_id)
+            try:
+                if now - os.path.getmtime(lease) <= self.lease_seconds:
+                    continue
+                aside = os.path.join(self.directory, "leased", f".{job_id}.{worker_name()}.expired")
+                os.rename(lease, aside)
+            except FileNotFoundError:
+                continue
+            job = read_json(aside)
+            self.fail(job, f"lease expired on {job.get('worker', 'unknown worker')}", lease=aside)
+            requeued += 1
+        return requeued
+
+    def status(self):
+        counts = self.counts()
+        done = [read_json(self.path("done", job_id)) for job_id in self.jobs("done")]
+        per_worker = {}
+        for job in done:
+            per_worker[job.get('worker', "?")] = per_worker.get(job.get('worker', "?"), 0) + 1
+        finished = sorted(datetime.fromisoformat(job['finished']).timestamp() for job in done if job.get('finished'))
+        rate = (len(finished) - 1) / (finished[-1] - finished[0]) * 60 if len(finished) > 1 and finished[-1] > finished[0] else None
+        return {'counts': counts, 'total': sum(counts.values()), 'workers': per_worker, 'jobs_per_minute': rate,
+                'active': [read_json(self.path("leased", job_id)).get('worker') for job_id in self.jobs("leased")]}
+
+    def status_text(self):
+        status = self.status()
+        counts, total = status['counts'], status['total']
+        lines = ["📦 WORK QUEUE", f"   {self.directory}",
+                 f"   Jobs: {total} ({counts['done']} done, {counts['leased']} running, {counts['pending']} pending, {counts['failed']} failed)"]
+        if total:
+            lines.append(f"   Progress: {(counts['done'] + counts['failed']) / total:.1%}")
+        if status['jobs_per_minute']:
+            remaining = counts['pending'] + counts['leased']
+            lines.append(f"   Throughput: {status['jobs_per_minute']:.1f} jobs/min" + (f", ~{remaining / status['jobs_per_minute']:.0f} min left" if remaining else ""))
+        for worker, n in sorted(status['workers'].items()):
+            lines.append(f"   • {worker}: {n} done")
+        for job_id in self.jobs("failed"):
+            job = read_json(self.path("failed", job_id))
+            lines.append(f"   ❌ {job['name']}: {job['error']}")
+        return "\n".join(lines)
+
+
+def open_reference(queue, job):
+    # Engine configured from a job's setup, with its reference loaded
+    from mutanalyzer_engine import MutationEngine
+    from mutanalyzer_headless import load_genbank, parse_exon_ranges, read_sequence
+    setup = job['setup']
+    engine = MutationEngine()
+    engine.genetic_code = setup.get('genetic_code', "Standard")
+    path = os.path.join(queue.directory, job['reference'])
+    ref_seq = load_genbank(engine, path) if path.endswith(".gb") else read_sequence(engine, path)
+    if setup.get('exons'):
+        engine.set_gene_model(parse_exon_ranges(setup['exons']))
+    if setup.get('gene'):
+        engine.gene_name = setup['gene']
+    engine.circular = engine.circular or setup.get('circular', False)
+    return engine, ref_seq.upper()
+
+
+def run_job(queue, job, engines):
+    # align/call/annotate one sample and write its CSV and session under
+    # results/<job id>. engines caches the last reference's engine (gene
+    # model and seed index included) for the next job on it.
+    from mutanalyzer_engine import GLOBAL_ALGORITHM
+    from mutanalyzer_headless import read_sequence
+    from mutanalyzer_session import SESSION_EXTENSION
+    key = (job['reference'], json.dumps(job['setup'], sort_keys=True))
+    if key not in engines:
+        engines.clear()
+        engines[key] = open_reference(queue, job)
+    engine, ref_seq = engines[key]
+    setup = job['setup']
+    if job['sample'].lower().endswith(FASTQ_EXTENSIONS):
+        engine.call_from_reads(job['sample'], ref_seq, setup.get('min_depth'), setup.get('min_af'))
+    else:
+        engine.compute_alignment(ref_seq, read_sequence(engine, job['sample'], ref_seq), setup.get('algorithm', GLOBAL_ALGORITHM))
+        engine.call_mutations()
+    if setup.get('predict', True):
+        engine.score_pathogenicity()
+    base = os.path.join(queue.directory, "results", job['id'])
+    engine.save_session(base + SESSION_EXTENSION, job['name'])
+    tmp = f"{base}.{worker_name()}.csv.tmp"
+    engine.write_csv(tmp)
+    os.replace(tmp, base + ".csv")
+    return {
+        'variants': len(engine.mutations),
+        'high_severity': sum('🔴' in m['severity'] for m in engine.mutations),
+        'algorithm': engine.algorithm,
+        'csv': os.path.join("results", job['id'] + ".csv"),
+        'session': os.path.join("results", job['id'] + SESSION_EXTENSION),
+    }
+
+
+def run_worker(queue, worker=None, max_jobs=None, progress=None):
+    # Pulls jobs until the queue has nothing pending or running. Waiting on
+    # other workers' leases (rather than exiting) lets this worker pick up
+    # any that expire.
+    worker = worker or worker_name()
+    engines = {}
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        queue.requeue_expired()
+        job = queue.claim(worker)
+        if job is None:
+            counts = queue.counts()
+            if not counts['pending'] and not counts['leased']:
+                break
+            time.sleep(POLL_SECONDS)
+            continue
+        stop = threading.Event()
+
+        def beat(job=job):
+            while not stop.wait(queue.lease_seconds / 3):
+                if not queue.heartbeat(job):
+                    return
+
+        heart = threading.Thread(target=beat, daemon=True)
+        heart.start()
+        started = time.time()
+        try:
+            result = run_job(queue, job, engines)
+            result['seconds'] = round(time.time() - started, 2)
+            queue.complete(job, result)
+            if progress:
+                progress(f"✅ {job['name']}: {result['variants']} variants ({result['seconds']}s)")
+        except Exception as e:
+            engines.clear()  # Don't reuse an engine left in an unknown state
+            queue.fail(job, str(e))
+            if progress:
+                progress(f"❌ {job['name']}: {e}")
+        finally:
+            stop.set()
+            heart.join()
+        processed += 1
+    return processed
+
+
+def wait_for(queue, progress=None, interval=POLL_SECONDS * 5):
+    # Coordinator side: requeue expired leases and report until every job is
+    # done or failed
+    while True:
+        queue.requeue_expired()
+        counts = queue.counts()
+        if progress:
+            total = sum(counts.values())
+            progress(f"📦 {counts['done'] + counts['failed']}/{total} finished ({counts['leased']} running, {counts['failed']} failed)")
+        if not counts['pending'] and not counts['leased']:
+            return counts
+        time.sleep(interval)
+
+
+def collect(queue, csv_path=None):
+    # Finished jobs as (job, result CSV path); with csv_path, all result rows
+    # merged into one CSV with a leading Sample column
+    finished = [read_json(queue.path("done", job_id)) for job_id in queue.jobs("done")]
+    finished.sort(key=lambda job: job['name'])
+    if csv_path:
+        with open(csv_path, 'w', newline='', encoding='utf-8') as out:
+            writer = None
+            for job in finished:
+                with open(os.path.join(queue.directory, job['result']['csv']), newline='', encoding='utf-8') as f:
+                    reader = csv.DictReader(f)
+                    if writer is None:
+                        writer = csv.DictWriter(out, fieldnames=['Sample'] + reader.fieldnames)
+                        writer.writeheader()
+                    for row in reader:
+                        writer.writerow(dict(row, Sample=job['name']))
+    return finished
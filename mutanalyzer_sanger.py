@@ -0,0 +1,261 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from Bio.Seq import reverse_complement
+
+from mutanalyzer_index import seed_span
+
+TRACE_EXTENSIONS = (".ab1", ".abi", ".ab!")
+MOTT_CUTOFF = 0.05  # Error-probability limit of Mott's modified trimming (as Biopython's abi-trim)
+HET_RATIO = 0.35  # Secondary/primary peak height that marks a heterozygous base
+MIN_HET_QUALITY = 10  # Low-quality bases are never promoted to het calls
+PEAK_WINDOW = 2  # Scan points either side of a peak location
+
+IUPAC_PAIRS = {
+    frozenset("AG"): "R", frozenset("CT"): "Y", frozenset("GT"): "K",
+    frozenset("AC"): "M", frozenset("CG"): "S", frozenset("AT"): "W",
+}
+IUPAC_BASES = {code: "".join(sorted(pair)) for pair, code in IUPAC_PAIRS.items()}
+
+
+def genotype_alleles(ref_base, alt_base):
+    # Alternate alleles and genotype of a sample base that may be an IUPAC
+    # heterozygote: 'R' over ref 'A' is ('G', '0/1'), over ref 'C' it is
+    # both A and G ('1/2'); a plain base is a homozygous '1/1' call.
+    pair = IUPAC_BASES.get(alt_base)
+    if pair is None:
+        return [alt_base], "1/1"
+    alts = [base for base in pair if base != ref_base]
+    return alts, "0/1" if len(alts) == 1 else "1/2"
+
+
+def mott_trim(qualities, cutoff=MOTT_CUTOFF):
+    # Richard Mott's modified trimming as one max-subarray pass:
+    # maximise sum(cutoff - p_error) over [start, end)
+    if not len(qualities):
+        return 0, 0
+    score = cutoff - np.power(10.0, -np.asarray(qualities, dtype=float) / 10.0)
+    cum = np.concatenate([[0.0], np.cumsum(score)])
+    running_min = np.minimum.accumulate(cum)
+    end = int(np.argmax(cum - running_min))
+    if cum[end] - running_min[end] <= 0:
+        return 0, 0
+    start = int(np.argmin(cum[:end + 1]))
+    return start, end
+
+
+class SangerTrace:
+    # One capillary read: called bases, Phred qualities, peak locations and
+    # the four dye channels (rows in A, C, G, T order).
+    def __init__(self, name, bases, qualities, peaks, channels):
+        self.name = name
+        self.bases = bases.upper()
+        self.qualities = np.asarray(qualities, dtype=np.int64)
+        self.peaks = np.asarray(peaks, dtype=np.int64)
+        self.channels = np.asarray(channels, dtype=np.float64)
+
+    @classmethod
+    def from_record(cls, record):
+        raw = record.annotations.get("abif_raw", {})
+        order = raw.get("FWO_1", b"GATC")
+        order = order.decode("ascii") if isinstance(order, bytes) else str(order)
+        data = {base: raw.get(f"DATA{9 + i}") for i, base in enumerate(order.upper())}
+        if any(data.get(base) is None for base in "ACGT") or not raw.get("PLOC2"):
+            raise ValueError(f"{record.id}: trace has no processed channel data")
+        channels = np.array([data[base] for base in "ACGT"], dtype=np.float64)
+        qualities = record.letter_annotations.get("phred_quality") or [20] * len(record.seq)
+        return cls(record.name or record.id, str(record.seq), qualities, raw["PLOC2"], channels)
+
+    @classmethod
+    def read(cls, path):
+        from Bio import SeqIO
+        trace = cls.from_record(SeqIO.read(path, "abi"))
+        trace.name = os.path.splitext(os.path.basename(path))[0]
+        return trace
+
+    def peak_heights(self):
+        # Max height of each channel within PEAK_WINDOW of every base's
+        # peak, shape (4, n_bases)
+        offsets = np.arange(-PEAK_WINDOW, PEAK_WINDOW + 1)
+        points = np.clip(self.peaks[:, None] + offsets, 0, self.channels.shape[1] - 1)
+        return self.channels[:, points].max(axis=2)
+
+    def calls(self, het_ratio=HET_RATIO, trim=True):
+        # Trimmed sequence with IUPAC codes where the strongest other
+        # channel reaches het_ratio of the called base's peak.
+        # Returns (sequence, trim_start, het_positions in the trimmed read).
+        n = min(len(self.bases), len(self.peaks), len(self.qualities))
+        bases = np.frombuffer(self.bases[:n].encode("ascii"), dtype=np.uint8)
+        start, end = mott_trim(self.qualities[:n]) if trim else (0, n)
+        heights = self.peak_heights()[:, :n]
+        called = np.full(n, -1)
+        for i, base in enumerate(b"ACGT"):
+            called[bases == base] = i
+        known = called >= 0
+        primary = np.where(known, heights[np.maximum(called, 0), np.arange(n)], heights.max(axis=0))
+        others = heights.copy()
+        others[np.maximum(called, 0)[known], np.flatnonzero(known)] = -1
+        secondary_channel = others.argmax(axis=0)
+        secondary = others.max(axis=0)
+        ratio = np.divide(secondary, primary, out=np.zeros(n), where=primary > 0)
+        het = known & (ratio >= het_ratio) & (self.qualities[:n] >= MIN_HET_QUALITY)
+        het[:start] = False
+        het[end:] = False
+        sequence = list(self.bases[:n])
+        for i in np.flatnonzero(het).tolist():
+            sequence[i] = IUPAC_PAIRS[frozenset("ACGT"[called[i]] + "ACGT"[secondary_channel[i]])]
+        return "".join(sequence[start:end]), start, (np.flatnonzero(het[start:end])).tolist()
+
+
+def place_trace(index, sequence):
+    # (strand, diagonal) of a trimmed trace on the reference by seed votes,
+    # or None. Het codes never seed, so enough clean k-mers must remain.
+    q, r, strand = index.anchors(sequence)
+    if not len(q):
+        return None
+    diag = np.where(strand == 0, r - q, r - (len(sequence) - index.k - q))
+    keys, votes = np.unique(np.stack([strand.astype(np.int64), diag]), axis=1, return_counts=True)
+    best_strand, best_diag = keys[:, votes.argmax()].tolist()
+    return best_strand, best_diag
+
+
+def trace_sample(ref_seq, sequence, index, circular=False):
+    # Sample string for the engine: the trace in reference orientation with
+    # the uncovered reference flanks filled in from the reference itself,
+    # so positions stay absolute and the flanks call nothing. On a circular
+    # reference a trace may run across the origin (then start > end).
+    if circular:
+        from mutanalyzer_circular import reference_frame
+        framed = reference_frame(ref_seq, sequence, index, fill_flanks=True)
+        if framed is None:
+            return None
+        sample, strand, _, covered = framed
+        return sample, covered, strand
+    placement = place_trace(index, sequence)
+    if placement is None:
+        return None
+    strand, diag = placement
+    if strand == 1:
+        sequence = reverse_complement(sequence)
+    q, r, seed_strand = index.anchors(sequence)
+    forward = seed_strand == 0
+    first, last = seed_span(q[forward], r[forward], diag, len(sequence))
+    # Bases hanging off either end of the reference are dropped
+    clipped = sequence[max(0, -first):len(sequence) - max(0, last - len(ref_seq))]
+    start, end = max(0, first), min(len(ref_seq), last)
+    return ref_seq[:start] + clipped + ref_seq[end:], (start + 1, end), strand
+
+
+def list_traces(folder):
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.lower().endswith(TRACE_EXTENSIONS))
+
+
+def engine_setup(engine, algorithm=None, predict=True):
+    # Picklable snapshot of an engine's gene model for plate workers;
+    # predict=False skips pathogenicity scoring, as in queue job setups
+    from mutanalyzer_engine import GLOBAL_ALGORITHM
+    return {
+        'exon_ranges': list(engine.exon_ranges),
+        'transcripts': list(engine.transcripts),
+        'genetic_code': engine.genetic_code,
+        'reference_accession': engine.reference_accession,
+        'reference_digest': engine.reference_digest,
+        'gene_name': engine.gene_name,
+        'circular': engine.circular,
+        'use_memo': engine.use_memo,
+        'memo_path': engine.memo_path,
+        'algorithm': algorithm or GLOBAL_ALGORITHM,
+        'predict': predict,
+    }
+
+
+def analyze_trace_file(path, ref_seq, setup):
+    # One plate well, run in a worker process. setup carries the engine
+    # configuration: exon_ranges or transcripts, genetic_code, algorithm,
+    # predict.
+    from mutanalyzer_engine import GLOBAL_ALGORITHM, MutationEngine
+    engine = MutationEngine()
+    engine.workers = 1
+    engine.genetic_code = setup.get('genetic_code', "Standard")
+    engine.reference_accession = setup.get('reference_accession')
+    engine.reference_digest = setup.get('reference_digest')
+    engine.gene_name = setup.get('gene_name', "")
+    engine.circular = setup.get('circular', False)
+    engine.use_memo = setup.get('use_memo', True)
+    engine.memo_path = setup.get('memo_path')
+    if setup.get('transcripts'):
+        engine.set_transcripts(setup['transcripts'])
+    elif setup.get('exon_ranges'):
+        engine.set_gene_model(setup['exon_ranges'])
+    result = {'sample': os.path.splitext(os.path.basename(path))[0], 'path': path, 'mutations': [], 'error': None}
+    try:
+        sample_seq = engine.load_trace(path, ref_seq)
+        result.update(read_length=len(engine.trace.bases), covered=engine.trace_coverage)
+        engine.compute_alignment(ref_seq, sample_seq, setup.get('algorithm', GLOBAL_ALGORITHM))
+        result['mutations'] = engine.call_mutations()
+        if setup.get('predict', True):
+            engine.score_pathogenicity()
+        result['heterozygous'] = len([m for m in result['mutations'] if m.get('genotype')])
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def analyze_plate(folder, ref_seq, setup=None, workers=None, progress=None):
+    # All traces of a 96/384-well plate folder across a process pool, in
+    # well order. Failed wells come back with 'error' set.
+    paths = list_traces(folder)
+    setup = setup or {}
+    results = []
+    if (workers or os.cpu_count() or 1) == 1 or len(paths) < 2:
+        for path in paths:
+            results.append(analyze_trace_file(path, ref_seq, setup))
+            if progress:
+                progress(len(results), len(paths))
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(analyze_trace_file, paths, [ref_seq] * len(paths), [setup] * len(paths)):
+            results.append(result)
+            if progress:
+                progress(len(results), len(paths))
+    return results
+
+
+def plate_summary(results):
+    lines = ["🧪 SANGER PLATE SUMMARY", f"   Traces: {len(results)}"]
+    failed = [r for r in results if r['error']]
+    lines.append(f"   Analyzed: {len(results) - len(failed)}, failed: {len(failed)}")
+    lines.append("")
+    for result in results:
+        if result['error']:
+            lines.append(f"   ❌ {result['sample']}: {result['error']}")
+            continue
+        start, end = result['covered']
+        lines.append(f"   {result['sample']}: {start}-{end}, {len(result['mutations'])} variants ({result['heterozygous']} heterozygous)")
+    return "\n".join(lines)
+
+
+def write_plate_csv(results, file_path):
+    # One row per (trace, variant); traces without variants get an empty row
+    fieldnames = ['Sample', 'Position', 'Reference', 'Alternative', 'Type', 'Genotype', 'Region', 'Effect', 'Severity', 'Error']
+    with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for result in results:
+            if not result['mutations']:
+                writer.writerow({'Sample': result['sample'], 'Error': result['error'] or ""})
+            for mut in result['mutations']:
+                writer.writerow({
+                    'Sample': result['sample'],
+                    'Position': mut['position'],
+                    'Reference': mut['ref'],
+                    'Alternative': mut['alt'],
+                    'Type': mut['type'],
+                    'Genotype': mut.get('genotype', "1/1"),
+                    'Region': mut['region'],
+                    'Effect': mut['effect'],
+                    'Severity': mut['severity'],
+                    'Error': "",
+                })
@@ -0,0 +1,263 @@
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from mutanalyzer_index import DECODE, encode
+from mutanalyzer_transcripts import Transcript
+
+SESSION_VERSION = 1
+SESSION_EXTENSION = ".mas"
+SESSION_MAGIC = b"MUTASESS"
+PREAMBLE = struct.Struct("<8sIIQ")  # magic, version, reserved, header length
+SECTION_ALIGN = 64  # Every array starts on a 64-byte boundary of the file
+OPS = b"=XID"  # Alignment ops: match, mismatch, insertion (sample only), deletion (reference only)
+
+# Mutation keys stored as columns; anything else goes to the 'extra' JSON
+INT_COLUMNS = ('position', 'end')
+STRING_COLUMNS = ('type', 'ref', 'alt', 'region', 'effect', 'severity', 'frameshift', 'genotype', 'transcript', 'protein_change')
+SCORE_COLUMNS = ('sift', 'polyphen')  # "Label (0.12)" -> label column + float column
+SCORE_PATTERN = re.compile(r"^(.*) \((-?\d+\.\d\d)\)$")
+
+
+# ---------------------------------------------------------------------------
+# Encoders: sequences, alignment, variant columns
+# ---------------------------------------------------------------------------
+
+def pack_sequence(seq):
+    # 2 bits per base, four bases per byte; non-ACGT bytes (N, IUPAC) are
+    # kept as (position, byte) exceptions
+    raw = np.frombuffer(seq.encode("ascii"), dtype=np.uint8)
+    codes = encode(seq)
+    exceptions = np.flatnonzero(DECODE[codes & 3] != raw).astype(np.uint32)
+    padded = np.zeros(-(-len(codes) // 4) * 4, dtype=np.uint8)
+    padded[:len(codes)] = codes & 3
+    quads = padded.reshape(-1, 4)
+    packed = (quads[:, 0] << 6) | (quads[:, 1] << 4) | (quads[:, 2] << 2) | quads[:, 3]
+    return packed.astype(np.uint8), exceptions, raw[exceptions]
+
+
+def unpack_sequence(packed, length, exceptions, exception_bytes):
+    codes = ((packed[:, None] >> np.array([6, 4, 2, 0], dtype=np.uint8)) & 3).reshape(-1)[:length]
+    raw = DECODE[codes]
+    raw[exceptions] = exception_bytes
+    return raw.tobytes().decode("ascii")
+
+
+def alignment_ops(aligned_ref, aligned_sample):
+    # Run-length edit script (op codes, lengths) plus the sample bases the
+    # reference cannot supply (mismatches and insertions)
+    ref = np.frombuffer(aligned_ref.encode("ascii"), dtype=np.uint8)
+    sample = np.frombuffer(aligned_sample.encode("ascii"), dtype=np.uint8)
+    gap = ord('-')
+    op = np.where(sample == gap, 3, np.where(ref == gap, 2, np.where(ref == sample, 0, 1))).astype(np.uint8)
+    if not len(op):
+        return np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint8)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(op)) + 1])
+    lengths = np.diff(np.append(starts, len(op))).astype(np.uint32)
+    return op[starts], lengths, sample[(op == 1) | (op == 2)]
+
+
+def apply_ops(ref_seq, ops, lengths, sample_bases):
+    # Rebuild both gapped strings from the reference and the edit script
+    op = np.repeat(ops, lengths)
+    ref = np.frombuffer(ref_seq.encode("ascii"), dtype=np.uint8)
+    has_ref = op != 2
+    aligned_ref = np.full(len(op), ord('-'), dtype=np.uint8)
+    aligned_ref[has_ref] = ref[:int(has_ref.sum())]
+    aligned_sample = np.full(len(op), ord('-'), dtype=np.uint8)
+    aligned_sample[op == 0] = aligned_ref[op == 0]
+    aligned_sample[(op == 1) | (op == 2)] = sample_bases
+    return aligned_ref.tobytes().decode("ascii"), aligned_sample.tobytes().decode("ascii")
+
+
+def string_column(values):
+    # Dictionary encoding: uint32 codes into a vocabulary whose entry 0
+    # stands for "key absent"; the vocabulary is stored as offsets + UTF-8
+    vocab = {None: 0}
+    codes = np.array([vocab.setdefault(value, len(vocab)) for value in values], dtype=np.uint32)
+    words = [str(word).encode("utf-8") for word in list(vocab)[1:]]
+    offsets = np.zeros(len(words) + 1, dtype=np.uint64)
+    np.cumsum([len(word) for word in words], out=offsets[1:])
+    return codes, offsets, np.frombuffer(b"".join(words), dtype=np.uint8)
+
+
+def read_string_column(codes, offsets, blob):
+    text = blob.tobytes()
+    bounds = offsets.tolist()
+    vocab = [None] + [text[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+    return [vocab[code] for code in codes.tolist()]
+
+
+def split_score(value):
+    if value is None:
+        return None, np.nan
+    match = SCORE_PATTERN.match(value)
+    if match and f"{match.group(1)} ({float(match.group(2)):.2f})" == value:
+        return match.group(1), float(match.group(2))
+    return value, np.nan
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+def session_sections(state):
+    sections = {}
+    ref_seq = state['ref_seq']
+    sections['ref_2bit'], sections['ref_exceptions'], sections['ref_exception_bytes'] = pack_sequence(ref_seq)
+    aligned_ref, aligned_sample = state['aligned_ref'], state['aligned_sample']
+    if aligned_ref.replace('-', '') == ref_seq:
+        sections['ops'], sections['op_lengths'], sections['sample_bases'] = alignment_ops(aligned_ref, aligned_sample)
+    else:
+        # Partial alignments keep their gapped strings verbatim
+        sections['aligned_ref'] = np.frombuffer(aligned_ref.encode("ascii"), dtype=np.uint8)
+        sections['aligned_sample'] = np.frombuffer(aligned_sample.encode("ascii"), dtype=np.uint8)
+    if aligned_sample.replace('-', '') != state['sample_seq']:
+        sections['sample'] = np.frombuffer(state['sample_seq'].encode("ascii"), dtype=np.uint8)
+    mutations = state['mutations']
+    sections['position'] = np.array([m['position'] for m in mutations], dtype=np.int64)
+    sections['end'] = np.array([-1 if m.get('end') is None else m['end'] for m in mutations], dtype=np.int64)
+    for name in STRING_COLUMNS:
+        sections[f"{name}.codes"], sections[f"{name}.offsets"], sections[f"{name}.blob"] = string_column([m.get(name) for m in mutations])
+    for name in SCORE_COLUMNS:
+        labels, scores = zip(*[split_score(m.get(name)) for m in mutations]) if mutations else ((), ())
+        sections[f"{name}.codes"], sections[f"{name}.offsets"], sections[f"{name}.blob"] = string_column(labels)
+        sections[f"{name}.score"] = np.array(scores, dtype=np.float64)
+    known = set(INT_COLUMNS + STRING_COLUMNS + SCORE_COLUMNS)
+    extra = [{key: value for key, value in m.items() if key not in known} or None for m in mutations]
+    if any(extra):
+        sections['extra'] = np.frombuffer(json.dumps(extra).encode("utf-8"), dtype=np.uint8)
+    return sections
+
+
+def write_session(path, state):
+    # Versioned binary session: fixed preamble, JSON header (metadata and
+    # the section table), then 64-byte aligned arrays. Written to a temp
+    # file in the same directory, fsynced and renamed into place, so a
+    # crash never leaves a half-written session behind.
+    sections = session_sections(state)
+    table = {}
+    offset = 0
+    for name, array in sections.items():
+        offset = -(-offset // SECTION_ALIGN) * SECTION_ALIGN
+        table[name] = [offset, array.dtype.str, len(array)]
+        offset += array.nbytes
+    header = {
+        'version': SESSION_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'sample_name': state.get('sample_name') or "sample",
+        'ref_length': len(state['ref_seq']),
+        'gene': state.get('gene_name') or "",
+        'accession': state.get('reference_accession'),
+        'chrom': state.get('chrom'),
+        'algorithm': state.get('algorithm') or "",
+        'genetic_code': state.get('genetic_code') or "Standard",
+        'score': float(state.get('alignment_score') or 0),
+        'n_variants': len(state['mutations']),
+        'exon_ranges': [list(r) for r in state.get('exon_ranges', ())],
+        'transcripts': [{'accession': t.accession, 'exons': t.exons, 'cds': t.cds, 'strand': t.strand, 'protein_id': t.protein_id} for t in state.get('transcripts', ())],
+        'trace_coverage': state.get('trace_coverage'),
+        'circular': bool(state.get('circular')),
+        'sections': table,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(PREAMBLE.size + len(header_bytes)) // SECTION_ALIGN) * SECTION_ALIGN
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=SESSION_EXTENSION)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(PREAMBLE.pack(SESSION_MAGIC, SESSION_VERSION, 0, len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in sections.items():
+                f.seek(data_start + table[name][0])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def read_header(buffer):
+    magic, version, _, header_length = PREAMBLE.unpack_from(buffer, 0)
+    if magic != SESSION_MAGIC:
+        raise ValueError("Not a MutAnalyzer session file")
+    if version != SESSION_VERSION:
+        raise ValueError(f"Unsupported session version {version}")
+    header = json.loads(bytes(buffer[PREAMBLE.size:PREAMBLE.size + header_length]).decode("utf-8"))
+    header['data_start'] = -(-(PREAMBLE.size + header_length) // SECTION_ALIGN) * SECTION_ALIGN
+    return header
+
+
+def decode_session(buffer):
+    # Arrays are zero-copy views of the mapped file; only the strings and
+    # mutation dicts handed back are materialised
+    header = read_header(buffer)
+    table = header['sections']
+
+    def section(name):
+        offset, dtype, count = table[name]
+        return np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=header['data_start'] + offset)
+
+    ref_seq = unpack_sequence(section('ref_2bit'), header['ref_length'], section('ref_exceptions'), section('ref_exception_bytes'))
+    if 'ops' in table:
+        aligned_ref, aligned_sample = apply_ops(ref_seq, section('ops'), section('op_lengths'), section('sample_bases'))
+    else:
+        aligned_ref = section('aligned_ref').tobytes().decode("ascii")
+        aligned_sample = section('aligned_sample').tobytes().decode("ascii")
+    sample_seq = section('sample').tobytes().decode("ascii") if 'sample' in table else aligned_sample.replace('-', '')
+    columns = {'position': section('position').tolist(), 'end': section('end').tolist()}
+    for name in STRING_COLUMNS + SCORE_COLUMNS:
+        columns[name] = read_string_column(section(f"{name}.codes"), section(f"{name}.offsets"), section(f"{name}.blob"))
+    for name in SCORE_COLUMNS:
+        columns[f"{name}.score"] = section(f"{name}.score").tolist()
+    extra = json.loads(section('extra').tobytes().decode("utf-8")) if 'extra' in table else None
+    mutations = []
+    for i in range(header['n_variants']):
+        mutation = {'position': columns['position'][i]}
+        if columns['end'][i] >= 0:
+            mutation['end'] = columns['end'][i]
+        for name in STRING_COLUMNS:
+            if columns[name][i] is not None:
+                mutation[name] = columns[name][i]
+        for name in SCORE_COLUMNS:
+            label, score = columns[name][i], columns[f"{name}.score"][i]
+            if label is not None:
+                mutation[name] = label if score != score else f"{label} ({score:.2f})"
+        if extra and extra[i]:
+            mutation.update(extra[i])
+        mutations.append(mutation)
+    return {
+        'header': header,
+        'ref_seq': ref_seq,
+        'sample_seq': sample_seq,
+        'aligned_ref': aligned_ref,
+        'aligned_sample': aligned_sample,
+        'mutations': mutations,
+        'transcripts': [Transcript(t['accession'], [tuple(e) for e in t['exons']], [tuple(c) for c in t['cds']], t['strand'], t['protein_id']) for t in header['transcripts']],
+        'exon_ranges': [tuple(r) for r in header['exon_ranges']],
+    }
+
+
+def read_session(path):
+    # Memory-maps the file; the views die with decode_session's frame, so
+    # the map can be closed straight after
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return decode_session(buffer)
+    finally:
+        buffer.close()
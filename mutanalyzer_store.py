@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from mutanalyzer_index import sequence_digest
+from mutanalyzer_transcripts import severity_rank
+
+STORE_VERSION = 2  # 2: lookups keyed on the reference sequence (refs.seq_digest, variants.ref_id)
+DEFAULT_DB_PATH = os.environ.get("MUTANALYZER_DB", os.path.join(os.path.expanduser("~"), ".mutanalyzer", "results.db"))
+
+# Columns of a mutation record that get their own SQL column; any other
+# keys (transcripts, depth, allele fraction, SV fields...) go into 'extra'
+VARIANT_FIELDS = ('position', 'end', 'type', 'ref', 'alt', 'region', 'effect', 'severity', 'frameshift', 'sift', 'polyphen', 'genotype')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS refs (
+    id INTEGER PRIMARY KEY,
+    digest TEXT NOT NULL UNIQUE,
+    gene TEXT NOT NULL,
+    accession TEXT,
+    length INTEGER NOT NULL,
+    sequence TEXT NOT NULL,
+    seq_digest TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    ref_id INTEGER NOT NULL REFERENCES refs(id),
+    algorithm TEXT,
+    genetic_code TEXT,
+    exon_ranges TEXT,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    sequence TEXT,
+    aligned_ref TEXT,
+    aligned_sample TEXT,
+    score REAL
+);
+CREATE TABLE IF NOT EXISTS variants (
+    id INTEGER PRIMARY KEY,
+    sample_id INTEGER NOT NULL REFERENCES samples(id) ON DELETE CASCADE,
+    ref_id INTEGER,
+    gene TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    end INTEGER,
+    type TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    alt TEXT NOT NULL,
+    region TEXT,
+    effect TEXT,
+    severity TEXT,
+    severity_rank INTEGER NOT NULL,
+    frameshift TEXT,
+    sift TEXT,
+    polyphen TEXT,
+    genotype TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS variants_gene_position ON variants (gene, position);
+CREATE INDEX IF NOT EXISTS variants_ref_position ON variants (ref_id, position);
+CREATE INDEX IF NOT EXISTS refs_seq_digest ON refs (seq_digest);
+CREATE INDEX IF NOT EXISTS variants_effect ON variants (effect);
+CREATE INDEX IF NOT EXISTS variants_severity ON variants (severity_rank);
+CREATE INDEX IF NOT EXISTS variants_sample ON variants (sample_id);
+CREATE INDEX IF NOT EXISTS samples_run ON samples (run_id);
+"""
+
+INSERT_VARIANT = f"""INSERT INTO variants (sample_id, ref_id, gene, {', '.join(VARIANT_FIELDS)}, severity_rank, extra)
+VALUES ({', '.join('?' * (len(VARIANT_FIELDS) + 5))})"""
+
+
+def variant_row(sample_id, ref_id, gene, mutation):
+    extra = {key: value for key, value in mutation.items() if key not in VARIANT_FIELDS}
+    return (sample_id, ref_id, gene) + tuple(mutation.get(field) for field in VARIANT_FIELDS) + (severity_rank(mutation.get('severity', "")), json.dumps(extra) if extra else None)
+
+
+def mutation_from_row(row):
+    # Inverse of variant_row: the original mutation dict
+    mutation = {field: row[field] for field in VARIANT_FIELDS if row[field] is not None}
+    if row['extra']:
+        mutation.update(json.loads(row['extra']))
+    return mutation
+
+
+class ResultsStore:
+    # Every analysis as runs -> samples -> variants in one SQLite file. WAL
+    # mode lets the GUI read past runs while a batch is writing; each run is
+    # written in a single transaction with executemany for the variants.
+    # One connection is shared across the GUI's worker threads behind a lock.
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_DB_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is not None and int(row['value']) == 1:
+                self.upgrade_from_v1()
+            elif row is not None and int(row['value']) != STORE_VERSION:
+                raise ValueError(f"Unsupported results database version {row['value']}")
+            self.conn.executescript(SCHEMA)
+            if row is None:
+                self.conn.execute("INSERT INTO meta VALUES ('version', ?)", (str(STORE_VERSION),))
+
+    def upgrade_from_v1(self):
+        # Version 1 variants only carried the gene text (empty for pasted
+        # references); add the reference columns and fill them in
+        self.conn.execute("ALTER TABLE refs ADD COLUMN seq_digest TEXT")
+        self.conn.execute("ALTER TABLE variants ADD COLUMN ref_id INTEGER")
+        for ref in self.conn.execute("SELECT id, sequence FROM refs").fetchall():
+            self.conn.execute("UPDATE refs SET seq_digest = ? WHERE id = ?", (sequence_digest(ref['sequence']), ref['id']))
+        self.conn.execute("""UPDATE variants SET ref_id = (SELECT runs.ref_id FROM samples JOIN runs ON samples.run_id = runs.id
+                                                  WHERE samples.id = variants.sample_id)""")
+        self.conn.execute("UPDATE meta SET value = ? WHERE key = 'version'", (str(STORE_VERSION),))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _ref_id(self, gene, accession, sequence):
+        # One row per (gene, accession, sequence), found by digest
+        digest = hashlib.sha1(f"{gene}\0{accession or ''}\0{sequence}".encode("ascii")).hexdigest()
+        row = self.conn.execute("SELECT id FROM refs WHERE digest = ?", (digest,)).fetchone()
+        if row:
+            return row['id']
+        return self.conn.execute("INSERT INTO refs (digest, gene, accession, length, sequence, seq_digest) VALUES (?, ?, ?, ?, ?, ?)",
+                                 (digest, gene, accession, len(sequence), sequence, sequence_digest(sequence))).lastrowid
+
+    def save_run(self, ref_seq, samples, gene="", accession=None, algorithm="", genetic_code="", exon_ranges=(), summary="", run_id=None):
+        # samples: dicts with name, mutations and optionally sequence,
+        # aligned_ref, aligned_sample, score. Passing run_id replaces that
+        # run's samples (e.g. after pathogenicity scoring). Returns run_id.
+        with self.lock, self.conn:
+            ref_id = self._ref_id(gene, accession, ref_seq)
+            created = datetime.now().isoformat(timespec='seconds')
+            params = (ref_id, algorithm, genetic_code, json.dumps([list(r) for r in exon_ranges]), summary)
+            if run_id is not None and self.conn.execute("SELECT 1 FROM runs WHERE id = ?", (run_id,)).fetchone():
+                self.conn.execute("UPDATE runs SET ref_id = ?, algorithm = ?, genetic_code = ?, exon_ranges = ?, summary = ? WHERE id = ?", params + (run_id,))
+                self.conn.execute("DELETE FROM samples WHERE run_id = ?", (run_id,))
+            else:
+                run_id = self.conn.execute("INSERT INTO runs (created, ref_id, algorithm, genetic_code, exon_ranges, summary) VALUES (?, ?, ?, ?, ?, ?)", (created,) + params).lastrowid
+            for sample in samples:
+                sample_id = self.conn.execute(
+                    "INSERT INTO samples (run_id, name, sequence, aligned_ref, aligned_sample, score) VALUES (?, ?, ?, ?, ?, ?)",
+                    (run_id, sample['name'], sample.get('sequence'), sample.get('aligned_ref'), sample.get('aligned_sample'), sample.get('score'))).lastrowid
+                self.conn.executemany(INSERT_VARIANT, [variant_row(sample_id, ref_id, gene, m) for m in sample['mutations']])
+        return run_id
+
+    def runs(self, limit=200):
+        # Newest first, with sample and variant counts for the run list
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT runs.id, runs.created, runs.algorithm, refs.gene, refs.accession, refs.length,
+                       (SELECT COUNT(*) FROM samples WHERE samples.run_id = runs.id) AS samples,
+                       (SELECT COUNT(*) FROM variants JOIN samples ON variants.sample_id = samples.id WHERE samples.run_id = runs.id) AS variants,
+                       (SELECT GROUP_CONCAT(name, ', ') FROM samples WHERE samples.run_id = runs.id) AS names
+                FROM runs JOIN refs ON runs.ref_id = refs.id
+                ORDER BY runs.id DESC LIMIT ?""", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_run(self, run_id):
+        with self.lock:
+            run = self.conn.execute("""
+                SELECT runs.*, refs.gene, refs.accession, refs.sequence AS ref_seq
+                FROM runs JOIN refs ON runs.ref_id = refs.id WHERE runs.id = ?""", (run_id,)).fetchone()
+            if run is None:
+                raise KeyError(f"No run {run_id} in {self.path}")
+            result = dict(run)
+            result['exon_ranges'] = [tuple(r) for r in json.loads(run['exon_ranges'] or "[]")]
+            result['samples'] = []
+            for sample in self.conn.execute("SELECT * FROM samples WHERE run_id = ? ORDER BY id", (run_id,)).fetchall():
+                entry = dict(sample)
+                entry['mutations'] = [mutation_from_row(row) for row in self.conn.execute("SELECT * FROM variants WHERE sample_id = ? ORDER BY position, id", (sample['id'],))]
+                result['samples'].append(entry)
+        return result
+
+    def seen(self, reference, position, ref=None, alt=None, limit=50):
+        # Earlier observations of a variant on the reference sequence with
+        # digest reference (sequence_digest), newest first, with the
+        # classification each run gave it. Gene names are not enough:
+        # pasted references all have an empty one.
+        query = """SELECT runs.id AS run_id, runs.created, samples.name AS sample, variants.*
+                   FROM variants JOIN samples ON variants.sample_id = samples.id JOIN runs ON samples.run_id = runs.id
+                   WHERE variants.ref_id IN (SELECT id FROM refs WHERE seq_digest = ?) AND variants.position = ?"""
+        params = [reference, position]
+        if ref is not None:
+            query += " AND variants.ref = ?"
+            params.append(ref)
+        if alt is not None:
+            query += " AND variants.alt = ?"
+            params.append(alt)
+        query += " ORDER BY runs.id DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(query, params).fetchall()]
+
+    def query(self, reference=None, gene=None, start=None, end=None, effect=None, min_severity=None, limit=1000):
+        # Variants across all runs by reference sequence digest, gene,
+        # position range, effect and severity. A position range means
+        # little without a reference.
+        clauses, params = [], []
+        if reference is not None:
+            clauses.append("variants.ref_id IN (SELECT id FROM refs WHERE seq_digest = ?)")
+            params.append(reference)
+        if gene is not None:
+            clauses.append("variants.gene = ?")
+            params.append(gene)
+        if start is not None:
+            clauses.append("variants.position >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("variants.position <= ?")
+            params.append(end)
+        if effect is not None:
+            clauses.append("variants.effect = ?")
+            params.append(effect)
+        if min_severity:
+            clauses.append("variants.severity_rank >= ?")
+            params.append(severity_rank(min_severity))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(f"""SELECT runs.id AS run_id, samples.name AS sample, variants.*
+                                         FROM variants JOIN samples ON variants.sample_id = samples.id JOIN runs ON samples.run_id = runs.id
+                                         {where} ORDER BY variants.gene, variants.position LIMIT ?""", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete_run(self, run_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+
+def seen_text(observations):
+    if not observations:
+        return "Not seen in any earlier run"
+    lines = [f"Seen {len(observations)} time(s):"]
+    for obs in observations:
+        genotype = f", {obs['genotype']}" if obs['genotype'] else ""
+        lines.append(f"   Run {obs['run_id']} ({obs['created']}) {obs['sample']}: {obs['effect']}, {obs['severity']}{genotype}")
+    return "\n".join(lines)
@@ -0,0 +1,185 @@
+from Bio import pairwise2
+from Bio.Seq import reverse_complement
+from bisect import bisect_right
+import numpy as np
+from mutanalyzer_index import DEFAULT_K as SEED_K, ReferenceIndex
+from mutanalyzer_normalize import normalize_alleles
+
+MIN_SEGMENT = 30
+MIN_SV_LENGTH = 50
+
+
+def find_anchors(ref_seq, sample_seq, k=SEED_K, index=None):
+    # Exact k-mer hits as (sample_pos, ref_pos, strand) arrays; strand 1 marks
+    # hits of the sample's reverse complement. A persistent ReferenceIndex
+    # is reused when given, otherwise a throwaway one is built in memory.
+    if index is None or index.k != k:
+        index = ReferenceIndex.build(ref_seq, k)
+    return index.anchors(sample_seq)
+
+
+def build_segments(anchors, k=SEED_K):
+    # Merge overlapping/adjacent anchors on the same diagonal into exact-match
+    # segments: (q_start, q_end, r_start, r_end, strand), half-open ranges.
+    q, r, strand = anchors
+    if not len(q):
+        return []
+    diag = np.where(strand == 0, r - q, r + q)
+    order = np.lexsort((q, diag, strand))
+    q, diag, strand = q[order], diag[order], strand[order]
+    new = np.ones(len(q), dtype=bool)
+    new[1:] = (strand[1:] != strand[:-1]) | (diag[1:] != diag[:-1]) | (q[1:] > q[:-1] + k)
+    starts = np.flatnonzero(new)
+    ends = np.append(starts[1:], len(q)) - 1
+    result = []
+    for first, last in zip(starts.tolist(), ends.tolist()):
+        q_start, q_end, d = int(q[first]), int(q[last]) + k, int(diag[first])
+        if strand[first] == 0:
+            result.append((q_start, q_end, d + q_start, d + q_end, '+'))
+        else:
+            result.append((q_start, q_end, d - q_end + k, d - q_start + k, '-'))
+    return result
+
+
+def select_chain(segments, min_length=MIN_SEGMENT, overlap=SEED_K):
+    # Weighted interval scheduling over sample coordinates: the set of
+    # non-overlapping segments covering the most sample bases. A seed that
+    # matches by chance across a breakpoint extends a segment by a few
+    # bases, so neighbours may overlap by up to `overlap` (split_align trims).
+    segments = sorted((s for s in segments if s[1] - s[0] >= min_length), key=lambda s: s[1])
+    ends = [s[1] for s in segments]
+    best = [0] * (len(segments) + 1)
+    take = [False] * len(segments)
+    for i, seg in enumerate(segments):
+        j = bisect_right(ends, seg[0] + overlap, 0, i)
+        with_seg = best[j] + (seg[1] - seg[0])
+        take[i] = with_seg > best[i]
+        best[i + 1] = max(best[i], with_seg)
+    chain = []
+    i = len(segments)
+    while i > 0:
+        if take[i - 1]:
+            seg = segments[i - 1]
+            chain.append(seg)
+            i = bisect_right(ends, seg[0] + overlap, 0, i - 1)
+        else:
+            i -= 1
+    return chain[::-1]
+
+
+def align_window(ref_part, sample_part, scoring):
+    if not ref_part and not sample_part:
+        return "", ""
+    if not sample_part:
+        return ref_part, '-' * len(ref_part)
+    if not ref_part:
+        return '-' * len(sample_part), sample_part
+    if ref_part == sample_part:
+        return ref_part, sample_part
+    match, mismatch, gap_open, gap_extend = scoring
+    alignment = pairwise2.align.globalms(ref_part, sample_part, match, mismatch, gap_open, gap_extend, one_alignment_only=True)[0]
+    return alignment.seqA, alignment.seqB
+
+
+def score_alignment(aligned_ref, aligned_sample, scoring):
+    match, mismatch, gap_open, gap_extend = scoring
+    score = 0
+    prev_gap = None
+    for a, b in zip(aligned_ref, aligned_sample):
+        if a == '-' or b == '-':
+            gap = 'ref' if a == '-' else 'sample'
+            score += gap_extend if gap == prev_gap else gap_open
+            prev_gap = gap
+        else:
+            score += match if a == b else mismatch
+            prev_gap = None
+    return score
+
+
+def merge_inverted(chain, min_sv=MIN_SV_LENGTH):
+    # SNVs inside an inversion split it into several '-' segments; fold runs
+    # of them on (nearly) the same anti-diagonal back into one block.
+    merged = []
+    for seg in chain:
+        if merged and seg[4] == '-' and merged[-1][4] == '-':
+            prev = merged[-1]
+            if abs((seg[3] + seg[0]) - (prev[3] + prev[0])) < min_sv:
+                merged[-1] = (prev[0], seg[1], min(prev[2], seg[2]), max(prev[3], seg[3]), '-')
+                continue
+        merged.append(seg)
+    return merged
+
+
+def split_align(ref_seq, sample_seq, scoring, k=SEED_K, min_sv=MIN_SV_LENGTH, index=None):
+    # Chains exact seeds along the sample, aligns only the short windows
+    # between them, and turns discordant jumps into single SV events instead
+    # of aligning through them. Inverted blocks are stitched in reference
+    # orientation so small variants inside them are still called.
+    # Returns (aligned_ref, aligned_sample, events) or None if unanchored.
+    chain = select_chain(build_segments(find_anchors(ref_seq, sample_seq, k, index), k), max(2 * k, MIN_SEGMENT), k)
+    if not chain:
+        return None
+    ref_parts, sample_parts, events = [], [], []
+    r_cur = q_cur = 0
+    backtracked = False
+
+    def emit(ref_part, sample_part):
+        ref_parts.append(ref_part)
+        sample_parts.append(sample_part)
+
+    for q_start, q_end, r_start, r_end, strand in merge_inverted(chain, min_sv):
+        if q_start < q_cur:
+            if strand == '+':
+                r_start += q_cur - q_start
+            else:
+                r_end -= q_cur - q_start
+            q_start = q_cur
+        if strand == '-':
+            if r_start < r_cur:
+                # Chance seed overlap at the left breakpoint: the sample end
+                # of an inverted block maps to its reference start
+                q_end -= r_cur - r_start
+                r_start = r_cur
+            if q_end <= q_start:
+                continue
+            emit(*align_window(ref_seq[r_cur:r_start], sample_seq[q_cur:q_start], scoring))
+            emit(*align_window(ref_seq[r_start:r_end], reverse_complement(sample_seq[q_start:q_end]), scoring))
+            if r_end - r_start >= min_sv:
+                events.append({'sv_type': 'INV', 'start': r_start + 1, 'end': r_end, 'length': r_end - r_start, 'position': r_start + 1, 'walk': None})
+            r_cur, q_cur = r_end, q_end
+            backtracked = False
+            continue
+        if r_start < r_cur:
+            # Reference bases already placed are being read again: a tandem
+            # duplication (or repeat); keep only the part past the cursor.
+            skip = r_cur - r_start
+            backtracked = skip > k
+            q_start += skip
+            r_start += skip
+        if q_end <= q_start:
+            continue
+        shift = (q_start - q_cur) - (r_start - r_cur)
+        if shift >= min_sv:
+            sv_type = 'DUP' if backtracked else 'INS'
+            emit('-' * shift, sample_seq[q_cur:q_cur + shift])
+            # A duplication is reported at the start of the copied interval,
+            # an insertion after the base it follows once left-aligned, like
+            # every other indel call
+            if sv_type == 'DUP':
+                start = max(1, r_cur - shift + 1)
+            else:
+                start = normalize_alleles(ref_seq, r_cur + 1, '-', sample_seq[q_cur:q_cur + shift])[0]
+            events.append({'sv_type': sv_type, 'start': max(1, start), 'end': r_cur if sv_type == 'DUP' else start, 'length': shift, 'position': start, 'walk': (r_cur, 'Insertion')})
+            q_cur += shift
+        elif shift <= -min_sv:
+            del_length = -shift
+            emit(ref_seq[r_cur:r_cur + del_length], '-' * del_length)
+            start = normalize_alleles(ref_seq, r_cur + 1, ref_seq[r_cur:r_cur + del_length], '-')[0]
+            events.append({'sv_type': 'DEL', 'start': start, 'end': start + del_length - 1, 'length': del_length, 'position': start, 'walk': (r_cur + 1, 'Deletion')})
+            r_cur += del_length
+        emit(*align_window(ref_seq[r_cur:r_start], sample_seq[q_cur:q_start], scoring))
+        emit(ref_seq[r_start:r_end], sample_seq[q_start:q_end])
+        r_cur, q_cur = r_end, q_end
+        backtracked = False
+    emit(*align_window(ref_seq[r_cur:], sample_seq[q_cur:], scoring))
+    return "".join(ref_parts), "".join(sample_parts), events
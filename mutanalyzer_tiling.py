@@ -0,0 +1,267 @@
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from Bio.Align import PairwiseAligner
+from Bio.Seq import reverse_complement
+
+from mutanalyzer_index import DEFAULT_K, ReferenceIndex
+from mutanalyzer_normalize import normalize_alleles
+from mutanalyzer_sanger import genotype_alleles
+from mutanalyzer_ungapped import mismatch_positions
+
+MIN_HIT_FRACTION = 0.5  # A hit must score at least this share of a perfect match
+MIN_SEED_VOTES = 2  # Seeds on one diagonal before it is worth aligning
+MAX_HITS = 4  # Non-overlapping hits kept per amplicon (paralogs, repeats)
+MAX_CANDIDATES = 32  # Diagonals tried per amplicon, most votes first
+BAND = 16  # Extra reference bases either side of a candidate diagonal
+CHUNK_AMPLICONS = 64
+
+
+def read_amplicons(text):
+    # (name, sequence) per multi-FASTA record; headerless text is one amplicon
+    records = []
+    for line in text.strip().split('\n'):
+        line = line.strip()
+        if line.startswith('>'):
+            header = line[1:].split()
+            records.append([header[0] if header else f"amplicon{len(records) + 1}", []])
+        elif line:
+            if not records:
+                records.append(["amplicon1", []])
+            records[-1][1].append(line.upper())
+    return [(name, "".join(parts)) for name, parts in records if parts]
+
+
+def clip_ends(n, mismatches, scoring):
+    # Best-scoring [first, last) of an ungapped hit, as a local alignment
+    # would clip it: an end is dropped unless it scores above zero, so
+    # bases misplaced by an indel close to either end are not called as
+    # SNVs. mismatches are sorted 0-based columns.
+    match, mismatch = scoring[0], scoring[1]
+
+    def prefix(i, before):
+        return (i - before) * match + before * mismatch
+
+    first, low = 0, 0
+    for j, column in enumerate(mismatches):
+        score = prefix(column + 1, j + 1)
+        if score <= low:
+            first, low = column + 1, score
+    last, high = n, prefix(n, len(mismatches))
+    for j in range(len(mismatches) - 1, -1, -1):
+        if mismatches[j] < first:
+            break
+        score = prefix(mismatches[j], j)
+        if score >= high:
+            last, high = mismatches[j], score
+    return first, last, high - low
+
+
+def align_hit(ref_seq, seq, diag, scoring):
+    # Local alignment of seq around one diagonal: ungapped when it fits with
+    # few mismatches (ends clipped as Smith-Waterman would), otherwise
+    # Smith-Waterman over a banded window only (PairwiseAligner: its C
+    # traceback is ~10x pairwise2's on a window).
+    # Returns (0-based ref start, aligned ref, aligned seq, score) or None.
+    n = len(seq)
+    length = len(ref_seq)
+    if 0 <= diag <= length - n:
+        window = ref_seq[diag:diag + n]
+        mismatches = mismatch_positions(window, seq).tolist()
+        if len(mismatches) <= max(2, n // 20):
+            first, last, score = clip_ends(n, mismatches, scoring)
+            if last > first:
+                return diag + first, window[first:last], seq[first:last], score
+            return None
+    start = max(0, diag - BAND)
+    window = ref_seq[start:min(length, diag + n + BAND)]
+    if not window:
+        return None
+    aligner = PairwiseAligner()
+    aligner.mode = 'local'
+    aligner.match_score, aligner.mismatch_score, aligner.open_gap_score, aligner.extend_gap_score = scoring
+    alignments = aligner.align(window, seq)
+    if not alignments.score > 0:
+        return None
+    alignment = alignments[0]
+    return start + int(alignment.coordinates[0, 0]), alignment[0], alignment[1], alignments.score
+
+
+def find_hits(index, ref_seq, name, seq, scoring, min_score=None, max_hits=MAX_HITS):
+    # All non-overlapping local hits of one amplicon above min_score. Seed
+    # votes rank the (strand, diagonal) candidates, so only a band around
+    # each candidate is ever aligned; diagonals within BAND of one already
+    # tried are the same hit shifted by an indel.
+    q, r, strand = index.anchors(seq)
+    if not len(q):
+        return []
+    min_score = MIN_HIT_FRACTION * len(seq) * scoring[0] if min_score is None else min_score
+    diag = np.where(strand == 0, r - q, r - (len(seq) - index.k - q))
+    keys, votes = np.unique(np.stack([strand.astype(np.int64), diag]), axis=1, return_counts=True)
+    order = np.argsort(-votes, kind='stable')[:MAX_CANDIDATES]
+    hits, tried = [], []
+    for j in order.tolist():
+        if votes[j] < MIN_SEED_VOTES:
+            break
+        hit_strand, hit_diag = keys[:, j].tolist()
+        if any(hit_strand == s and abs(hit_diag - d) <= BAND for s, d in tried):
+            continue
+        tried.append((hit_strand, hit_diag))
+        aligned = align_hit(ref_seq, seq if hit_strand == 0 else reverse_complement(seq), hit_diag, scoring)
+        if aligned is None or aligned[3] < min_score:
+            continue
+        start, aligned_ref, aligned_sample, score = aligned
+        end = start + len(aligned_ref) - aligned_ref.count('-')
+        if any(start < hit['end'] and hit['start'] <= end for hit in hits):
+            continue
+        hits.append({'amplicon': name, 'strand': '+' if hit_strand == 0 else '-', 'start': start + 1, 'end': end,
+                     'score': score, 'aligned_ref': aligned_ref, 'aligned_sample': aligned_sample})
+        if len(hits) >= max_hits:
+            break
+    return hits
+
+
+class Tiling:
+    # Hits of many amplicons on one reference, with per-base coverage (hits
+    # spanning each base) and the variant events each hit shows, keyed like
+    # Pileup's so calls from overlapping amplicons merge and count.
+    def __init__(self, ref_seq):
+        self.ref_seq = ref_seq
+        self.length = len(ref_seq)
+        self.coverage = np.zeros(self.length, dtype=np.int64)
+        self.hits = []
+        self.amplicons = 0
+        self.placed = 0  # Amplicons with at least one hit
+        self.snvs = defaultdict(Counter)  # 1-based position -> sample base -> hits
+        self.insertions = Counter()  # (1-based base before, inserted seq) -> hits
+        self.deletions = Counter()  # (1-based first deleted base, deleted seq) -> hits
+
+    def add_hit(self, hit):
+        self.hits.append(hit)
+        self.coverage[hit['start'] - 1:hit['end']] += 1
+        aligned_ref, aligned_sample = hit['aligned_ref'], hit['aligned_sample']
+        ref_pos = hit['start'] - 1  # Reference bases consumed so far
+        i = 0
+        while i < len(aligned_ref):
+            ref_base, alt_base = aligned_ref[i], aligned_sample[i]
+            if ref_base != '-' and alt_base != '-':
+                ref_pos += 1
+                if ref_base != alt_base:
+                    self.snvs[ref_pos][alt_base] += 1
+                i += 1
+                continue
+            run = i
+            if alt_base == '-':
+                while run < len(aligned_ref) and aligned_sample[run] == '-' and aligned_ref[run] != '-':
+                    run += 1
+                position, deleted, _, _ = normalize_alleles(self.ref_seq, ref_pos + 1, aligned_ref[i:run], '-')
+                self.deletions[(position, deleted)] += 1
+                ref_pos += run - i
+            else:
+                while run < len(aligned_ref) and aligned_ref[run] == '-':
+                    run += 1
+                position, _, inserted, _ = normalize_alleles(self.ref_seq, ref_pos + 1, '-', aligned_sample[i:run])
+                self.insertions[(position, inserted)] += 1
+            i = run
+
+    def events(self):
+        # Distinct (type, position, ref, alt) over all hits; SNV alts may be
+        # IUPAC codes, split into alleles by the caller
+        for position in sorted(self.snvs):
+            for alt in sorted(self.snvs[position]):
+                yield 'SNP', position, self.ref_seq[position - 1], alt
+        for position, deleted in sorted(self.deletions):
+            yield 'Deletion', position, deleted, '-'
+        for position, inserted in sorted(self.insertions):
+            yield 'Insertion', position, '-', inserted
+
+    def support(self, mutation):
+        # (depth, supporting hits): hits covering the variant and hits showing it
+        position, mut_type = mutation['position'], mutation['type']
+        if mut_type == 'Insertion':
+            return int(self.coverage[position - 1]) if 0 < position <= self.length else 0, self.insertions.get((position, mutation['alt']), 0)
+        if mut_type == 'Deletion':
+            return int(self.coverage[position - 1]), self.deletions.get((position, mutation['ref']), 0)
+        spans = range(position, position + len(mutation['alt']))
+        carriers = [sum(count for code, count in self.snvs.get(p, {}).items() if alt in genotype_alleles(self.ref_seq[p - 1], code)[0])
+                    for p, alt in zip(spans, mutation['alt'])]
+        return int(self.coverage[position - 1:spans[-1]].min()), min(carriers)
+
+    def gaps(self):
+        # Uncovered 1-based (start, end) ranges of the reference
+        uncovered = np.concatenate([[0], (self.coverage == 0).astype(np.int8), [0]])
+        edges = np.flatnonzero(np.diff(uncovered))
+        return [(int(start) + 1, int(end)) for start, end in zip(edges[::2], edges[1::2])]
+
+    def stitch(self):
+        # One reference-length alignment for display and protein views: hits
+        # in reference order, each clipped to start after the previous one,
+        # with uncovered stretches read as reference
+        ref_parts, sample_parts = [], []
+        cursor = 0  # Reference bases emitted so far
+        for hit in sorted(self.hits, key=lambda h: (h['start'], h['end'])):
+            if hit['end'] <= cursor:
+                continue
+            if hit['start'] - 1 > cursor:
+                ref_parts.append(self.ref_seq[cursor:hit['start'] - 1])
+                sample_parts.append(self.ref_seq[cursor:hit['start'] - 1])
+                cursor = hit['start'] - 1
+            ref_pos = hit['start'] - 1
+            for ref_base, alt_base in zip(hit['aligned_ref'], hit['aligned_sample']):
+                if ref_base != '-':
+                    ref_pos += 1
+                    if ref_pos <= cursor:
+                        continue
+                elif ref_pos <= cursor:
+                    continue
+                ref_parts.append(ref_base)
+                sample_parts.append(alt_base)
+            cursor = hit['end']
+        ref_parts.append(self.ref_seq[cursor:])
+        sample_parts.append(self.ref_seq[cursor:])
+        return "".join(ref_parts), "".join(sample_parts)
+
+
+# Worker-side state, as in mutanalyzer_pileup: one index per pool process
+_WORKER = {}
+
+
+def init_worker(ref_seq, index_dir=None, scoring=None, min_score=None):
+    ref_seq = ref_seq.upper()
+    index = ReferenceIndex.load(index_dir) if index_dir else ReferenceIndex.build(ref_seq, DEFAULT_K)
+    _WORKER.update(ref_seq=ref_seq, index=index, scoring=scoring, min_score=min_score)
+
+
+def place_chunk(amplicons):
+    return [find_hits(_WORKER['index'], _WORKER['ref_seq'], name, seq, _WORKER['scoring'], _WORKER['min_score']) for name, seq in amplicons]
+
+
+def tile_amplicons(amplicons, ref_seq, scoring, workers=None, index_dir=None, min_score=None, progress=None):
+    # Places every (name, sequence) amplicon on the reference, CHUNK_AMPLICONS
+    # per task across a process pool, and merges all hits into one Tiling
+    tiling = Tiling(ref_seq)
+    workers = workers or os.cpu_count() or 1
+    chunks = [amplicons[i:i + CHUNK_AMPLICONS] for i in range(0, len(amplicons), CHUNK_AMPLICONS)]
+    init_args = (ref_seq, index_dir, scoring, min_score)
+
+    def merge(chunk_hits):
+        for hits in chunk_hits:
+            tiling.amplicons += 1
+            tiling.placed += bool(hits)
+            for hit in hits:
+                tiling.add_hit(hit)
+        if progress:
+            progress(tiling.amplicons)
+
+    if workers == 1 or len(chunks) == 1:
+        init_worker(*init_args)
+        for chunk in chunks:
+            merge(place_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=init_worker, initargs=init_args) as pool:
+            for future in as_completed([pool.submit(place_chunk, chunk) for chunk in chunks]):
+                merge(future.result())
+    tiling.hits.sort(key=lambda hit: (hit['start'], hit['end'], hit['amplicon']))
+    return tiling
@@ -0,0 +1,290 @@
+from bisect import bisect_right
+
+SEVERITY_RANK = {"🔴": 4, "🟠": 3, "🟢": 2, "⚪": 1}
+COMPLEMENT = str.maketrans("ACGTRYKMSWBDHVN", "TGCAYRMKSWVHDBN")
+SPLICE_WINDOW = 2  # Intronic bases next to an exon treated as the splice site
+TRANSCRIPT_FEATURES = ("mRNA", "ncRNA", "misc_RNA", "transcript")
+
+
+def severity_rank(severity):
+    return SEVERITY_RANK.get(severity[:1], 0)
+
+
+def translate(dna, table=1):
+    # Bio.Seq and its codon tables load on the first translation, not at import
+    from Bio.Seq import Seq
+    return str(Seq(dna).translate(table=table))
+
+
+def merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class Transcript:
+    def __init__(self, accession, exons, cds=None, strand=1, protein_id=None):
+        self.accession = accession
+        self.exons = sorted(exons)
+        self.cds = sorted(cds or [])
+        self.strand = strand
+        self.protein_id = protein_id
+        self.start = self.exons[0][0]
+        self.end = self.exons[-1][1]
+        self.introns = [(a[1] + 1, b[0] - 1) for a, b in zip(self.exons, self.exons[1:]) if a[1] + 1 <= b[0] - 1]
+        # Cumulative CDS lengths (genomic order) for O(log n) offset lookups
+        self.cds_starts = [start for start, _ in self.cds]
+        self.cds_cumulative = [0]
+        for start, end in self.cds:
+            self.cds_cumulative.append(self.cds_cumulative[-1] + end - start + 1)
+
+    @property
+    def cds_length(self):
+        return self.cds_cumulative[-1]
+
+    def exon_number(self, index):
+        return index + 1 if self.strand == 1 else len(self.exons) - index
+
+    def intron_number(self, index):
+        return index + 1 if self.strand == 1 else len(self.introns) - index
+
+    def cds_offset(self, position):
+        # 0-based offset of a genomic position in the CDS, in transcript order
+        i = bisect_right(self.cds_starts, position) - 1
+        if i < 0 or position > self.cds[i][1]:
+            return None
+        offset = self.cds_cumulative[i] + position - self.cds[i][0]
+        return offset if self.strand == 1 else self.cds_length - 1 - offset
+
+    def cds_position(self, offset):
+        if self.strand == -1:
+            offset = self.cds_length - 1 - offset
+        i = bisect_right(self.cds_cumulative, offset) - 1
+        return self.cds[i][0] + offset - self.cds_cumulative[i]
+
+    def codon(self, ref_seq, codon_index, substitutions=None):
+        positions = [self.cds_position(codon_index * 3 + k) for k in range(3)]
+        bases = [(substitutions or {}).get(p, ref_seq[p - 1] if 0 < p <= len(ref_seq) else 'N') for p in positions]
+        codon = "".join(bases)
+        # cds_position already walks a minus-strand CDS in transcript order,
+        # so its bases only need complementing
+        return codon.translate(COMPLEMENT) if self.strand == -1 else codon
+
+
+def _parts(location):
+    return sorted((int(part.start) + 1, int(part.end)) for part in location.parts)
+
+
+def transcripts_from_record(record):
+    # One model per mRNA/ncRNA feature (RefSeqGene NG_ records carry every
+    # isoform); CDS features are paired with the transcript that contains
+    # them exon-for-exon. Records without transcript features fall back to
+    # a single model built from exon (or CDS) features.
+    rna_features = [f for f in record.features if f.type in TRANSCRIPT_FEATURES]
+    cds_features = [f for f in record.features if f.type == "CDS"]
+    transcripts = []
+    used_cds = set()
+    for n, feature in enumerate(rna_features, 1):
+        exons = _parts(feature.location)
+        accession = feature.qualifiers.get("transcript_id", [f"{record.id}.t{n}"])[0]
+        strand = feature.location.strand or 1
+        cds_parts, protein_id = None, None
+        for i, cds in enumerate(cds_features):
+            if i in used_cds or (cds.location.strand or 1) != strand:
+                continue
+            parts = _parts(cds.location)
+            if all(any(es <= s and e <= ee for es, ee in exons) for s, e in parts) and _cds_fits(exons, parts):
+                cds_parts = parts
+                protein_id = cds.qualifiers.get("protein_id", [None])[0]
+                used_cds.add(i)
+                break
+        transcripts.append(Transcript(accession, exons, cds_parts, strand, protein_id))
+    if transcripts:
+        return transcripts
+    exons = [(int(f.location.start) + 1, int(f.location.end)) for f in record.features if f.type == "exon"]
+    cds = [part for f in cds_features for part in _parts(f.location)]
+    if not exons:
+        exons = list(cds)
+    if not exons:
+        return []
+    strand = next((f.location.strand for f in record.features if f.type in ("exon", "CDS") and f.location.strand), 1)
+    return [Transcript(record.id, merge_ranges(exons), merge_ranges(cds) if cds else None, strand)]
+
+
+def _cds_fits(exons, cds_parts):
+    # Internal CDS boundaries must coincide with exon boundaries
+    if len(cds_parts) == 1:
+        return True
+    ends = {e for _, e in exons}
+    starts = {s for s, _ in exons}
+    return all(e in ends for _, e in cds_parts[:-1]) and all(s in starts for s, _ in cds_parts[1:])
+
+
+class TranscriptIndex:
+    # Elementary-interval index shared by all transcripts: the breakpoints of
+    # every exon and intron split the locus into intervals, each holding the
+    # (transcript, feature, number) tuples that cover it. One bisect per
+    # variant answers "which features of which isoforms does this hit".
+    def __init__(self, transcripts):
+        self.transcripts = transcripts
+        features = []
+        for t_index, transcript in enumerate(transcripts):
+            for i, (start, end) in enumerate(transcript.exons):
+                features.append((start, end, (t_index, "Exon", transcript.exon_number(i))))
+            for i, (start, end) in enumerate(transcript.introns):
+                features.append((start, end, (t_index, "Intron", transcript.intron_number(i))))
+        bounds = sorted({start for start, _, _ in features} | {end + 1 for _, end, _ in features})
+        self.bounds = bounds
+        self.cover = [[] for _ in bounds]
+        for start, end, payload in features:
+            for i in range(bisect_right(bounds, start) - 1, bisect_right(bounds, end)):
+                self.cover[i].append(payload)
+
+    def lookup(self, position):
+        i = bisect_right(self.bounds, position) - 1
+        return self.cover[i] if 0 <= i < len(self.cover) else []
+
+    def overlapping(self, start, end):
+        # Every (transcript, feature, number) touching [start, end]
+        hits = set()
+        first = max(0, bisect_right(self.bounds, start) - 1)
+        for i in range(first, bisect_right(self.bounds, end)):
+            hits.update(self.cover[i])
+        return sorted(hits)
+
+
+def annotate_consequence(transcript, feature, number, mutation, ref_seq, table):
+    # Consequence of one variant on one transcript, as a small dict
+    position = mutation['position']
+    mut_type = mutation['type']
+    result = {'transcript': transcript.accession, 'feature': f"{feature} {number}", 'frameshift': "No"}
+    if 'end' in mutation:
+        exonic = sum(min(e, mutation['end']) - max(s, position) + 1 for s, e in transcript.exons if s <= mutation['end'] and position <= e)
+        if exonic:
+            result.update(effect=mutation['effect'].split(" (")[0], severity="🔴 High")
+            if mut_type != 'Inversion' and exonic % 3:
+                result['frameshift'] = "Yes"
+        else:
+            result.update(effect="Intronic", severity="⚪ Minimal")
+        return result
+    if mut_type == 'Deletion':
+        end = position + len(mutation['ref']) - 1
+        if any(position < s <= end or position <= e < end for s, e in transcript.exons):
+            result.update(effect="Splice site", severity="🔴 High", frameshift="Yes" if len(mutation['ref']) % 3 else "No")
+            return result
+    if feature == "Intron":
+        near_exon = any(abs(position - s) <= SPLICE_WINDOW or abs(position - e) <= SPLICE_WINDOW for s, e in transcript.exons)
+        if near_exon:
+            result.update(effect="Splice site", severity="🔴 High")
+        else:
+            result.update(effect="Intronic", severity="⚪ Minimal")
+        return result
+    offset = transcript.cds_offset(position)
+    if offset is None:
+        if not transcript.cds:
+            result.update(effect="Non-coding exon", severity="🟢 Low")
+        else:
+            upstream = (position < transcript.cds[0][0]) == (transcript.strand == 1)
+            result.update(effect="5' UTR" if upstream else "3' UTR", severity="🟢 Low")
+        return result
+    result['cds_position'] = offset + 1
+    if mut_type == 'SNP':
+        codon_index = offset // 3
+        ref_codon = transcript.codon(ref_seq, codon_index)
+        alt_codon = transcript.codon(ref_seq, codon_index, {position: mutation['alt']})
+        ref_aa = translate(ref_codon, table)
+        alt_aa = translate(alt_codon, table)
+        result['protein_change'] = f"{ref_aa}{codon_index + 1}{alt_aa}"
+        if ref_aa == alt_aa:
+            result.update(effect="Silent", severity="🟢 Low")
+        elif alt_aa == '*':
+            result.update(effect="Nonsense", severity="🔴 High")
+        elif ref_aa == '*':
+            result.update(effect="Stop lost", severity="🔴 High")
+        elif codon_index == 0 and ref_aa == 'M':
+            result.update(effect="Start lost", severity="🔴 High")
+        else:
+            result.update(effect="Missense", severity="🟠 Medium")
+        return result
+    if mut_type == 'MNV':
+        last = transcript.cds_offset(position + len(mutation['ref']) - 1)
+        if last is None:
+            result.update(effect="Coding boundary", severity="🟠 Medium")
+            return result
+        substitutions = {position + i: base for i, base in enumerate(mutation['alt'])}
+        changes = []
+        effects = set()
+        for codon_index in range(min(offset, last) // 3, max(offset, last) // 3 + 1):
+            ref_aa = translate(transcript.codon(ref_seq, codon_index), table)
+            alt_aa = translate(transcript.codon(ref_seq, codon_index, substitutions), table)
+            if ref_aa != alt_aa:
+                changes.append(f"{ref_aa}{codon_index + 1}{alt_aa}")
+                effects.add("Nonsense" if alt_aa == '*' else "Missense")
+        if "Nonsense" in effects:
+            result.update(effect="Nonsense", severity="🔴 High")
+        elif effects:
+            result.update(effect="Missense", severity="🟠 Medium")
+        else:
+            result.update(effect="Silent", severity="🟢 Low")
+        if changes:
+            result['protein_change'] = ",".join(changes)
+        return result
+    length = len(mutation['ref'] if mut_type == 'Deletion' else mutation['alt'])
+    kind = "deletion" if mut_type == 'Deletion' else "insertion"
+    if length % 3:
+        result.update(effect=f"Frameshift {kind}", severity="🔴 High", frameshift="Yes")
+    else:
+        result.update(effect=f"In-frame {kind}", severity="🟠 Medium")
+    return result
+
+
+def consequence_key(reference, transcript, table, mutation):
+    # Memo key of one (normalized) variant on one transcript
+    return f"{reference}|{transcript.accession}|{table}|{mutation['type']}|{mutation['position']}|{mutation.get('end', '')}|{mutation['ref']}|{mutation['alt']}"
+
+
+def annotate_all(index, mutations, ref_seq, table, memo=None, reference=""):
+    # Single pass over the variants; each one is looked up once in the shared
+    # index and scored against every isoform it touches. With a memo (see
+    # mutanalyzer_memo), consequences already worked out for the same
+    # reference, transcript, code and variant are reused.
+    touched = []
+    for mutation in mutations:
+        end = mutation.get('end', mutation['position'])
+        if mutation['type'] in ('Deletion', 'MNV') and 'end' not in mutation:
+            end = mutation['position'] + len(mutation['ref']) - 1
+        hits = index.lookup(mutation['position']) if end == mutation['position'] else index.overlapping(mutation['position'], end)
+        seen = set()
+        unique = []
+        for t_index, feature, number in hits:
+            if t_index not in seen:
+                seen.add(t_index)
+                unique.append((t_index, feature, number))
+        touched.append(unique)
+    keys = [[consequence_key(reference, index.transcripts[t], table, mutation) for t, _, _ in unique] for mutation, unique in zip(mutations, touched)] if memo else None
+    known = memo.get_many([key for row in keys for key in row]) if memo else {}
+    for i, (mutation, unique) in enumerate(zip(mutations, touched)):
+        consequences = []
+        for j, (t_index, feature, number) in enumerate(unique):
+            consequence = known.get(keys[i][j]) if memo else None
+            if consequence is None:
+                consequence = annotate_consequence(index.transcripts[t_index], feature, number, mutation, ref_seq, table)
+                if memo:
+                    memo.put(keys[i][j], consequence)
+            consequences.append(dict(consequence))
+        mutation['transcripts'] = consequences
+        if not consequences:
+            continue
+        worst = max(consequences, key=lambda c: severity_rank(c['severity']))
+        mutation['transcript'] = worst['transcript']
+        mutation['region'] = worst['feature'].split()[0]
+        mutation['effect'] = worst['effect']
+        mutation['severity'] = worst['severity']
+        mutation['frameshift'] = worst['frameshift']
+        if 'protein_change' in worst:
+            mutation['protein_change'] = worst['protein_change']
+    return mutations
@@ -0,0 +1,77 @@
+import numpy as np
+
+MAX_UNGAPPED_DIVERGENCE = 0.05  # Above this mismatch density always run DP
+
+
+def mismatch_positions(ref_seq, sample_seq):
+    # 0-based columns where two equal-length sequences differ
+    ref = np.frombuffer(ref_seq.encode("ascii"), dtype=np.uint8)
+    sample = np.frombuffer(sample_seq.encode("ascii"), dtype=np.uint8)
+    return np.flatnonzero(ref != sample)
+
+
+def indels_cheaper(ref_seq, sample_seq, mismatches):
+    # Whether an alignment with gaps costs less than the len(mismatches)
+    # substitutions of the plain one (edit distance < Hamming distance), for
+    # equal-length sequences. Ukkonen band: a cheaper path must return to
+    # the main diagonal, so it strays at most (H - 1) // 2 from it. Rows
+    # are computed with NumPy over the band only; between mismatches, once
+    # every live off-diagonal cell is just its distance from the diagonal
+    # above the diagonal's cost, the rows are skipped unchanged. Returns as
+    # soon as a bound settles it.
+    limit = len(mismatches)
+    width = (limit - 1) // 2
+    n = len(ref_seq)
+    if width < 1:
+        return False  # Equal lengths need two gaps to beat one substitution
+    ref = np.frombuffer(ref_seq.encode("ascii"), dtype=np.uint8)
+    sample = np.frombuffer(sample_seq.encode("ascii"), dtype=np.uint8)
+    padded = np.concatenate([np.zeros(width, dtype=np.uint8), sample, np.zeros(width + 1, dtype=np.uint8)])
+    offsets = np.arange(-width, width + 1)
+    distance = np.abs(offsets)
+    # Row 0: j sample bases against no reference bases cost j. A cell whose
+    # cost plus the gaps back to the diagonal reaches the limit can never
+    # lead below it, so it is held at the limit (dead).
+    row = np.where((offsets >= 0) & (2 * offsets < limit), offsets, limit).astype(np.int64)
+    columns = mismatches.tolist()
+    next_mismatch = 0
+    i = 0
+    while i < n:
+        i += 1
+        # Cell t of row i is i reference bases against i + t sample bases
+        cost = (padded[i - 1:i - 1 + 2 * width + 1] != ref[i - 1]).astype(np.int64)
+        step = np.minimum(row + cost, np.append(row[1:] + 1, limit))
+        row = np.minimum.accumulate(step - offsets) + offsets
+        j = offsets + i
+        row[(j < 0) | (j > n) | (row + distance >= limit)] = limit
+        if row.min() >= limit:
+            return False
+        while next_mismatch < len(columns) and columns[next_mismatch] < i:
+            next_mismatch += 1
+        if row[width] + len(columns) - next_mismatch < limit:
+            return True  # Current cost plus the plain alignment of the rest
+        if i < n - width and np.array_equal(row, np.where(row[width] + 2 * distance >= limit, limit, row[width] + distance)):
+            # Settled: unchanged over main-diagonal matches
+            target = columns[next_mismatch] if next_mismatch < len(columns) else n
+            i = max(i, min(target, n - width - 1))
+    return row[width] < limit
+
+
+def ungapped_mismatches(ref_seq, sample_seq, max_divergence=MAX_UNGAPPED_DIVERGENCE):
+    # Triage before DP: same-length samples whose mismatch density is low and
+    # whose edit distance equals the Hamming distance (no indel explains the
+    # differences more cheaply) are aligned column-for-column. Returns the
+    # mismatch columns, or None when a gapped alignment is needed.
+    if len(ref_seq) != len(sample_seq) or not ref_seq:
+        return None
+    mismatches = mismatch_positions(ref_seq, sample_seq)
+    if len(mismatches) > max_divergence * len(ref_seq):
+        return None
+    if len(mismatches) and indels_cheaper(ref_seq, sample_seq, mismatches):
+        return None
+    return mismatches
+
+
+def ungapped_score(length, mismatches, scoring):
+    match, mismatch = scoring[0], scoring[1]
+    return (length - mismatches) * match + mismatches * mismatch
@@ -0,0 +1,30 @@
+import os
+import random
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the index cache, annotation memo and results database of a test run
+# out of the user's own (the defaults are read at import time, and an
+# exported MUTANALYZER_* variable must not point the tests at real data)
+_CACHE = tempfile.mkdtemp(prefix="mutanalyzer-tests-")
+os.environ["MUTANALYZER_INDEX_DIR"] = os.path.join(_CACHE, "index")
+os.environ["MUTANALYZER_MEMO"] = os.path.join(_CACHE, "annotations.db")
+os.environ["MUTANALYZER_DB"] = os.path.join(_CACHE, "results.db")
+
+
+def random_dna(length, seed=0):
+    rng = random.Random(seed)
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+@pytest.fixture
+def engine():
+    from mutanalyzer_engine import MutationEngine
+    engine = MutationEngine()
+    engine.workers = 1
+    engine.use_memo = False
+    return engine
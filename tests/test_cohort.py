@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from mutanalyzer_cohort import Cohort
+
+MISSENSE = {'position': 120, 'type': 'SNP', 'ref': 'C', 'alt': 'T', 'region': 'Exon', 'effect': "Missense", 'severity': "🟠 Medium"}
+SILENT = {'position': 300, 'type': 'SNP', 'ref': 'G', 'alt': 'A', 'region': 'Exon', 'effect': "Silent", 'severity': "🟢 Low"}
+INTRONIC = {'position': 500, 'type': 'Deletion', 'ref': 'AT', 'alt': '-', 'region': 'Intron', 'effect': "Intronic", 'severity': "⚪ Minimal"}
+EXONS = [(100, 400), (600, 800)]
+
+
+@pytest.fixture
+def cohort():
+    cohort = Cohort()
+    cohort.add_sample("S1", [MISSENSE, SILENT], "NM_A.1", EXONS)
+    cohort.add_sample("S2", [MISSENSE, INTRONIC], "NM_A.1", EXONS)
+    cohort.add_sample("S3", [], "NM_A.1", EXONS)
+    cohort.add_sample("S4", [MISSENSE], "NM_B.1", EXONS)  # Same coordinates, other reference
+    return cohort
+
+
+def test_counts_and_carriers(cohort):
+    assert cohort.n_variants == 4
+    assert cohort.counts().tolist() == [2, 1, 1, 1]
+    assert cohort.samples_with("NM_A.1:120:C:T") == ["S1", "S2"]
+    assert cohort.samples_with("NM_B.1:120:C:T") == ["S4"]
+    assert [v['position'] for v in cohort.variants_of("S2")] == [120, 500]
+
+
+def test_query(cohort):
+    assert [(v['key'], n) for v, n, _ in cohort.query(min_frequency=0.5)] == [("NM_A.1:120:C:T", 2)]
+    assert [v['position'] for v, _, _ in cohort.query(exon=1, reference="NM_A.1")] == [120, 300]
+    assert [v['type'] for v, _, _ in cohort.query(region="Intron")] == ['Deletion']
+    assert len(cohort.query(min_severity="🟠")) == 2
+
+
+def test_reference_burden(cohort):
+    burden = cohort.reference_burden(min_severity="🟠")
+    assert sorted(burden) == ["NM_A.1", "NM_B.1"]
+    assert burden["NM_A.1"].tolist() == [1, 1, 0, 0]
+    assert burden["NM_B.1"].tolist() == [0, 0, 0, 1]
+    assert cohort.reference_burden()["NM_A.1"].tolist() == [2, 2, 0, 0]
+
+
+def test_duplicate_sample_rejected(cohort):
+    with pytest.raises(ValueError):
+        cohort.add_sample("S1", [])
+
+
+def test_save_and_load(cohort, tmp_path):
+    loaded = Cohort.load(cohort.save(str(tmp_path / "cohort.npz")))
+    assert loaded.samples == cohort.samples and loaded.variants == cohort.variants
+    assert np.array_equal(loaded.counts(), cohort.counts())
+    loaded.add_sample("S5", [SILENT], "NM_A.1", EXONS)
+    assert loaded.samples_with("NM_A.1:300:G:A") == ["S1", "S5"]
@@ -0,0 +1,61 @@
+import random
+
+import pytest
+from Bio import pairwise2
+
+import mutanalyzer_linear
+from conftest import random_dna
+from mutanalyzer_linear import align_linear
+
+SCORING = (2, -1, -5, -1)  # match, mismatch, gap open, gap extend
+
+
+def mutate(seq, seed):
+    # SNVs plus short and long indels, so some optimal gaps cross a midpoint
+    rng = random.Random(seed)
+    seq = list(seq)
+    for _ in range(len(seq) // 40):
+        i = rng.randrange(len(seq))
+        kind = rng.random()
+        if kind < 0.6:
+            seq[i] = rng.choice("ACGT")
+        elif kind < 0.8:
+            del seq[i:i + rng.choice([1, 3, 25])]
+        else:
+            seq[i:i] = random_dna(rng.choice([1, 2, 30]), seed=rng.randrange(1000))
+    return "".join(seq)
+
+
+def globalms_score(a, b):
+    return pairwise2.align.globalms(a, b, *SCORING, one_alignment_only=True, score_only=True)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_linear_score_equals_globalms(monkeypatch, seed):
+    # Tiny leaves so the divide steps, not pairwise2, do nearly all the work
+    monkeypatch.setattr(mutanalyzer_linear, "LEAF_CELLS", 64)
+    ref = random_dna(300 + 40 * seed, seed=seed)
+    sample = mutate(ref, seed)
+    aligned_ref, aligned_sample, score = align_linear(ref, sample, SCORING, workers=1)
+    assert score == globalms_score(ref, sample)
+    assert aligned_ref.replace('-', '') == ref and aligned_sample.replace('-', '') == sample
+    assert len(aligned_ref) == len(aligned_sample)
+
+
+def test_linear_edge_cases(monkeypatch):
+    monkeypatch.setattr(mutanalyzer_linear, "LEAF_CELLS", 64)
+    ref = random_dna(200, seed=7)
+    for sample in (ref, ref[:50] + ref[150:], ref[:100] + random_dna(80, seed=8) + ref[100:], ref[:1], "A"):
+        aligned_ref, aligned_sample, score = align_linear(ref, sample, SCORING, workers=1)
+        assert score == globalms_score(ref, sample)
+        assert aligned_sample.replace('-', '') == sample
+
+
+def test_parallel_matches_serial(monkeypatch):
+    monkeypatch.setattr(mutanalyzer_linear, "LEAF_CELLS", 64)
+    monkeypatch.setattr(mutanalyzer_linear, "PARALLEL_MIN_CELLS", 10_000)
+    ref = random_dna(400, seed=9)
+    sample = mutate(ref, 9)
+    serial = align_linear(ref, sample, SCORING, workers=1)
+    parallel = align_linear(ref, sample, SCORING, workers=2)
+    assert parallel[2] == serial[2] == globalms_score(ref, sample)
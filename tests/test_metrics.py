@@ -0,0 +1,44 @@
+import tracemalloc
+
+import pytest
+
+from mutanalyzer_metrics import MetricsRegistry
+
+
+@pytest.fixture
+def metrics():
+    registry = MetricsRegistry()
+    yield registry
+    registry.set_profiling(False)
+
+
+def test_stage_counts_calls_and_items(metrics):
+    with metrics.stage("align", items=3):
+        pass
+    with metrics.stage("align", items=4):
+        pass
+    agg = metrics.snapshot()['stages']['align']
+    assert agg['calls'] == 2
+    assert agg['items'] == 7
+
+
+def test_no_stage_peak_without_tracemalloc(metrics):
+    assert not tracemalloc.is_tracing()
+    with metrics.stage("call"):
+        pass
+    snap = metrics.snapshot()
+    assert snap['stages']['call']['peak_kb'] is None
+    assert 'stage_peak_memory_bytes{stage="call"}' not in metrics.to_prometheus()
+    assert "-" in metrics.summary_text().splitlines()[1]
+
+
+def test_nested_stage_keeps_outer_peak(metrics):
+    metrics.set_profiling(True)
+    with metrics.stage("call"):
+        block = bytearray(8_000_000)
+        del block
+        with metrics.stage("annotate"):
+            pass
+    stages = metrics.snapshot()['stages']
+    assert stages['call']['peak_kb'] >= 7_000
+    assert stages['annotate']['peak_kb'] < 7_000
@@ -0,0 +1,46 @@
+import pytest
+
+from mutanalyzer_engine import GLOBAL_ALGORITHM
+from mutanalyzer_normalize import deduplicate, normalize_alleles, variant_key
+
+# A (CAG)3 repeat at 6-14
+REF = "GATTACAGCAGCAGCATTGACCT"
+
+
+@pytest.mark.parametrize("position, ref, alt, expected", [
+    (5, "A", "G", (5, "A", "G", "SNP")),
+    (3, "TTAC", "TTGC", (5, "A", "G", "SNP")),  # shared prefix and suffix trimmed
+    (4, "TA", "GG", (4, "TA", "GG", "MNV")),
+    (8, "GCAGC", "GC", (6, "CAG", "-", "Deletion")),  # left-aligned to the repeat start
+    (12, "CAG", "-", (6, "CAG", "-", "Deletion")),
+    (9, "-", "CAG", (5, "-", "CAG", "Insertion")),  # recorded after the base it follows
+    (3, "TT", "TT", (3, "", "", None)),
+])
+def test_normalize_alleles(position, ref, alt, expected):
+    assert normalize_alleles(REF, position, ref, alt) == expected
+
+
+def calls(engine, sample):
+    engine.compute_alignment(REF, sample, GLOBAL_ALGORITHM)
+    return [(m['position'], m['type'], m['ref'], m['alt']) for m in engine.call_mutations()]
+
+
+def test_engine_left_aligns_deletion_in_repeat(engine):
+    # However the aligner places the gap, the call sits at the repeat start
+    assert calls(engine, REF[:11] + REF[14:]) == [(6, 'Deletion', 'CAG', '-')]
+    assert calls(engine, REF[:5] + REF[8:]) == [(6, 'Deletion', 'CAG', '-')]
+
+
+def test_engine_left_aligns_insertion_in_repeat(engine):
+    assert calls(engine, REF[:8] + "CAG" + REF[8:]) == [(5, 'Insertion', '-', 'CAG')]
+
+
+def test_engine_merges_adjacent_snps(engine):
+    assert calls(engine, REF[:4] + "GG" + REF[6:]) == [(5, 'MNV', 'AC', 'GG')]
+
+
+def test_deduplicate_keeps_first_record():
+    first = {'position': 6, 'type': 'Deletion', 'ref': 'CAG', 'alt': '-', 'source': 1}
+    again = dict(first, source=2)
+    ordered, index = deduplicate([first, again])
+    assert ordered == [first] and index[variant_key(first)] is first
@@ -0,0 +1,74 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import random_dna
+from mutanalyzer_normalize import left_align_deletion, left_align_insertion
+from mutanalyzer_pileup import pileup_fastq
+
+REF = random_dna(2000, seed=11)
+SNV = 700
+SNV_ALT = "A" if REF[SNV - 1] != "A" else "C"
+DELETED = (1201, 3)  # 1-based first base, length
+INSERTED = (1600, "GATCA")  # after this base
+
+
+@pytest.fixture(scope="module")
+def fastq(tmp_path_factory):
+    # Half the reads from a haplotype carrying all three variants, half
+    # from the reference: every call should come out near AF 0.5
+    start, length = DELETED
+    after, bases = INSERTED
+    alt = REF[:SNV - 1] + SNV_ALT + REF[SNV:start - 1] + REF[start - 1 + length:after] + bases + REF[after:]
+    rng = random.Random(2)
+    path = tmp_path_factory.mktemp("reads") / "reads.fq"
+    with open(path, "w") as handle:
+        for k in range(3000):
+            haplotype = (REF, alt)[k % 2]
+            offset = rng.randrange(len(haplotype) - 150)
+            handle.write(f"@r{k}\n{haplotype[offset:offset + 150]}\n+\n{'I' * 150}\n")
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def calls(fastq):
+    from mutanalyzer_engine import MutationEngine
+    engine = MutationEngine()
+    engine.workers = 1
+    engine.use_memo = False
+    return {(m['position'], m['type']): m for m in engine.call_from_reads(fastq, REF)}
+
+
+def test_het_snv_recovered(calls):
+    mutation = calls[(SNV, 'SNP')]
+    assert mutation['alt'] == SNV_ALT
+    assert 0.4 <= mutation['allele_fraction'] <= 0.6
+    assert mutation['mean_quality'] == 40.0
+
+
+def test_het_deletion_recovered(calls):
+    # Reads overlapping the deletion take the gapped path, so its allele
+    # fraction is not diluted by reads forced through ungapped
+    position, deleted = left_align_deletion(REF, DELETED[0], REF[DELETED[0] - 1:DELETED[0] - 1 + DELETED[1]])
+    mutation = calls[(position, 'Deletion')]
+    assert mutation['ref'] == deleted
+    assert 0.4 <= mutation['allele_fraction'] <= 0.6
+
+
+def test_het_insertion_recovered(calls):
+    position, inserted = left_align_insertion(REF, *INSERTED)
+    mutation = calls[(position, 'Insertion')]
+    assert mutation['alt'] == inserted
+    assert 0.35 <= mutation['allele_fraction'] <= 0.6
+
+
+def test_no_spurious_calls(calls):
+    assert len(calls) == 3
+
+
+def test_workers_agree(fastq):
+    serial = pileup_fastq(fastq, REF, workers=1, chunk_size=500)
+    parallel = pileup_fastq(fastq, REF, workers=2, chunk_size=500)
+    assert np.array_equal(serial.counts, parallel.counts)
+    assert serial.deletions == parallel.deletions and serial.insertions == parallel.insertions
@@ -0,0 +1,62 @@
+import pytest
+from Bio.Seq import reverse_complement
+
+from mutanalyzer_engine import GLOBAL_ALGORITHM
+from mutanalyzer_transcripts import Transcript
+
+# 5' flank, CDS ATG GCT AAA TGG CGT TAA (M A K W R *) at 6-23, then a 3' UTR
+# with a stop in frame (TAG at 30-32) and one frame over (TAA at 25-27)
+REF = "GGGGG" + "ATGGCTAAATGGCGTTAA" + "CTAAGTTAGCCC"
+PLUS = Transcript("NM_TEST.1", [(6, 35)], [(6, 23)], protein_id="NP_TEST.1")
+
+
+def edit(seq, start, end, replacement=""):
+    # Replace 1-based positions start..end (end = start - 1 inserts)
+    return seq[:start - 1] + replacement + seq[end:]
+
+
+def consequences(engine, ref, sample, transcripts=None, exons=None):
+    if transcripts:
+        engine.set_transcripts(transcripts)
+    else:
+        engine.set_gene_model(exons)
+    engine.compute_alignment(ref, sample, GLOBAL_ALGORITHM)
+    engine.call_mutations()
+    return engine.protein_consequences()
+
+
+@pytest.mark.parametrize("sample, changes, alt_protein", [
+    (REF, ["p.(=)"], "MAKWR*"),
+    (edit(REF, 10, 10, "A"), ["p.Ala2Asp"], "MDKWR*"),
+    (edit(REF, 12, 12, "T"), ["p.Lys3Ter"], "MA*"),
+    (edit(REF, 12, 14), ["p.Lys3del"], "MAWR*"),
+    (edit(REF, 15, 14, "GGC"), ["p.Lys3_Trp4insGly"], "MAKGWR*"),
+    (edit(REF, 15, 14, "AAA"), ["p.Lys3dup"], "MAKKWR*"),
+    (edit(REF, 8, 8, "C"), ["p.Met1?"], "IAKWR*"),
+    # Shifted frames and lost stops read on into the 3' UTR
+    (edit(REF, 13, 13), ["p.Lys3AsnfsTer5"], "MANGVN*"),
+    (edit(REF, 21, 21, "C"), ["p.Ter6GlnextTer3"], "MAKWRQLS*"),
+])
+def test_hgvs_protein_changes(engine, sample, changes, alt_protein):
+    (result,) = consequences(engine, REF, sample, [PLUS])
+    assert (result['transcript'], result['protein_id'], result['ref_protein']) == ("NM_TEST.1", "NP_TEST.1", "MAKWR*")
+    assert (result['changes'], result['alt_protein']) == (changes, alt_protein)
+    assert len(result['aligned_ref']) == len(result['aligned_alt'])
+
+
+def test_frameshift_flags_first_changed_residue(engine):
+    (result,) = consequences(engine, REF, edit(REF, 13, 13), [PLUS])
+    assert result['frameshift'] and result['fs_start'] == 2
+
+
+def test_minus_strand_transcript(engine):
+    ref = reverse_complement(REF)
+    minus = Transcript("NM_MINUS.1", [(1, 30)], [(13, 30)], strand=-1)
+    # Position 10 on the plus strand is 26 here; A>T there is C>A on the CDS
+    (result,) = consequences(engine, ref, edit(ref, 26, 26, "T"), [minus])
+    assert (result['changes'], result['alt_protein']) == (["p.Ala2Asp"], "MDKWR*")
+
+
+def test_flat_exon_model_is_read_as_one_cds(engine):
+    (result,) = consequences(engine, REF, edit(REF, 10, 10, "A"), exons=[(6, 23)])
+    assert result['transcript'] == "exons" and result['changes'] == ["p.Ala2Asp"]
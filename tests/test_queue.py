@@ -0,0 +1,85 @@
+import csv
+import os
+import time
+
+import pytest
+
+from conftest import random_dna
+from mutanalyzer_queue import WorkQueue, collect, run_worker
+
+REF = random_dna(600, seed=51)
+
+
+@pytest.fixture
+def files(tmp_path):
+    ref = tmp_path / "ref.fa"
+    ref.write_text(f">ref\n{REF}\n")
+    samples = []
+    for k, sample in enumerate((REF[:200] + "T" + REF[201:], REF[:300] + REF[303:])):
+        path = tmp_path / f"s{k}.fa"
+        path.write_text(f">s{k}\n{sample}\n")
+        samples.append(str(path))
+    return str(ref), samples
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WorkQueue(str(tmp_path / "queue"), lease_seconds=60, max_attempts=2)
+
+
+def expire(queue, job):
+    # Backdate the lease rather than wait it out
+    old = time.time() - queue.lease_seconds - 5
+    os.utime(queue.path("leased", job['id']), (old, old))
+
+
+def test_submit_is_idempotent(queue, files):
+    ref, samples = files
+    assert queue.submit(samples, ref, {'predict': False}) == (2, 0)
+    assert queue.submit(samples, ref, {'predict': False}) == (0, 2)
+    assert queue.submit(samples[:1], ref, {'predict': True}) == (1, 0)  # Other settings, other job
+
+
+def test_lease_takeover(queue, files):
+    ref, samples = files
+    queue.submit(samples[:1], ref, {})
+    a = queue.claim("A")
+    assert queue.claim("B") is None  # Exactly one worker gets a job
+    assert queue.heartbeat(a)
+    expire(queue, a)
+    assert queue.requeue_expired() == 1
+    assert queue.counts()['pending'] == 1
+    b = queue.claim("B")
+    assert b['attempts'] == 1 and b['lease'] != a['lease']
+    # A's lease was taken back: it can neither renew nor fail B's copy
+    assert not queue.holds(a) and not queue.heartbeat(a)
+    queue.fail(a, "late failure")
+    assert queue.holds(b) and queue.state_of(b['id']) == "leased"
+    # A finishing late writes the same result but leaves B's lease alone
+    queue.complete(a, {'variants': 1})
+    assert queue.holds(b)
+    queue.complete(b, {'variants': 1})
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 1, 'failed': 0}
+
+
+def test_expired_leases_count_as_attempts(queue, files):
+    ref, samples = files
+    queue.submit(samples[:1], ref, {})
+    job = queue.claim("A")
+    expire(queue, job)
+    queue.requeue_expired()
+    job = queue.claim("B")
+    queue.fail(job, "boom")
+    assert queue.counts()['failed'] == 1
+    assert queue.status()['counts']['failed'] == 1 and "boom" in queue.status_text()
+
+
+def test_worker_runs_jobs_and_collects(queue, files, tmp_path):
+    ref, samples = files
+    queue.submit(samples, ref, {'predict': False})
+    assert run_worker(queue, worker="W") == 2
+    merged = str(tmp_path / "all.csv")
+    finished = collect(queue, merged)
+    assert [job['result']['variants'] for job in finished] == [1, 1]
+    with open(merged, newline='', encoding='utf-8') as f:
+        assert sorted(row['Sample'] for row in csv.DictReader(f)) == ["s0", "s1"]
@@ -0,0 +1,72 @@
+import pytest
+from Bio.Seq import reverse_complement
+
+from conftest import random_dna
+from mutanalyzer_engine import GLOBAL_ALGORITHM
+from mutanalyzer_index import ReferenceIndex
+from mutanalyzer_sanger import engine_setup, genotype_alleles, mott_trim, trace_sample
+
+REF = random_dna(600, seed=21)
+
+
+@pytest.fixture(scope="module")
+def index():
+    return ReferenceIndex.build(REF, 15)
+
+
+def test_genotype_alleles():
+    assert genotype_alleles('A', 'R') == (['G'], "0/1")
+    assert genotype_alleles('C', 'R') == (['A', 'G'], "1/2")
+    assert genotype_alleles('C', 'T') == (['T'], "1/1")
+
+
+def test_mott_trim_drops_low_quality_ends():
+    assert mott_trim([5] * 10 + [40] * 50 + [5] * 10) == (10, 60)
+    assert mott_trim([]) == (0, 0)
+
+
+@pytest.mark.parametrize("sequence, covered, strand", [
+    (REF[100:500], (101, 500), 0),
+    (reverse_complement(REF[100:500]), (101, 500), 1),
+    ("ACGTACGTAC" + REF[:300], (1, 300), 0),  # bases before the reference are dropped
+    (REF[400:] + "GGGGGGGG", (401, 600), 0),
+])
+def test_trace_placement(index, sequence, covered, strand):
+    sample, placed, placed_strand = trace_sample(REF, sequence, index)
+    assert (placed, placed_strand) == (covered, strand)
+    assert sample == REF
+
+
+def calls(engine, sample):
+    engine.compute_alignment(REF, sample, GLOBAL_ALGORITHM)
+    return [(m['position'], m['type'], m['ref'], m['alt']) for m in engine.call_mutations()]
+
+
+def test_trace_with_deletion_fills_flanks_without_fake_indel(engine, index):
+    # Each end of the trace is placed from its own seeds, so the flanks do
+    # not shift by the deletion's length and call a compensating insertion
+    sample, covered, _ = trace_sample(REF, REF[100:250] + REF[253:500], index)
+    assert covered == (101, 500)
+    assert [(t, r) for _, t, r, _ in calls(engine, sample)] == [('Deletion', REF[250:253])]
+
+
+def test_trace_with_insertion(engine, index):
+    sample, covered, _ = trace_sample(REF, REF[100:300] + "TTGCA" + REF[300:500], index)
+    assert covered == (101, 500)
+    assert [(t, a) for _, t, _, a in calls(engine, sample)] == [('Insertion', "TTGCA")]
+
+
+def test_het_snv_translated_from_called_allele(engine):
+    # GCT (Ala) with a C/A het at its second base: the alternate codon is
+    # GAT (Asp), not the IUPAC codon GMT, which would translate to X
+    engine.set_gene_model([(1, 18)])
+    engine.compute_alignment("ATGGCTAAATGGCGTTAA", "ATGGMTAAATGGCGTTAA", GLOBAL_ALGORITHM)
+    (mutation,) = engine.call_mutations()
+    engine.score_pathogenicity()
+    assert (mutation['alt'], mutation['genotype'], mutation['effect']) == ('A', "0/1", "Missense")
+    assert mutation['polyphen'].endswith("(126.00)")
+
+
+def test_engine_setup_carries_predict(engine):
+    assert engine_setup(engine)['predict'] is True
+    assert engine_setup(engine, predict=False)['predict'] is False
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from conftest import random_dna
+from mutanalyzer_engine import GLOBAL_ALGORITHM, SPLIT_ALGORITHM, MutationEngine
+from mutanalyzer_session import read_session
+from mutanalyzer_transcripts import Transcript
+
+# Ns in the reference are stored outside the 2-bit packing
+REF = random_dna(400, seed=41) + "NNNN" + random_dna(496, seed=42)
+TRANSCRIPT = Transcript("NM_X.1", [(50, 400), (600, 850)], [(80, 400), (600, 820)], protein_id="NP_X.1")
+
+
+def analysed(engine, sample, algorithm=GLOBAL_ALGORITHM):
+    engine.set_transcripts([TRANSCRIPT])
+    engine.compute_alignment(REF, sample, algorithm)
+    engine.call_mutations()
+    engine.score_pathogenicity()
+    return engine
+
+
+def reopened(engine, path):
+    engine.save_session(path, "S1")
+    restored = MutationEngine()
+    header = restored.open_session(path)
+    return restored, header
+
+
+def test_session_round_trip(engine, tmp_path):
+    # An N and a het base in the sample, an in-frame deletion, an insertion
+    sample = REF[:100] + "N" + REF[101:300] + REF[303:500] + "GATTC" + REF[500:700] + "R" + REF[701:]
+    analysed(engine, sample)
+    restored, header = reopened(engine, str(tmp_path / "run.mas"))
+    assert (header['sample_name'], header['n_variants']) == ("S1", len(engine.mutations))
+    assert restored.mutations == engine.mutations
+    for name in ('ref_seq', 'sample_seq', 'aligned_ref', 'aligned_sample', 'alignment_score', 'algorithm', 'genetic_code'):
+        assert getattr(restored, name) == getattr(engine, name), name
+    assert [t.__dict__ for t in restored.transcripts] == [t.__dict__ for t in engine.transcripts]
+    assert restored.protein_consequences() == engine.protein_consequences()
+
+
+def test_session_round_trip_structural_variants(engine, tmp_path):
+    analysed(engine, REF[:500] + REF[600:], SPLIT_ALGORITHM)
+    assert [m['type'] for m in engine.mutations] == ['Deletion'] and 'end' in engine.mutations[0]
+    restored, _ = reopened(engine, str(tmp_path / "sv.mas"))
+    assert restored.mutations == engine.mutations
+
+
+def test_exon_model_session(engine, tmp_path):
+    engine.set_gene_model([(80, 400), (600, 820)])
+    engine.compute_alignment(REF, REF[:150] + "T" + REF[151:], GLOBAL_ALGORITHM)
+    engine.call_mutations()
+    restored, _ = reopened(engine, str(tmp_path / "exons.mas"))
+    assert restored.exon_ranges == engine.exon_ranges and restored.mutations == engine.mutations
+
+
+def test_overwrite_leaves_no_temp_files(engine, tmp_path):
+    analysed(engine, REF)
+    path = str(tmp_path / "run.mas")
+    engine.save_session(path)
+    engine.save_session(path)
+    assert os.listdir(tmp_path) == ["run.mas"]
+
+
+def test_not_a_session(tmp_path):
+    path = tmp_path / "other.mas"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        read_session(str(path))
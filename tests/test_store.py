@@ -0,0 +1,59 @@
+import sqlite3
+
+from conftest import random_dna
+from mutanalyzer_index import sequence_digest
+from mutanalyzer_store import STORE_VERSION, ResultsStore
+
+REF_A = random_dna(500, seed=31)
+REF_B = random_dna(500, seed=32)
+SNV = {'position': 120, 'type': 'SNP', 'ref': REF_A[119], 'alt': 'N', 'effect': "Missense", 'severity': "🟠 Medium",
+       'depth': 40, 'allele_fraction': 0.5}
+
+
+def test_save_and_load_run(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    run_id = store.save_run(REF_A, [{'name': "S1", 'mutations': [SNV]}], gene="GENE", algorithm="global")
+    run = store.load_run(run_id)
+    assert run['ref_seq'] == REF_A and run['gene'] == "GENE"
+    # Fields without a column of their own come back from 'extra'
+    assert run['samples'][0]['mutations'] == [SNV]
+    assert store.runs()[0]['variants'] == 1
+
+
+def test_seen_is_keyed_on_the_reference_sequence(tmp_path):
+    # Pasted references share the empty gene name; only the sequence tells
+    # them apart
+    store = ResultsStore(str(tmp_path / "results.db"))
+    store.save_run(REF_A, [{'name': "S1", 'mutations': [SNV]}])
+    store.save_run(REF_B, [{'name': "S2", 'mutations': [dict(SNV, ref=REF_B[119])]}])
+    seen_a = store.seen(sequence_digest(REF_A), 120)
+    assert [obs['sample'] for obs in seen_a] == ["S1"]
+    assert store.seen(sequence_digest(REF_A), 120, SNV['ref'], 'N')[0]['effect'] == "Missense"
+    assert store.seen(sequence_digest(REF_A), 120, alt='C') == []
+    assert store.seen(sequence_digest(random_dna(500, seed=33)), 120) == []
+    assert [row['sample'] for row in store.query(reference=sequence_digest(REF_B))] == ["S2"]
+
+
+def test_engine_seen_before(engine, tmp_path):
+    engine.results_path = str(tmp_path / "results.db")
+    engine.get_results_store().save_run(REF_A, [{'name': "S1", 'mutations': [SNV]}])
+    engine.ref_seq = REF_A
+    assert engine.seen_before(120, SNV['ref'], 'N')
+    engine.ref_seq = REF_B
+    assert not engine.seen_before(120, SNV['ref'], 'N')
+
+
+def test_version_1_database_is_upgraded(tmp_path):
+    path = str(tmp_path / "results.db")
+    store = ResultsStore(path)
+    store.save_run(REF_A, [{'name': "S1", 'mutations': [SNV]}], gene="GENE")
+    store.close()
+    # Strip the version 2 columns back off
+    conn = sqlite3.connect(path)
+    conn.executescript("""DROP INDEX variants_ref_position; DROP INDEX refs_seq_digest;
+                          ALTER TABLE variants DROP COLUMN ref_id; ALTER TABLE refs DROP COLUMN seq_digest;
+                          UPDATE meta SET value = '1' WHERE key = 'version';""")
+    conn.close()
+    store = ResultsStore(path)
+    assert store.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0] == str(STORE_VERSION)
+    assert [obs['sample'] for obs in store.seen(sequence_digest(REF_A), 120)] == ["S1"]
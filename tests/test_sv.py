@@ -0,0 +1,43 @@
+import pytest
+from Bio.Seq import reverse_complement
+
+from conftest import random_dna
+from mutanalyzer_engine import SPLIT_ALGORITHM
+from mutanalyzer_normalize import left_align_insertion
+from mutanalyzer_sv import score_alignment
+
+REF = random_dna(3000, seed=5)
+
+
+def split_calls(engine, sample):
+    engine.compute_alignment(REF, sample, SPLIT_ALGORITHM)
+    return [(m['position'], m['type'], m.get('end')) for m in engine.call_mutations()]
+
+
+def test_score_alignment_affine_gaps():
+    # match 2, mismatch -1, open -5 (first gap base), extend -1
+    assert score_alignment("ACGTAC", "ACG--C", (2, -1, -5, -1)) == 4 * 2 - 5 - 1
+    assert score_alignment("ACGT", "AGGT", (2, -1, -5, -1)) == 3 * 2 - 1
+
+
+def test_large_deletion(engine):
+    assert split_calls(engine, REF[:1000] + REF[1200:]) == [(1001, 'Deletion', 1200)]
+
+
+def test_duplication_reported_at_interval_start(engine):
+    assert split_calls(engine, REF[:1100] + REF[1000:1100] + REF[1100:]) == [(1001, 'Duplication', 1100)]
+
+
+def test_inversion(engine):
+    sample = REF[:1000] + reverse_complement(REF[1000:1800]) + REF[1800:]
+    assert split_calls(engine, sample) == [(1001, 'Inversion', 1800)]
+
+
+@pytest.mark.parametrize("shifted", [0, 2, 4])
+def test_insertion_left_aligned_like_small_indels(engine, shifted):
+    # Inserted bases that repeat the flanking reference can be placed
+    # further right; the call must sit where left-alignment puts it
+    inserted = REF[1000:1000 + shifted] + random_dna(297 - shifted, seed=9) + REF[997:1000]
+    expected = left_align_insertion(REF, 1000, inserted)[0]
+    assert split_calls(engine, REF[:1000] + inserted + REF[1000:]) == [(expected, 'Insertion', expected)]
+
@@ -0,0 +1,42 @@
+import pytest
+from Bio.Seq import reverse_complement
+
+from mutanalyzer_bench import MINUS_STRAND_CASES
+from mutanalyzer_transcripts import Transcript, annotate_consequence
+
+# ATG AAA TGG TAA read on the minus strand of positions 11-22
+REF = "A" * 10 + reverse_complement("ATGAAATGGTAA") + "A" * 10
+MINUS = Transcript("MINUS.1", [(11, 22)], [(11, 22)], strand=-1)
+
+
+def snv(position, alt):
+    return {'position': position, 'type': 'SNP', 'ref': REF[position - 1], 'alt': alt}
+
+
+@pytest.mark.parametrize("position, alt, effect, change", MINUS_STRAND_CASES)
+def test_minus_strand_snv(position, alt, effect, change):
+    result = annotate_consequence(MINUS, "Exon", 1, snv(position, alt), REF, 1)
+    assert (result['effect'], result['protein_change']) == (effect, change)
+
+
+def test_minus_strand_codons_read_in_transcript_order():
+    assert [MINUS.codon(REF, i) for i in range(4)] == ["ATG", "AAA", "TGG", "TAA"]
+    assert MINUS.cds_offset(22) == 0 and MINUS.cds_offset(11) == 11
+    assert all(MINUS.cds_position(MINUS.cds_offset(p)) == p for p in range(11, 23))
+
+
+def test_minus_strand_spliced_cds():
+    # Same CDS split by an intron at 15-18, so codon 3 spans the junction
+    ref = "A" * 10 + reverse_complement("GTAA") + "CCCC" + reverse_complement("ATGAAATG") + "A" * 10
+    transcript = Transcript("MINUS.2", [(11, 14), (19, 26)], [(11, 14), (19, 26)], strand=-1)
+    assert [transcript.codon(ref, i) for i in range(4)] == ["ATG", "AAA", "TGG", "TAA"]
+    assert transcript.exon_number(0) == 2 and transcript.exon_number(1) == 1
+    result = annotate_consequence(transcript, "Exon", 1, {'position': 19, 'type': 'SNP', 'ref': ref[18], 'alt': 'T'}, ref, 1)
+    assert (result['effect'], result['protein_change']) == ("Nonsense", "W3*")
+
+
+def test_minus_strand_utrs():
+    transcript = Transcript("MINUS.3", [(5, 28)], [(11, 22)], strand=-1)
+    upstream = annotate_consequence(transcript, "Exon", 1, snv(25, 'C'), REF, 1)
+    downstream = annotate_consequence(transcript, "Exon", 1, snv(7, 'C'), REF, 1)
+    assert (upstream['effect'], downstream['effect']) == ("5' UTR", "3' UTR")
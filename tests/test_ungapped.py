@@ -0,0 +1,53 @@
+import random
+
+import numpy as np
+
+from conftest import random_dna
+from mutanalyzer_ungapped import indels_cheaper, mismatch_positions, ungapped_mismatches
+
+
+def edit_distance(a, b):
+    row = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j, y in enumerate(b, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (x != y))
+    return row[-1]
+
+
+def test_indels_cheaper_matches_edit_distance():
+    # Small alphabets and short sequences make shifted repeats (where gaps
+    # win) common, so both answers come up often
+    rng = random.Random(1)
+    outcomes = set()
+    for _ in range(3000):
+        n = rng.randint(1, 14)
+        alphabet = rng.choice(["AC", "ACG", "ACGT"])
+        ref = "".join(rng.choice(alphabet) for _ in range(n))
+        sample = "".join(rng.choice(alphabet) for _ in range(n))
+        mismatches = mismatch_positions(ref, sample)
+        expected = edit_distance(ref, sample) < len(mismatches)
+        assert indels_cheaper(ref, sample, mismatches) == expected, (ref, sample)
+        outcomes.add(expected)
+    assert outcomes == {True, False}
+
+
+def test_indels_cheaper_on_long_sequences():
+    # Scattered SNVs over a long stretch exercise the row skipping
+    ref = random_dna(800, seed=3)
+    sample = list(ref)
+    for column in range(30, 800, 41):
+        sample[column] = "A" if ref[column] != "A" else "C"
+    sample = "".join(sample)
+    mismatches = mismatch_positions(ref, sample)
+    assert indels_cheaper(ref, sample, mismatches) == (edit_distance(ref, sample) < len(mismatches))
+
+
+def test_ungapped_mismatches():
+    ref = random_dna(1000, seed=4)
+    snvs = ref[:100] + ("A" if ref[100] != "A" else "C") + ref[101:]
+    assert np.array_equal(ungapped_mismatches(ref, snvs), [100])
+    assert len(ungapped_mismatches(ref, ref)) == 0
+    # A deletion and an insertion of one base each: same length, but shifted
+    assert ungapped_mismatches(ref, ref[:300] + ref[301:700] + "G" + ref[700:]) is None
+    assert ungapped_mismatches(ref, ref[:-1]) is None